@@ -1,4 +1,4 @@
-import base64
+import asyncio
 from io import BytesIO
 from typing import Any, Callable, Collection, Coroutine, Union
 from uuid import UUID
@@ -43,41 +43,173 @@ def format_response(response: Union[httpx.Response, None]):
         return 'Response could not be formatted'
 
 
+class BearerAuth(httpx.Auth):
+    '''Adds the cached authorization header of the api client to every request, authenticating first if required'''
+
+    def __init__(self, api_client: 'ApiClient'):
+        self.api_client = api_client
+
+    async def async_auth_flow(self, request: httpx.Request):
+
+        if self.api_client.authorization is None or not self.api_client.token_valid():
+            await self.api_client.authenticate()
+
+        request.headers['Authorization'] = self.api_client.authorization
+        yield request
+
+
 class ApiClient:
-    '''API client for the rss FlightManagementServer'''
+    '''
+    API client for the rss FlightManagementServer.
+
+    All requests share one connection pool, so uploads reuse open (keep-alive) connections
+    instead of paying a new TCP and TLS handshake each time. The pool is opened on the first
+    request (or `start`) and should be closed with `close` (or by using the client as async context manager)
+    '''
 
     endpoint: str
 
     gzip = True
 
-    def __init__(self, auth_code: str) -> None:
+    limits = httpx.Limits(max_connections=8, max_keepalive_connections=4, keepalive_expiry=20)
+    '''Limits of the connection pool. Idle connections are closed before mobile networks typically drop them'''
+
+    timeout = httpx.Timeout(10, connect=5)
+    '''Default timeouts, requests sending measurements pass their own'''
+
+    connect_retries = 2
+    '''Number of times establishing a connection is retried before a request fails'''
+
+    client: Union[None, httpx.AsyncClient] = None
+
+    client_loop: Union[None, asyncio.AbstractEventLoop] = None
+
+    def __init__(self, auth_code: str, endpoint: Union[None, str] = None, verify: bool = True) -> None:
 
         self.auth_code = auth_code
 
-        self._config = json.load(open('./config/config.json'))
+        self._config = json.load(open('./config/config.json')) if endpoint is None else dict()
+
+        self.endpoint = endpoint or self._config['API_ENDPOINT']
 
-        self.endpoint = self._config['API_ENDPOINT']
+        self.verify = verify
 
         self.logger = getLogger('API Client')
 
+    def get_client(self) -> httpx.AsyncClient:
+        '''Returns the pooled client, opening it if required'''
+
+        loop = asyncio.get_running_loop()
+
+        # Connections are bound to the event loop they were opened in. Checked and replaced without
+        # awaiting, so requests failing at the same time can not each open a new client
+        if self.client is None or self.client.is_closed or self.client_loop is not loop:
+
+            transport = httpx.AsyncHTTPTransport(limits=self.limits, retries=self.connect_retries, verify=self.verify)
+
+            self.client = httpx.AsyncClient(base_url=self.endpoint, auth=BearerAuth(self), timeout=self.timeout, transport=transport)
+            self.client_loop = loop
+
+        return self.client
+
+    async def start(self):
+        '''Opens the connection pool'''
+        self.get_client()
+
+    async def close(self):
+        '''Closes the connection pool and stops refreshing the token'''
+
+        if self.refresh_timer is not None:
+            self.refresh_timer.cancel()
+            self.refresh_timer = None
+
+        if self.token_task is not None and not self.token_task.done():
+            self.token_task.cancel()
+
+        await self.close_pool()
+
+    async def close_pool(self):
+        '''Closes the connection pool, a new one is opened by the next request'''
+
+        client = self.client
+        self.client = None
+
+        if client is not None and self.client_loop is asyncio.get_running_loop():
+            await client.aclose()
+
+    async def __aenter__(self) -> 'ApiClient':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
 
     old_token_decoded: Union[None, dict[str, Any]] = None
     old_token: Union[None, str] = None
 
-    async def authenticate(self):
+    authorization: Union[None, str] = None
+    '''Authorization header of the current token'''
+
+    token_expiry_margin: float = 60
+    '''Tokens are not used anymore this many seconds before they expire'''
+
+    token_refresh_margin: float = 300
+    '''Tokens are renewed in the background this many seconds before they expire, so requests never wait for it'''
+
+    token_retry_period: float = 10
+    '''Delay between background renewals after one failed'''
+
+    token_task: Union[None, asyncio.Task] = None
+    '''The running token request, shared by everyone waiting for a token'''
+
+    refresh_timer: Union[None, asyncio.TimerHandle] = None
+
+    def token_valid(self) -> bool:
+        return self.old_token_decoded is not None and time.time() < (self.old_token_decoded['exp'] - self.token_expiry_margin)
+
+    async def authenticate(self) -> str:
+        '''Returns a valid token. Only waits for the server if the token was not renewed in time'''
 
         # try to return a cached token if available
-        if self.old_token_decoded is not None and self.old_token is not None:
+        if self.old_token is not None and self.token_valid():
+            return self.old_token
+
+        return await asyncio.shield(self.renew_token())
+
+    def renew_token(self) -> asyncio.Task:
+        '''Starts requesting a new token, unless a request is already running'''
+
+        if self.token_task is None or self.token_task.done() or self.token_task.get_loop() is not asyncio.get_running_loop():
+            self.token_task = asyncio.create_task(self.request_token())
+
+        return self.token_task
 
-            # Check that the old token does not expire in the next minute
-            if time.time() < (self.old_token_decoded['exp'] - 60):
-                return self.old_token
+    def schedule_token_refresh(self, delay: float):
+
+        if self.refresh_timer is not None:
+            self.refresh_timer.cancel()
+
+        self.refresh_timer = asyncio.get_running_loop().call_later(delay, self.refresh_token_in_background)
+
+    def refresh_token_in_background(self):
+
+        self.refresh_timer = None
+        self.renew_token().add_done_callback(self.on_background_refresh_done)
+
+    def on_background_refresh_done(self, task: asyncio.Task):
+
+        if task.cancelled() or task.exception() is None:
+            return
+
+        self.logger.warning(f'Renewing the token failed, retrying in {self.token_retry_period}s: {task.exception()}')
+
+        if self.refresh_timer is None:
+            self.schedule_token_refresh(self.token_retry_period)
+
+    async def request_token(self) -> str:
 
-        # First, the code looks up a token from the cache.
-        # Because we're looking for a token for the current app, not for a user,
-        # use None for the account parameter.
         try:
-            result = await self.request_with_error_handling_and_retry(lambda client: client.post('/auth/authorization_code_flow', data=json.dumps({ 'token': self.auth_code })), 3, False) # type: ignore
+            result = await self.request_with_error_handling_and_retry(lambda client: client.post('/auth/authorization_code_flow', data=json.dumps({ 'token': self.auth_code }), auth=None), 3) # type: ignore
         except Exception as e:
             self.logger.exception(f'Authentication failed: {e.args}')
             raise
@@ -98,42 +230,49 @@ class ApiClient:
 
         self.old_token = bearer
         self.old_token_decoded = decoded_bearer
+        self.authorization = 'Bearer ' + bearer
+
+        # Renew well before the token expires, but not more often than every half lifetime
+        lifetime = decoded_bearer['exp'] - time.time()
+        self.schedule_token_refresh(max(lifetime - self.token_refresh_margin, lifetime/2))
 
         return bearer
 
     async def request_with_error_handling_and_retry(self, func: Callable[
-        [httpx.AsyncClient], Coroutine[Any, Any, httpx.Response]], retries: int = 0, auth: bool = True) -> httpx.Response:
+        [httpx.AsyncClient], Coroutine[Any, Any, httpx.Response]], retries: int = 0) -> httpx.Response:
+        '''Sends the request of func with the pooled client, which authenticates it unless func passes auth=None'''
 
-        async with httpx.AsyncClient() as client:
+        response: Union[None, httpx.Response] = None
 
-            client.base_url = self.endpoint
-            
-            if auth:
-                bearer = await self.authenticate()
-                client.headers.setdefault('Authorization', 'Bearer ' + bearer)
+        curRetry = 0
+        while (curRetry <= retries):
 
-            response: Union[None, httpx.Response] = None
+            response = None
 
-            curRetry = 0
-            while (curRetry <= retries):
+            try:
+                response = await func(self.get_client())
+            except httpx.TimeoutException as e:
+                self.logger.warning(f'Request timed out: {e!r}')
+            except httpx.TransportError as e:
+                # The pool discards the failed connection, the other requests keep theirs
+                self.logger.warning(f'Network error while sending request: {e!r}')
+            except Exception as e:
+                self.logger.exception(f'Unexpected error while sending response')
 
-                try:
-                    response = await func(client)
-                except Exception as e:
-                    self.logger.exception(f'Unexpected error while sending response')
+            # If successful return
+            if response is not None and response.status_code >= 200 and response.status_code < 300:
+                self.logger.info(f'{format_response(response)}')
+                return response
 
-                # If successful return
-                if response is not None and response.status_code >= 200 and response.status_code < 300:
-                    self.logger.info(f'{format_response(response)}')
-                    return response
+            self.logger.warning(f'{format_response(response)} (Retry {curRetry})')
 
-                self.logger.warning(f'{format_response(response)} (Retry {curRetry})')
+            curRetry += 1
 
-                curRetry += 1
+        if response is None:
+            raise ConnectionError(f'All retries to {self.endpoint} failed without response')
 
-            assert response is not None
-            raise ConnectionError(
-                f'All retries to {response.url} failed with code {response.status_code}: {response.text}')
+        raise ConnectionError(
+            f'All retries to {response.url} failed with code {response.status_code}: {response.text}')
 
     async def register_vessel(self, vessel_req) -> Vessel:
 
@@ -154,122 +293,63 @@ class ApiClient:
 
         return FlightSchema().load_safe(Flight, flight_res.json())
     
-    async def try_report_binray_flight_data(self, flight_id, data: bytes, timeout: float) -> tuple[bool, str]:
-
-        async with httpx.AsyncClient() as client:
-
-            bearer = await self.authenticate()
-
-            client.base_url = self.endpoint
-            client.headers.setdefault('Authorization', 'Bearer ' + bearer)
-            client.headers.setdefault('Content-Type', 'application/octet-stream')
-
-            res = None
-
-            try:
-                res = await client.post(f"/flight_data/report_binary/{flight_id}", content=data, timeout=timeout)
+    async def try_report_binray_flight_data(self, flight_id, data: bytes, timeout: float, encoding: Union[None, str] = None, sequence: Union[None, int] = None, content_encoding: Union[None, str] = None) -> tuple[bool, str]:
+        '''
+        :param encoding: Encoding of the measurement blocks (e.g. "gorilla"), send as X-Measurement-Encoding header. None for raw measurements
+        :param sequence: Sequence number of the upload, send as X-Measurement-Sequence header, as uploads in flight at the same time may arrive out of order
+        :param content_encoding: Compression of the whole body (e.g. "deflate", see `core.helper.payload_compression`), send as Content-Encoding header
+        '''
 
-                success = res.status_code >= 200 and res.status_code < 300
+        headers = { 'Content-Type': 'application/octet-stream' }
 
-                if not success:
-                    self.logger.warning(f'{format_response(res)}')
+        if content_encoding is not None:
+            headers['Content-Encoding'] = content_encoding
 
-                return (success, str(res.status_code))
-            except TimeoutError as e:
-                self.logger.warning(f'Failed sending measurements due to timeout. Response: {res}')
-                return (False, 'TIMEOUT')
-            except  Exception as e:  
-                self.logger.exception(f'Unknown error sending flight data. Exception: {e}. Response: {res}')
-                return (False, str(e))
+        if encoding is not None:
+            headers['X-Measurement-Encoding'] = encoding
 
-    async def try_report_flight_data_compact(self, flight_id, data: list[FlightMeasurementCompact], timeout: float) -> \
-        tuple[bool, str]:
-
-            serialized = FlightMeasurementCompactSchema().dump_list(data)
-
-            additional_headers = dict()
-
-            if self.gzip:
-                # content = zip_payload(json.dumps(serialized))
-                content = gzip.compress(json.dumps(serialized).encode('utf-8'))
-
-                deb  = base64.b64encode(content)
-
-            async with httpx.AsyncClient() as client:
-
-                bearer = await self.authenticate()
-
-                client.base_url = self.endpoint
-                client.headers.setdefault('Authorization', 'Bearer ' + bearer)
-                if self.gzip:
-                    client.headers.setdefault('Content-Encoding', 'gzip')
-                    client.headers.setdefault('Content-Type', 'application/json')
-
-                res = None
-
-                try:
-                    if self.gzip:
-                        res = await client.post(f"/flight_data/report_compact/{flight_id}", content=content, timeout=timeout, headers=additional_headers)
-                    else:
-                        res = await client.post(f"/flight_data/report_compact/{flight_id}", json=serialized, timeout=timeout)
-
-                    success = res.status_code >= 200 and res.status_code < 300
-
-                    if not success:
-                        self.logger.warning(f'{format_response(res)}')
-
-                    return (success, str(res.status_code))
-                except TimeoutError as e:
-                    self.logger.warning(f'Failed sending measurements due to timeout. Response: {res}')
-                    return (False, 'TIMEOUT')
-                except  Exception as e:  
-                    self.logger.exception(f'Unknown error sending flight data. Exception: {e}. Response: {res}')
-                    return (False, str(e))
+        if sequence is not None:
+            headers['X-Measurement-Sequence'] = str(sequence)
 
+        return await self.try_report(f"/flight_data/report_binary/{flight_id}", data, headers, timeout)
 
     async def try_report_flight_data_compact(self, flight_id, data: list[FlightMeasurementCompact], timeout: float) -> \
     tuple[bool, str]:
 
         serialized = FlightMeasurementCompactSchema().dump_list(data)
 
-        additional_headers = dict()
-
         if self.gzip:
-            # content = zip_payload(json.dumps(serialized))
             content = gzip.compress(json.dumps(serialized).encode('utf-8'))
+            headers = { 'Content-Encoding': 'gzip', 'Content-Type': 'application/json' }
+        else:
+            content = json.dumps(serialized).encode('utf-8')
+            headers = { 'Content-Type': 'application/json' }
 
-            deb  = base64.b64encode(content)
-
-        async with httpx.AsyncClient() as client:
-
-            bearer = await self.authenticate()
+        return await self.try_report(f"/flight_data/report_compact/{flight_id}", content, headers, timeout)
 
-            client.base_url = self.endpoint
-            client.headers.setdefault('Authorization', 'Bearer ' + bearer)
-            if self.gzip:
-                client.headers.setdefault('Content-Encoding', 'gzip')
-                client.headers.setdefault('Content-Type', 'application/json')
+    async def try_report(self, url: str, content: bytes, headers: dict[str, str], timeout: float) -> tuple[bool, str]:
+        '''Posts flight data once. Returns if it succeeded and the status code or reason of the failure'''
 
-            res = None
+        res = None
 
-            try:
-                if self.gzip:
-                    res = await client.post(f"/flight_data/report_compact/{flight_id}", content=content, timeout=timeout, headers=additional_headers)
-                else:
-                    res = await client.post(f"/flight_data/report_compact/{flight_id}", json=serialized, timeout=timeout)
-
-                success = res.status_code >= 200 and res.status_code < 300
-
-                if not success:
-                    self.logger.warning(f'{format_response(res)}')
-
-                return (success, str(res.status_code))
-            except TimeoutError as e:
-                self.logger.warning(f'Failed sending measurements due to timeout. Response: {res}')
-                return (False, 'TIMEOUT')
-            except  Exception as e:  
-                self.logger.exception(f'Unknown error sending flight data. Exception: {e}. Response: {res}')
-                return (False, str(e))
+        try:
+            res = await self.get_client().post(url, content=content, headers=headers, timeout=timeout)
+
+            success = res.status_code >= 200 and res.status_code < 300
+
+            if not success:
+                self.logger.warning(f'{format_response(res)}')
+
+            return (success, str(res.status_code))
+        except (TimeoutError, httpx.TimeoutException) as e:
+            self.logger.warning(f'Failed sending measurements due to timeout. Response: {res}')
+            return (False, 'TIMEOUT')
+        except httpx.TransportError as e:
+            self.logger.warning(f'Failed sending flight data due to a network error: {e!r}')
+            return (False, str(e))
+        except  Exception as e:  
+            self.logger.exception(f'Unknown error sending flight data. Exception: {e}. Response: {res}')
+            return (False, str(e))
 
     async def try_send_command_responses(self, flight_id: str, commands):
 
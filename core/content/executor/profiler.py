@@ -0,0 +1,82 @@
+from datetime import timedelta
+from typing import Collection, Iterable, Sequence, Tuple, Type, Union
+from uuid import UUID
+from core.helper.latency_histogram import LatencyHistogram, bucket_names
+from core.logic.commands.command import Command
+from core.logic.rocket_definition import Measurements, Part, Rocket
+
+PHASE_UPDATE = 0
+PHASE_COLLECT = 1
+PHASE_FLUSH = 2
+
+PHASE_COUNT = 3
+
+
+class ExecutorProfiler(Part):
+    '''
+    Collects latency histograms of the `update`, `collect_measurements` and `flush` calls
+    of every part. If this part is added to the rocket, the flight executor times every
+    call and records it here.
+
+    Each measurement describes one part and phase (0: update, 1: collect, 2: flush) since
+    the last measurement, identified by the index of the part within the rocket. Percentiles
+    are the upper bounds of the buckets they fall into
+    '''
+
+    type = 'Executor.Profiler'
+
+    virtual = True
+
+    min_update_period = timedelta(seconds=1)
+
+    min_measurement_period = timedelta(seconds=1)
+
+    histograms: dict[Part, list[LatencyHistogram]]
+
+    def __init__(self, _id: UUID, name: str, parent: Union[Part, Rocket, None]):
+        super().__init__(_id, name, parent, list()) # type: ignore
+
+        self.histograms = dict()
+
+    def record(self, part: Part, phase: int, duration_ns: int):
+
+        histograms = self.histograms.get(part)
+
+        if histograms is None:
+            histograms = [LatencyHistogram() for _ in range(PHASE_COUNT)]
+            self.histograms[part] = histograms
+
+        histograms[phase].record(duration_ns)
+
+    def get_accepted_commands(self) -> list[Type[Command]]:
+        return []
+
+    def update(self, commands: Iterable[Command], now: float, iteration: int) -> Union[None, Collection[Command]]:
+        pass
+
+    def get_measurement_shape(self) -> Iterable[Tuple[str, str]]:
+        return [
+            ('part_index', 'i'),
+            ('phase', 'i'),
+            ('count', 'i'),
+            ('mean_us', 'f'),
+            ('max_us', 'f'),
+            ('p50_us', 'f'),
+            ('p99_us', 'f'),
+            *[(name, 'i') for name in bucket_names()]
+        ]
+
+    def collect_measurements(self, now: float, iteration: int) -> Union[None, Sequence[Measurements]]:
+
+        res = list[Measurements]()
+
+        for part, histograms in self.histograms.items():
+            for phase, h in enumerate(histograms):
+
+                if h.count < 1:
+                    continue
+
+                res.append([part._index, phase, h.count, h.total_ns/h.count/1000, h.max_ns/1000, h.percentile(0.5)/1000, h.percentile(0.99)/1000, *h.counts])
+                h.reset()
+
+        return res
@@ -0,0 +1,50 @@
+from datetime import timedelta
+from typing import Collection, Iterable, Sequence, Tuple, Type, Union
+from uuid import UUID
+from core.logic.commands.command import Command
+from core.logic.rocket_definition import Measurements, Part, Rocket
+from core.logic.ticker import FixedRateTicker
+
+
+class TickTimingSensor(Part):
+    '''
+    Reports how well the flight executor keeps its tick deadlines. The ticker
+    is set by the flight executor if it runs in fixed rate mode
+    '''
+
+    type = 'Executor.TickTiming'
+
+    virtual = True
+
+    min_update_period = timedelta(seconds=1)
+
+    min_measurement_period = timedelta(seconds=1)
+
+    ticker: Union[FixedRateTicker, None] = None
+
+    def __init__(self, _id: UUID, name: str, parent: Union[Part, Rocket, None]):
+        super().__init__(_id, name, parent, list()) # type: ignore
+
+    def get_accepted_commands(self) -> list[Type[Command]]:
+        return []
+
+    def update(self, commands: Iterable[Command], now: float, iteration: int) -> Union[None, Collection[Command]]:
+        pass
+
+    def get_measurement_shape(self) -> Iterable[Tuple[str, str]]:
+        return [
+            ('ticks', 'i'),
+            ('jitter_p50_ms', 'f'),
+            ('jitter_p99_ms', 'f'),
+            ('jitter_max_ms', 'f'),
+            ('missed_deadlines', 'i'),
+        ]
+
+    def collect_measurements(self, now: float, iteration: int) -> Union[None, Sequence[Measurements]]:
+
+        if self.ticker is None:
+            return []
+
+        stats = self.ticker.take_statistics()
+
+        return [[stats.ticks, stats.jitter_p50*1000, stats.jitter_p99*1000, stats.jitter_max*1000, stats.missed_deadlines]]
@@ -8,6 +8,8 @@ class AbortCommand(Command):
 
     command_type = 'Control.Abort'
 
+    critical_response = True
+
     payload_schema = None
 
     response_schema = BasicErrorResponseSchema()
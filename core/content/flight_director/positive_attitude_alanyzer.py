@@ -14,16 +14,25 @@ from core.content.general_commands.enable import DisableCommand, EnableCommand
 from core.logic.commands.command import Command
 from core.content.microcontroller.arduino_serial import ArduinoOverSerial
 from core.logic.rocket_definition import Part, Rocket
+from core.logic.isolated_part import IsolatedPart
 
-class PositiveAttitudeAnalyzer(Part, IDataAge):
+class PositiveAttitudeAnalyzer(IsolatedPart, IDataAge):
     type = 'Analyzer.Attitude.Absolute'
 
+    measurement_priority = 'status'
+
     enabled: bool = True
 
     min_update_period = timedelta(milliseconds=20)
 
     min_measurement_period = timedelta(milliseconds=50)
 
+    input_size = 4
+    '''Orientation quaternion'''
+
+    output_size = 1
+    '''Pointing up'''
+
     orientation_sensor: IOrientationSensor
 
     last_good_data_update: float | None = None
@@ -35,39 +44,48 @@ class PositiveAttitudeAnalyzer(Part, IDataAge):
     -1 -> pointing down
     '''
 
-    def __init__(self, _id: UUID, name: str, parent: Union[Part, Rocket, None], orientation_sensor: IOrientationSensor):
+    def __init__(self, _id: UUID, name: str, parent: Union[Part, Rocket, None], orientation_sensor: IOrientationSensor, isolated: bool = False):
 
         self.orientation_sensor = orientation_sensor
 
-        super().__init__(_id, name, parent, [orientation_sensor])   # type: ignore
+        super().__init__(_id, name, parent, [orientation_sensor], isolated=isolated)   # type: ignore
 
     def get_accepted_commands(self) -> list[Type[Command]]:
         return []
 
-    def update(self, commands: Iterable[Command], now, iteration):
+    def write_inputs(self, inputs: np.ndarray, now: float) -> bool:
 
         orientation = self.orientation_sensor.get_orientation()
 
         if orientation is None:
             self.pointing_up = 0
-            return
+            return False
+
+        inputs[:] = orientation
+        return True
+
+    @staticmethod
+    def compute(inputs: np.ndarray, outputs: np.ndarray, state: np.ndarray, now: float):
 
-        quat_len = np.linalg.norm(orientation)
+        quat_len = np.linalg.norm(inputs)
 
         # Should be a unit quaternion
         if quat_len < 0.5 or quat_len > 1.5:
-            self.pointing_up = 0
+            outputs[0] = 0
             return
 
         up_vector = np.array([0.0, 0.0, 1.0], dtype=float)
 
-        as_quat = np.array([orientation[0], orientation[1], orientation[2], orientation[3]], dtype=float)
+        pointing_vector = rotate_vector_by_quaternion(up_vector, inputs)
+
+        outputs[0] = 1 if pointing_vector[2] > 0 else -1
 
-        pointing_vector = rotate_vector_by_quaternion(up_vector, as_quat)
+    def read_outputs(self, outputs: np.ndarray, now: float):
 
-        self.pointing_up = 1 if pointing_vector[2] > 0 else -1
+        self.pointing_up = int(outputs[0])
 
-        self.last_good_data_update = now
+        if self.pointing_up != 0:
+            self.last_good_data_update = now
         
 
     def get_measurement_shape(self) -> Iterable[Tuple[str, str]]:
@@ -78,6 +96,13 @@ class PositiveAttitudeAnalyzer(Part, IDataAge):
     def collect_measurements(self, now, iteration) -> Iterable[Iterable[float | None]]:
         return [[self.pointing_up or 0]]
     
+    def apply_recorded_measurement(self, measurement, timestamp: float):
+
+        self.pointing_up = int(measurement.get('pointing_up', 0))
+
+        if self.pointing_up != 0:
+            self.last_good_data_update = timestamp
+
     def get_data_age(self) -> float | None:
         return self.last_good_data_update
 
@@ -2,26 +2,48 @@ import asyncio
 from io import BytesIO
 from logging import getLogger, _nameToLevel
 import math
+from pathlib import Path
 import struct
 import time
 from typing import Iterable, Sequence, Tuple, Type, Union
 from datetime import datetime, timedelta, timezone
 from uuid import UUID, uuid4
 from core.api_client import ApiClient
-from core.helper.measurement_binary_helper import get_struct_format_for_part
 from core.logic.commands.command import Command, Command
-from core.logic.measurement_sink import ApiMeasurementSinkBase, MeasurementSinkBase
+from core.helper.global_data_dir import get_user_data_dir
+from core.helper.gorilla_codec import encode_records
+from core.helper.payload_compression import AdaptiveCompression, PayloadEncoding, timed_compress
+from core.helper.upload_spool import UploadSpool
+from core.logic.bandwidth_controller import BandwidthController
+from core.logic.measurement_downsampling import allocate_budget, average_records, changed_records, last_values
+from core.logic.measurement_sink import ApiMeasurementSinkBase, EncodedBlock, MeasurementChunk, MeasurementSinkBase, OverflowPolicy
 from core.logic.rocket_definition import Measurements, Part, Rocket
 from core.models.flight import Flight
 from core.models.flight_measurement import FlightMeasurement
 from typing_extensions import Self
 
+import numpy as np
+
 from core.models.flight_measurement_compact import FlightMeasurementCompact
 
 LOGGER_NAME = 'Measurement_Sink'
 
-CHAR_SIZE = struct.calcsize('!B')
-SHORT_SIZE = struct.calcsize('!H')
+PART_HEADER = struct.Struct('!BH')
+'''Part index and number of measurements preceding the measurements of a part'''
+
+ENCODED_PART_HEADER = struct.Struct('!BHBI')
+'''Part index, number of measurements, encoding and length in bytes, used if the measurements are compressed'''
+
+ENCODING_RAW = 0
+
+ENCODING_GORILLA = 1
+
+UPLOAD_SPOOL_FOLDER = 'upload_spool'
+
+MEASUREMENT_ENCODING = 'gorilla'
+'''Value of the encoding header of compressed payloads, see `ApiClient.try_report_binray_flight_data`'''
+
+MAX_PART_MEASUREMENTS = 2**16 - 1
 
 class ApiMeasurementSink(ApiMeasurementSinkBase):
      
@@ -29,9 +51,32 @@ class ApiMeasurementSink(ApiMeasurementSinkBase):
 
     target_send_period = timedelta(seconds=0.5)
 
+    send_period = timedelta(seconds=0.1)
+    '''Min time between the start of two uploads'''
+
+    max_in_flight = 3
+    '''
+    Number of uploads that may be in flight at once. Uploads overlap, so a slow request
+    does not hold back the following ones and high latency links are used to capacity
+    '''
+
     send_timeout = timedelta(seconds=10)
+    '''Upper bound of the timeout of an upload, which is derived from the round trip times (see `send_timeout_seconds`)'''
+
+    min_send_timeout = timedelta(seconds=1)
 
-    send_task: Union[None, asyncio.Task] = None
+    smoothed_rtt: Union[None, float] = None
+    '''Smoothed duration of successful uploads in seconds, None until the first one'''
+
+    rtt_variation: float = 0
+
+    last_send_start: Union[None, float] = None
+
+    next_sequence: int = 0
+    '''Sequence number of the next upload, so the server can order uploads that overlapped'''
+
+    acknowledged_sequence: int = 0
+    '''All uploads with a lower sequence number completed (successfully or by being spooled)'''
 
     last_send_success_time: Union[None, float] = None
 
@@ -42,26 +87,99 @@ class ApiMeasurementSink(ApiMeasurementSinkBase):
     last_send_duration: Union[None, float] = None
 
     drop_rate: float = 1
+    '''Ratio of available to send measurements of the sampled parts'''
+
+    bandwidth_controller: BandwidthController
+    '''Sets the budget of the uploads from the delivery rate and congestion of the recent ones'''
+
+    budget: Union[None, float] = None
+    '''Bytes the last upload was allowed to use, None if unlimited'''
+
+    compress_measurements: bool = False
+    '''
+    If true, the measurements of each part are compressed (see `core.helper.gorilla_codec`)
+    if that makes them smaller. Requires a server supporting the encoding
+    '''
+
+    payload_compression: Union[None, PayloadEncoding] = None
+    '''
+    If set, upload bodies are compressed with this Content-Encoding (see `core.helper.payload_compression`)
+    at a level chosen from the measured CPU time and bandwidth. Requires a server supporting the encoding
+    '''
+
+    adaptive_compression: Union[None, AdaptiveCompression] = None
+
+    compression_ratio: float = 1
+    '''Smoothed ratio of raw to send bytes of the recent uploads'''
+
+    compression_ratio_smoothing: float = 0.25
+
+    status_repeat_period = timedelta(seconds=5)
+    '''Unchanged status measurements are repeated this often, so the server knows the part is still alive'''
+
+    spool: Union[None, UploadSpool] = None
+    '''
+    Uploads that failed, send again once the link recovers. Shared by all flights,
+    so uploads of a previous run are send after a restart. Opened on the first send
+    '''
+
+    spool_open_task: Union[None, asyncio.Task] = None
+    '''Opens the spool, awaited by all uploads started while it is opened'''
+
+    overflow_policy: OverflowPolicy = 'spill'
+    '''Measurements the link can not keep up with are spooled and send once it has capacity left'''
 
     def __init__(self, _id: UUID, name: str, parent: Union[Self, Rocket, None]):
         super().__init__(_id, name, parent)
 
+        self.last_status_values = dict[Part, bytes]()
+        self.last_status_send_time = dict[Part, float]()
+
+        self.send_tasks = set[asyncio.Task]()
+        self.completed_sequences = set[int]()
+
+        # Uploads in flight overlap, but the spool is replayed by one of them at a time
+        self.spool_lock = asyncio.Lock()
+
+        self.spill_tasks = set[asyncio.Task]()
+        self.spill_lock = asyncio.Lock()
+
+        self.bandwidth_controller = BandwidthController()
+
         self.logger = getLogger('Api Measurement Sink')
 
     def update(self, commands: Iterable[Command], now: float, iteration):
 
-        # If the last send was not completed yet do nothing
-        if self.send_task is not None and not self.send_task.done():
+        self.send_tasks = {t for t in self.send_tasks if not t.done()}
+
+        # Wait if the window of uploads in flight is full
+        if len(self.send_tasks) >= self.max_in_flight:
             return
-        
-        # Otherwise initiate next send
-        self.send_task = asyncio.create_task(self.send_last_measurements(now))
+
+        if self.last_send_start is not None and now < self.last_send_start + self.send_period.total_seconds():
+            return
+
+        # Time covered by the upload. Capped, so the upload after a stall does not burst onto a congested link
+        interval = self.target_send_period.total_seconds() if self.last_send_start is None else min(now - self.last_send_start, self.target_send_period.total_seconds()*self.max_in_flight)
+
+        self.last_send_start = now
+
+        self.send_tasks.add(asyncio.create_task(self.send_last_measurements(now, self.next_sequence, interval)))
+        self.next_sequence += 1
 
     def get_measurement_shape(self) -> Iterable[Tuple[str, Type]]:
         return [
             ('send_success', '?'),
             ('send_duration', 'f'),
-            ('drop_rate', 'f')
+            ('drop_rate', 'f'),
+            ('bandwidth', 'f'),
+            ('rtt', 'f'),
+            ('budget', 'I'),
+            ('spooled_bytes', 'Q'),
+            ('backlog_bytes', 'I'),
+            ('in_flight', 'B'),
+            ('send_timeout', 'f'),
+            ('compression_level', 'B')
         ]
 
     def get_accepted_commands(self) -> Iterable[Type[Command]]:
@@ -73,111 +191,58 @@ class ApiMeasurementSink(ApiMeasurementSinkBase):
             return []
         
         return [
-            [self.last_send_success, self.last_send_duration or 0, self.drop_rate]
+            [self.last_send_success, self.last_send_duration or 0, self.drop_rate, self.bandwidth_controller.bandwidth or 0, self.smoothed_rtt or 0, int(self.budget or 0), self.spool.pending_bytes if self.spool is not None else 0, self.backlog_bytes, len(self.send_tasks), self.send_timeout_seconds, self.adaptive_compression.level if self.adaptive_compression is not None else 0]
         ]
     
-    async def send_last_measurements(self, now: float):
+    async def send_last_measurements(self, now: float, sequence: int, interval: float):
 
-        await asyncio.sleep(0.1)
+        try:
+            await self.send_measurement_batch(now, sequence, interval)
+        finally:
+            self.complete_sequence(sequence)
 
-        # Swap measurement buffer
-        old_buffer = self.measurement_buffer
-        self.measurement_buffer = list()
+    async def send_measurement_batch(self, now: float, sequence: int, interval: float):
 
-        if(self.logger.isEnabledFor(_nameToLevel['DEBUG'])):
-            self.logger.debug(f'Starting measurment dispatch. {len(old_buffer)} in curent buffer')
-
-        # A drop rate of 1 means every measurement is send
-        # 2 only every second, etc.
-        drop_rate = 1
-
-        # If the last send took too long adjust the drop rate as a percentage of the overshoot
-        if self.last_send_duration is not None and self.last_send_duration > self.target_send_period.total_seconds():
-            drop_rate = self.last_send_duration/self.target_send_period.total_seconds()
-
-        combined_measurement_dict = dict[Part, list[Tuple[float, list[Union[float, int, str]]]]]()
-
-        for measurement_dicts in old_buffer:
-
-            for part, (start, end, measurements) in measurement_dicts.items():
-
-                m_count = len(measurements)
-                i = 0
-                time_increment = end-start
-                for m in measurements:
-
-                    measurement_timestamp = start + (time_increment*i)
-                    # as_date = datetime.fromtimestamp(measurement_timestamp, tz=timezone.utc)
-                    if part not in combined_measurement_dict:
-                        combined_measurement_dict[part] = list()
-                    combined_measurement_dict[part].append((measurement_timestamp, m))
-                    i += 1
-
-        total_size = 0
-
-        # Calculate size of resulting byte array first to optmize memory allocations
-        for part, measurements in combined_measurement_dict.items():
-            m_count = len(measurements)
+        if self.spool is None:
+            await self.open_spool()
 
-            format = get_struct_format_for_part([t[1] for t in part.get_measurement_shape()])
+        new_blocks = self.read_new_blocks()
 
-            total_size += CHAR_SIZE + SHORT_SIZE # Add size for part index and number of measurements
-
-            mesurement_size = struct.calcsize(format)
-
-            i = m_count
-            for m in measurements:
-                if ((m_count-i) % drop_rate) < 1:
-                    total_size += mesurement_size    
-                i -= 1
-
-            parts = [s[0] for s in part.get_measurement_shape()]
-
-        measurement_bytes = bytearray(total_size)
-        cur = 0
-
-        for part, measurements in combined_measurement_dict.items():
-            m_count = len(measurements)
-
-            format = get_struct_format_for_part([t[1] for t in part.get_measurement_shape()])
+        if(self.logger.isEnabledFor(_nameToLevel['DEBUG'])):
+            self.logger.debug(f'Starting measurment dispatch. New measurements for {len(new_blocks)} parts')
 
-            struct.pack_into('!B', measurement_bytes, cur, part._index)
-            
-            cur += CHAR_SIZE
-            num_m_location = cur # record location where to later write the number of included measurements to
-            cur += SHORT_SIZE
+        # Bytes the upload may use at the rate of the bandwidth controller
+        # Budget is in raw bytes, so compressed measurements allow proportionally more data
+        rate_budget = self.bandwidth_controller.budget(interval)
+        budget = None if rate_budget is None else rate_budget*self.compression_ratio
+        self.budget = rate_budget
 
-            # Drop the measurement if overwhelmed
-            # Start with the last measurement as index 0
-            # to ensure it gets send
-            i = m_count
-            included_m_count = 0
-            for (t, m) in measurements:
-                if ((m_count-i) % drop_rate) < 1:
+        selected = self.select_records(new_blocks, now)
+        decimated, drop_rate = self.decimate_records(selected, budget)
 
-                    m = [enocde_measurement(x) for x in m]
-                    try:
-                        struct.pack_into(format, measurement_bytes, cur, t, *m)
-                        cur += struct.calcsize(format)
-                    except Exception as e:
-                        self.logger.warn(f'failed to prepare measuremetns of part {part.name} at time {t} for sending: {e.args[0]}')
-                    
-                    included_m_count += 1
-                
-                i -= 1
+        # Compressing the measurements takes a while for large batches, keep it off the event loop
+        measurement_bytes, ratio = await asyncio.to_thread(self.encode_measurements, decimated)
 
-            struct.pack_into('!H', measurement_bytes, num_m_location, included_m_count) # Write number of incldued measurements to remembered location
+        body, content_encoding = await self.compress_payload(measurement_bytes)
 
+        # Computed per upload, overlapping uploads only meet in the smoothed ratio
+        if len(body) > 0:
+            ratio *= len(measurement_bytes)/len(body)
+            self.compression_ratio += self.compression_ratio_smoothing*(ratio - self.compression_ratio)
 
-        
-        # print(f'Sending measurements for {len(flight_measurements)} parts. Drop rate: {drop_rate}.')
+        self.bandwidth_controller.consume(len(body))
 
         if(self.logger.isEnabledFor(_nameToLevel['DEBUG'])):
-            self.logger.debug(f'Prepared measurements to be send over the Api. Trying to send measurements for {combined_measurement_dict.items()} parts. Drop Rate: {drop_rate}')
+            self.logger.debug(f'Prepared measurements to be send over the Api. Trying to send {len(body)} bytes for {len(new_blocks)} parts. Drop Rate: {drop_rate}')
 
         send_start = time.time()
+        delivered_at_send = self.bandwidth_controller.delivered
+
+        encoding = MEASUREMENT_ENCODING if self.compress_measurements else None
 
-        (send_success, reason) = await self.api_client.try_report_binray_flight_data(self.flight._id, bytes(measurement_bytes), self.send_timeout.total_seconds())
+        timeout = self.send_timeout_seconds
+
+        (send_success, reason) = await self.api_client.try_report_binray_flight_data(self.flight._id, body, timeout, encoding=encoding, sequence=sequence, content_encoding=content_encoding)
 
         self.drop_rate = drop_rate
         self.last_send_attempt_time = now
@@ -193,7 +258,15 @@ class ApiMeasurementSink(ApiMeasurementSinkBase):
 
             self.last_send_success = False
             if reason == 'TIMEOUT':
-                self.last_send_duration = self.send_timeout.total_seconds()
+                self.last_send_duration = timeout
+                self.bandwidth_controller.on_congestion(send_start, send_end)
+                self.update_rtt(timeout)
+
+            # Keep the complete measurements, they are send once the link recovers
+            if self.spool is not None and len(selected) > 0:
+                if drop_rate > 1:
+                    measurement_bytes, _ = await asyncio.to_thread(self.encode_measurements, selected)
+                self.spool.append(self.flight._id, encoding, measurement_bytes)
             return
         
         if(self.logger.isEnabledFor(_nameToLevel['DEBUG'])):
@@ -203,9 +276,252 @@ class ApiMeasurementSink(ApiMeasurementSinkBase):
         self.last_send_success_time = send_end
         self.last_send_duration = send_duration
 
-def enocde_measurement(m):
+        # Uploads not completing within the window of uploads in flight hold back the following ones
+        congested = send_duration > self.target_send_period.total_seconds()*self.max_in_flight
 
-    if isinstance(m, str):
-        return m.encode()
-    
-    return m
\ No newline at end of file
+        self.bandwidth_controller.on_delivered(send_start, delivered_at_send, send_end, len(body), congested)
+        self.update_rtt(send_duration)
+
+        # Live measurements have priority, spooled ones only use what is left of the send period
+        if send_duration < self.target_send_period.total_seconds()/2:
+            await self.send_spooled()
+
+    async def open_spool(self):
+        '''Opens the spool once, overlapping uploads wait for the same open. Retried by the next upload if it failed'''
+
+        if self.spool_open_task is None or (self.spool_open_task.done() and self.spool is None):
+            self.spool_open_task = asyncio.create_task(self.load_spool())
+
+        await asyncio.shield(self.spool_open_task)
+
+    async def load_spool(self):
+
+        spool = UploadSpool(Path(get_user_data_dir()) / UPLOAD_SPOOL_FOLDER)
+
+        try:
+            await asyncio.to_thread(spool.open)
+        except Exception as e:
+            self.logger.error(f'Failed opening upload spool: {e}')
+            return
+
+        self.spool = spool
+
+    async def send_spooled(self):
+        '''Sends the oldest spooled upload, if any'''
+
+        if self.spool is None or self.spool.empty:
+            return
+
+        # Another upload is replaying the spool already. Reading the same entry would send it twice
+        if self.spool_lock.locked():
+            return
+
+        async with self.spool_lock:
+
+            try:
+                upload = await asyncio.to_thread(self.spool.read_next)
+            except Exception as e:
+                self.logger.error(f'Failed reading upload spool: {e}')
+                return
+
+            if upload is None:
+                return
+
+            body, content_encoding = await self.compress_payload(upload.data)
+
+            (success, reason) = await self.api_client.try_report_binray_flight_data(upload.flight_id, body, self.send_timeout_seconds, encoding=upload.encoding, content_encoding=content_encoding)
+
+            if success:
+                self.spool.acknowledge(upload)
+            else:
+                self.logger.warning(f'Failed sending spooled measurements. Reason: {reason}')
+
+    async def compress_payload(self, data: bytes) -> Tuple[bytes, Union[None, str]]:
+        '''Compresses the body of an upload if enabled and worth it. Returns the body and its content encoding'''
+
+        if self.payload_compression is None:
+            return (data, None)
+
+        if self.adaptive_compression is None or self.adaptive_compression.encoding != self.payload_compression:
+            self.adaptive_compression = AdaptiveCompression(self.payload_compression)
+
+        compression = self.adaptive_compression
+        bandwidth = self.bandwidth_controller.bandwidth
+
+        level = compression.next_level(len(data), bandwidth)
+
+        if level == 0:
+            return (data, None)
+
+        # zlib and lzma release the GIL, so compressing does not block the control loop
+        compressed, cpu_time = await asyncio.to_thread(timed_compress, data, compression.encoding, level)
+
+        compression.record(level, len(data), len(compressed), cpu_time, bandwidth)
+
+        if len(compressed) >= len(data):
+            return (data, None)
+
+        return (compressed, compression.encoding)
+
+    def spill(self, chunks: list[MeasurementChunk]) -> bool:
+        '''
+        Spools measurements the sink fell behind on, they are send like failed uploads.
+        Called within the control tick, so they are encoded in a worker thread
+        '''
+
+        if self.spool is None:
+            return False
+
+        self.spill_tasks = {t for t in self.spill_tasks if not t.done()}
+        self.spill_tasks.add(asyncio.create_task(self.spool_chunks(self.spool, chunks)))
+
+        return True
+
+    async def spool_chunks(self, spool: UploadSpool, chunks: list[MeasurementChunk]):
+
+        # Tasks acquire the lock in the order they were created, so the spool keeps the order of the measurements
+        async with self.spill_lock:
+
+            measurement_bytes = await asyncio.to_thread(self.encode_chunks, chunks)
+
+            spool.append(self.flight._id, MEASUREMENT_ENCODING if self.compress_measurements else None, measurement_bytes)
+
+    def encode_chunks(self, chunks: list[MeasurementChunk]) -> bytes:
+
+        payloads_by_part = dict[Part, list[bytes]]()
+        for chunk in chunks:
+            for block in chunk.blocks:
+                payloads_by_part.setdefault(block.part, list()).append(block.payload)
+
+        # Joined as bytes, concatenating the records would convert them to the native byte order
+        records_by_part = {p: np.frombuffer(b''.join(b), dtype=p.get_measurement_descriptor().wire_dtype) for p, b in payloads_by_part.items()}
+
+        measurement_bytes, _ = self.encode_measurements(records_by_part)
+
+        return measurement_bytes
+
+    def complete_sequence(self, sequence: int):
+        '''Records the upload as completed and advances `acknowledged_sequence` over all uploads completed in order'''
+
+        self.completed_sequences.add(sequence)
+
+        while self.acknowledged_sequence in self.completed_sequences:
+            self.completed_sequences.remove(self.acknowledged_sequence)
+            self.acknowledged_sequence += 1
+
+    @property
+    def send_timeout_seconds(self) -> float:
+        '''Timeout of the next upload, the smoothed round trip time plus four times its variation (as TCP does)'''
+
+        if self.smoothed_rtt is None:
+            return self.send_timeout.total_seconds()
+
+        timeout = self.smoothed_rtt + 4*self.rtt_variation
+
+        return min(self.send_timeout.total_seconds(), max(self.min_send_timeout.total_seconds(), timeout))
+
+    def update_rtt(self, duration: float):
+
+        if self.smoothed_rtt is None:
+            self.smoothed_rtt = duration
+            self.rtt_variation = duration/2
+            return
+
+        self.rtt_variation = 0.75*self.rtt_variation + 0.25*abs(self.smoothed_rtt - duration)
+        self.smoothed_rtt = 0.875*self.smoothed_rtt + 0.125*duration
+
+    def select_records(self, new_blocks: dict[Part, list[EncodedBlock]], now: float) -> dict[Part, np.ndarray]:
+        '''Returns the records to send by part, without the unchanged measurements of status parts'''
+
+        records_by_part = dict[Part, np.ndarray]()
+
+        for part, blocks in new_blocks.items():
+
+            wire_dtype = part.get_measurement_descriptor().wire_dtype
+            records = np.frombuffer(b''.join(b.payload for b in blocks), dtype=wire_dtype)
+
+            if part.measurement_priority == 'status':
+                records = self.reduce_status_records(part, records, now)
+
+            if len(records) > 0:
+                records_by_part[part] = records
+
+        return records_by_part
+
+    def decimate_records(self, records_by_part: dict[Part, np.ndarray], budget: Union[None, float]) -> Tuple[dict[Part, np.ndarray], float]:
+        '''
+        Reduces the records to the budget (bytes) according to the priorities of the parts
+        (see `Part.measurement_priority`). Critical and status measurements are always send,
+        the rest of the budget is divided equally between the sampled parts, which are
+        decimated by averaging if they exceed their share.
+        Returns the records and the drop rate of the sampled measurements
+        '''
+
+        records_by_part = dict(records_by_part)
+
+        sampled = {p: r.nbytes for p, r in records_by_part.items() if p.measurement_priority == 'sampled'}
+
+        total = sum(r.nbytes + PART_HEADER.size for r in records_by_part.values())
+
+        available_count = sum(len(records_by_part[p]) for p in sampled)
+        sent_count = available_count
+
+        if budget is not None and total > budget and len(sampled) > 0:
+
+            fixed = total - sum(sampled.values())
+            granted = allocate_budget(sampled, budget - fixed)
+
+            for part, demand in sampled.items():
+                factor = math.ceil(demand/granted[part]) if granted[part] > 0 else len(records_by_part[part])
+                reduced = average_records(records_by_part[part], factor)
+
+                sent_count -= len(records_by_part[part]) - len(reduced)
+                records_by_part[part] = reduced
+
+        drop_rate = available_count/sent_count if sent_count > 0 else 1
+
+        return (records_by_part, drop_rate)
+
+    def encode_measurements(self, records_by_part: dict[Part, np.ndarray]) -> Tuple[bytes, float]:
+        '''Packs the records of all parts into the payload of an upload. Returns the payload and the ratio of raw to encoded bytes'''
+
+        # The count of a part is limited to 16 bit, split larger backlogs
+        parts = list[bytes]()
+
+        for part, records in records_by_part.items():
+            for start in range(0, len(records), MAX_PART_MEASUREMENTS):
+                parts.extend(self.encode_part(part, records[start:start + MAX_PART_MEASUREMENTS]))
+
+        measurement_bytes = b''.join(parts)
+
+        raw_size = sum(r.nbytes + PART_HEADER.size for r in records_by_part.values())
+
+        return (measurement_bytes, raw_size/len(measurement_bytes) if len(measurement_bytes) > 0 else 1)
+
+    def encode_part(self, part: Part, records: np.ndarray) -> list[bytes]:
+
+        raw = records.tobytes()
+
+        if not self.compress_measurements:
+            return [PART_HEADER.pack(part._index, len(records)), raw]
+
+        compressed = encode_records(records)
+
+        if len(compressed) < len(raw):
+            return [ENCODED_PART_HEADER.pack(part._index, len(records), ENCODING_GORILLA, len(compressed)), compressed]
+
+        return [ENCODED_PART_HEADER.pack(part._index, len(records), ENCODING_RAW, len(raw)), raw]
+
+    def reduce_status_records(self, part: Part, records: np.ndarray, now: float) -> np.ndarray:
+        '''Keeps only changed status measurements, but repeats the last one every `status_repeat_period`'''
+
+        changed = changed_records(records, self.last_status_values.get(part))
+
+        if len(changed) < 1 and now - self.last_status_send_time.get(part, 0) > self.status_repeat_period.total_seconds():
+            changed = records[-1:]
+
+        if len(changed) > 0:
+            self.last_status_values[part] = last_values(changed)
+            self.last_status_send_time[part] = now
+
+        return changed
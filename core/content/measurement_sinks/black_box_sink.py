@@ -0,0 +1,156 @@
+import asyncio
+from datetime import timedelta
+from logging import getLogger
+from pathlib import Path
+import time
+from typing import Iterable, Sequence, Tuple, Type, Union
+from uuid import UUID
+
+from typing_extensions import Self
+
+from core.helper.black_box_file import BLACK_BOX_FILE_EXTENSION, BlackBoxWriter
+from core.helper.global_data_dir import get_cur_flight_data_dir
+from core.logic.commands.command import Command
+from core.logic.measurement_sink import MeasurementSinkBase
+from core.logic.rocket_definition import Measurements, Rocket
+
+
+class BlackBoxMeasurementSink(MeasurementSinkBase):
+    '''
+    Flight recorder keeping the latest measurements of all parts in a preallocated,
+    memory mapped ring file (see `core.helper.black_box_file`). Every update copies the
+    new measurements into the map, which costs about as much as a memcpy, so it can run
+    at full sensor rate next to the other sinks.
+
+    Once copied, the data survives a crash of the app. The map is synced to the storage
+    every `sync_period`, which bounds what is lost if the device itself dies.
+    After an unclean shutdown, the data can be recovered with `scan_black_box`
+    '''
+
+    type = 'Measurement_Sink.BlackBox'
+
+    min_update_period = timedelta(milliseconds=20)
+
+    min_measurement_period = timedelta(seconds=1)
+
+    file_size: int = 32*1024*1024
+    '''
+    Size of the ring in bytes. How many minutes of data it holds depends on the
+    data rate of the rocket, see the `window` measurement
+    '''
+
+    sync_period = timedelta(seconds=1)
+
+    writer: Union[None, BlackBoxWriter] = None
+
+    failed: bool = False
+
+    sync_task: Union[None, asyncio.Task] = None
+
+    last_sync_time: float = 0
+
+    last_sync_duration: float = 0
+
+    first_write_time: Union[None, float] = None
+
+    def __init__(self, _id: UUID, name: str, parent: Union[Self, Rocket, None], file_size: Union[None, int] = None):
+
+        if file_size is not None:
+            self.file_size = file_size
+
+        super().__init__(_id, name, parent)
+
+        self.logger = getLogger('Black Box Measurement Sink')
+
+    def open(self):
+
+        flight_data_folder = Path(get_cur_flight_data_dir())
+
+        try:
+            flight_data_folder.mkdir(parents=True, exist_ok=True)
+            self.writer = BlackBoxWriter(flight_data_folder / f'black_box{BLACK_BOX_FILE_EXTENSION}', self.file_size, self.measurement_store.buffers.keys())
+        except Exception as e:
+            self.logger.error(f'Failed creating black box file: {e}')
+            self.failed = True
+
+    def update(self, commands: Iterable[Command], now: float, iteration: int):
+
+        for c in commands:
+            c.state = 'failed'
+            c.response_message = f'Cannot process commands of type {c.command_type}'
+
+        if self.failed:
+            return
+
+        if self.writer is None:
+            self.open()
+
+        if self.writer is None:
+            return
+
+        try:
+            for chunk in self.read_new_chunks():
+                for block in chunk.blocks:
+                    self.writer.write_block(block.part, block.count, block.payload)
+        except Exception as e:
+            self.logger.error(f'Failed writing to black box file: {e}')
+            self.failed = True
+            return
+
+        if self.first_write_time is None:
+            self.first_write_time = now
+
+        # Sync on a worker thread, as it blocks until the storage confirms the write
+        if now > self.last_sync_time + self.sync_period.total_seconds() and (self.sync_task is None or self.sync_task.done()):
+            self.last_sync_time = now
+            self.sync_task = asyncio.create_task(self.sync())
+
+    async def sync(self):
+
+        writer = self.writer
+
+        if writer is None:
+            return
+
+        sync_start = time.time()
+
+        try:
+            await asyncio.to_thread(writer.sync)
+        except Exception as e:
+            self.logger.error(f'Failed syncing black box file: {e}')
+
+        self.last_sync_duration = time.time() - sync_start
+
+    def get_measurement_shape(self) -> Iterable[Tuple[str, str]]:
+        return [
+            ('failed', '?'),
+            ('bytes_written', 'Q'),
+            ('wraps', 'I'),
+            ('window', 'f'),
+            ('sync_duration', 'f'),
+            ('backlog_bytes', 'I')
+        ]
+
+    def get_accepted_commands(self) -> Iterable[Type[Command]]:
+        return []
+
+    def collect_measurements(self, now: float, iteration: int) -> Sequence[Measurements]:
+
+        writer = self.writer
+
+        if writer is None:
+            return [[self.failed, 0, 0, 0, self.last_sync_duration, self.backlog_bytes]]
+
+        # Estimate the time span held by the ring from the average data rate
+        window = 0
+        if self.first_write_time is not None and now > self.first_write_time and writer.bytes_written > 0:
+            window = writer.data_size/(writer.bytes_written/(now - self.first_write_time))
+
+        return [[self.failed, writer.bytes_written, writer.wraps, window, self.last_sync_duration, self.backlog_bytes]]
+
+    def __del__(self):
+        if self.writer is not None:
+            try:
+                self.writer.close()
+            except Exception:
+                pass
@@ -1,13 +1,13 @@
 import asyncio
-from io import TextIOWrapper
-import json
 from logging import _nameToLevel, getLogger
 import math
 import time
 from typing import Iterable, Sequence, Tuple, Type, Union
 from datetime import datetime, timedelta, timezone
 from uuid import UUID, uuid4
+from core.helper.background_writer import BackgroundFile, get_background_writer
 from core.helper.global_data_dir import get_cur_flight_data_dir, get_user_data_dir
+from core.helper.measurement_file import BLOCK_HEADER, MEASUREMENT_FILE_EXTENSION, encode_header
 from core.logic.commands.command import Command, Command
 from core.logic.measurement_sink import MeasurementSinkBase
 from core.logic.rocket_definition import Measurements, Part, Rocket
@@ -18,12 +18,16 @@ from typing_extensions import Self
 import os
 from pathlib import Path
 
-from core.models.flight_measurement_compact import FlightMeasurementCompact, FlightMeasurementCompactSchema
+import numpy as np
 
 LOGGER_NAME = 'Measurement_Sink'
 
 class FileMeasurementSink(MeasurementSinkBase):
-     
+    '''
+    Stores all measurements into measurement files (see `core.helper.measurement_file`) in the flight folder.
+    The files are written by the background writer, so a slow storage never delays the control loop
+    '''
+
     type = 'Measurement_Sink.File'
 
     target_store_period = timedelta(seconds=0.3)
@@ -41,6 +45,7 @@ class FileMeasurementSink(MeasurementSinkBase):
     last_store_duration: Union[None, float] = None
 
     drop_rate: float = 1
+    '''Ratio of available to stored measurements, the sink decimates after the background writer refused data'''
 
     folder_created = False
 
@@ -51,13 +56,16 @@ class FileMeasurementSink(MeasurementSinkBase):
 
     current_file_iteration = 0
 
-    current_file_handle: Union[None, TextIOWrapper] = None
+    current_file_handle: Union[None, BackgroundFile] = None
 
     def __init__(self, _id: UUID, name: str, parent: Union[Self, Rocket, None]):
         super().__init__(_id, name, parent)
 
         self.flight_data_folder = Path(get_cur_flight_data_dir())
 
+        self.files = list[BackgroundFile]()
+        '''All files opened by the sink, the background writer might still drop data of previous ones'''
+
         self.logger = getLogger('File Measurement Sink')
 
     def update(self, commands: Iterable[Command], now: float, iteration):
@@ -73,7 +81,10 @@ class FileMeasurementSink(MeasurementSinkBase):
         return [
             ('store_success', 'i'),
             ('store_duration', 'f'),
-            ('drop_rate', 'f')
+            ('dropped_bytes', 'Q'),
+            ('writer_queue_bytes', 'I'),
+            ('writer_dropped_bytes', 'Q'),
+            ('backlog_bytes', 'I')
         ]
 
     def get_accepted_commands(self) -> Iterable[Type[Command]]:
@@ -84,8 +95,10 @@ class FileMeasurementSink(MeasurementSinkBase):
         if self.last_measurement is not None and self.last_store_attempt_time is not None and self.last_measurement < self.last_store_attempt_time:
             return []
         
+        writer = get_background_writer()
+
         return [
-            [1 if self.last_store_success else 0, self.last_store_duration or 0, self.drop_rate]
+            [1 if self.last_store_success else 0, self.last_store_duration or 0, self.dropped_bytes, writer.queued_bytes, writer.dropped_bytes, self.backlog_bytes]
         ]
     
     async def store_last_measurements(self, now: float):
@@ -93,11 +106,9 @@ class FileMeasurementSink(MeasurementSinkBase):
         await asyncio.sleep(0.1)
 
         if not self.folder_created:
-            try:
-
-                self.flight_data_folder.mkdir(parents=True, exist_ok=True)
-            except Exception as e:
-                self.logger.error(f'Failed instantiating measurement folder {e}')
+            # Resolved on first use, as the flight executor starts a new flight folder after the parts are created
+            # The folder itself is created by the background writer
+            self.flight_data_folder = Path(get_cur_flight_data_dir())
             self.folder_created = True
 
         self.open_new_file_if_required()
@@ -105,12 +116,10 @@ class FileMeasurementSink(MeasurementSinkBase):
         if self.current_file_handle is None:
             return
 
-        # Swap measurement buffer
-        old_buffer = self.measurement_buffer
-        self.measurement_buffer = list()
+        new_blocks = self.read_new_blocks()
 
         if(self.logger.isEnabledFor(_nameToLevel['DEBUG'])):
-            self.logger.debug(f'Starting measurment dispatch. {len(old_buffer)} in curent buffer')
+            self.logger.debug(f'Starting measurment dispatch. New measurements for {len(new_blocks)} parts')
 
         # A drop rate of 1 means every measurement is store
         # 2 only every second, etc.
@@ -120,67 +129,33 @@ class FileMeasurementSink(MeasurementSinkBase):
         if self.last_store_duration is not None and self.last_store_duration > self.target_store_period.total_seconds():
             drop_rate = self.last_store_duration/self.target_store_period.total_seconds()
 
+        store_start = time.time()
 
-        combined_measurement_dict = dict[Part, list[Tuple[float, list[Union[float, int, str]]]]]()
-
-        for measurement_dicts in old_buffer:
-
-
-            for part, (start, end, measurements) in measurement_dicts.items():
-
-                m_count = len(measurements)
-                i = 0
-                time_increment = end-start
-                for m in measurements:
-
-                    # try:
-                    #     inflated = part.inflate_measurement(m)
-                    # except:
-                    #     print(f'Failed inflating measurement for part {part.name}')
-                    #     continue
-
-                    measurement_timestamp = start + (time_increment*i)
-                    # as_date = datetime.fromtimestamp(measurement_timestamp, tz=timezone.utc)
-                    if part not in combined_measurement_dict:
-                        combined_measurement_dict[part] = list()
-                    combined_measurement_dict[part].append((measurement_timestamp, m))
-                    i += 1
-
-        flight_measurements = list[FlightMeasurementCompact]()
-
-        for part, measurements in combined_measurement_dict.items():
-            m_count = len(measurements)
-            filtered_measurements = list[Tuple[float, list[Union[float, int, str]]]]()
-            # Drop the measurement if overwhelmed
-            # Start with the last measurement as index 0
-            # to ensure it gets store
-            i = m_count
-            for m in measurements:
-                if ((m_count-i) % drop_rate) < 1:
-                    filtered_measurements.append(m)
-                i -= 1
+        store_success = False
 
-            parts = [s[0] for s in part.get_measurement_shape()]
+        blocks = list[bytes]()
 
-            flight_measurements.append(FlightMeasurementCompact(part._id, parts, filtered_measurements))
+        # The chunk log already encoded the records in the file layout, only the block headers are added
+        for part, encoded_blocks in new_blocks.items():
+            for block in encoded_blocks:
 
-        
-        # print(f'storeing measurements for {len(flight_measurements)} parts. Drop rate: {drop_rate}.')
+                # Drop the measurement if overwhelmed
+                if drop_rate > 1:
+                    records = block.records[(np.arange(block.count) % drop_rate) < 1]
+                    blocks.append(BLOCK_HEADER.pack(part._index, len(records)))
+                    blocks.append(records.tobytes())
+                else:
+                    blocks.append(BLOCK_HEADER.pack(part._index, block.count))
+                    blocks.append(block.payload)
 
         if(self.logger.isEnabledFor(_nameToLevel['DEBUG'])):
-            self.logger.debug(f'Prepared measurements to be store over the Api. Trying to store measurements for {len(flight_measurements)} parts. Drop Rate: {drop_rate}')
+            self.logger.debug(f'Prepared measurements to be stored. Trying to store measurements for {len(new_blocks)} parts. Drop Rate: {drop_rate}')
 
-        store_start = time.time()
+        # Only queues the data, the background writer writes it to the file
+        store_success = self.current_file_handle.write(b''.join(blocks))
 
-        store_success = False
-
-        serialized = FlightMeasurementCompactSchema().dump_list(flight_measurements)
-
-        try:
-            self.current_file_handle.write(json.dumps(serialized))
-            store_success = True
-        except Exception as e:
-            self.logger.error(f'Failed writing measurements to file: {e}')
+        if self.current_file_handle.failed:
+            self.logger.error(f'Failed writing measurements to file {self.current_file_handle.path}')
             self.current_file_handle = None # Reset file
 
 
@@ -224,9 +199,19 @@ class FileMeasurementSink(MeasurementSinkBase):
         self.current_file_count = self.current_file_count + 1
 
 
-        path = Path(f'{self.flight_data_folder.as_posix()}/{self.current_file_count}.json')
+        path = self.get_file_path(self.current_file_count)
+
+        self.current_file_handle = get_background_writer().open(path)
+        self.files.append(self.current_file_handle)
+
+        if not self.current_file_handle.write(encode_header(self.measurement_store.buffers.keys())):
+            self.logger.error(f'Failed creating measurement file {path}')
+            self.current_file_handle = None
+
+    @property
+    def dropped_bytes(self) -> int:
+        '''Bytes of measurements of this sink that the background writer dropped (queue full or file failed)'''
+        return sum(f.dropped_bytes for f in self.files)
 
-        try:
-            self.current_file_handle = path.open('a')
-        except Exception as e:
-            self.logger.error(f'Failed creating measurement file: {e}')
\ No newline at end of file
+    def get_file_path(self, file_count: int) -> Path:
+        return Path(f'{self.flight_data_folder.as_posix()}/{file_count}{MEASUREMENT_FILE_EXTENSION}')
\ No newline at end of file
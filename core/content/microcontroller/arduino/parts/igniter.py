@@ -15,6 +15,8 @@ from core.logic.rocket_definition import Part, Rocket
 class IgniterSensor(Part):
     type = 'Igniter'
 
+    measurement_priority = 'critical'
+
     enabled: bool = True
 
     min_update_period = timedelta(milliseconds=100)
@@ -16,6 +16,8 @@ from core.logic.rocket_definition import Part, Rocket
 class ServoSensor(Part):
     type = 'Servo'
 
+    measurement_priority = 'critical'
+
     enabled: bool = True
 
     min_update_period = timedelta(milliseconds=50)
@@ -113,6 +113,12 @@ class OrientationSensor(Part, IOrientationSensor, IDataAge):
     
         return [[self.calibrated, self.quat[0], self.quat[1], self.quat[2], self.quat[3]]]
 
+    def apply_recorded_measurement(self, measurement, timestamp: float):
+
+        self.calibrated = bool(measurement.get('calibrated', False))
+        self.quat = np.array([measurement.get('W', 0), measurement.get('X', 0), measurement.get('Y', 0), measurement.get('Z', 0)], dtype=float)
+        self.last_data_received = timestamp
+
     def get_orientation(self):
         return (self.quat[0], self.quat[1], self.quat[2], self.quat[3])
     
@@ -7,6 +7,8 @@ class OpenCommand(Command):
 
     command_type = 'Control.Open'
 
+    critical_response = True
+
     payload_schema = None
 
     response_schema = BasicErrorResponseSchema()
@@ -19,6 +21,8 @@ class CloseCommand(Command):
 
     command_type = 'Control.Close'
 
+    critical_response = True
+
     payload_schema = None
 
     response_schema = BasicErrorResponseSchema()
@@ -30,6 +34,8 @@ class IgniteCommand(Command):
 
     command_type = 'Control.Ignite'
 
+    critical_response = True
+
     payload_schema = None
 
     response_schema = BasicErrorResponseSchema()
@@ -7,11 +7,12 @@ from uuid import UUID
 from core.logic.commands.command import Command
 from core.content.general_commands.enable import DisableCommand, EnableCommand
 from core.logic.rocket_definition import Command, Part, Rocket
+from core.logic.threaded_part import ThreadedPart
 from plyer import battery
 from plyer.facades.battery import Battery
 
 
-class PlyerBatterySensor(Part):
+class PlyerBatterySensor(ThreadedPart):
 
     type = 'Sensor.Battery'
 
@@ -41,7 +42,7 @@ class PlyerBatterySensor(Part):
     def get_accepted_commands(self) -> list[Type[Command]]:
         return [EnableCommand, DisableCommand]
    
-    def update(self, commands: Iterable[Command], now, iteration):
+    def update_commands(self, commands: Iterable[Command], now, iteration):
         
         for c in commands:
             if isinstance(c, EnableCommand):
@@ -53,19 +54,28 @@ class PlyerBatterySensor(Part):
                 continue
             
             c.state = 'success'
+
+    def work(self, now, iteration):
         
-        if self.enabled and not self.sensor_failed:
-            try:    
-                as_battery = cast(Battery, battery)
-                as_battery.get_state()
-                self.is_charging = as_battery.status['isCharging']
-                self.battery_percent = as_battery.status['percentage']
-            except Exception as e:
-                self.logger.error(f'Plyer battery sensor failed: {e}')
-                self.sensor_failed = True
-        else:
+        if not self.enabled or self.sensor_failed:
+            return None
+
+        as_battery = cast(Battery, battery)
+        as_battery.get_state()
+        return (as_battery.status['isCharging'], as_battery.status['percentage'])
+
+    def apply_result(self, result, submit_time, finish_time):
+
+        if result is None:
             self.is_charging = None
             self.battery_percent = None
+            return
+
+        self.is_charging, self.battery_percent = result
+
+    def on_work_failed(self, exception: Exception):
+        self.logger.error(f'Plyer battery sensor failed: {exception}')
+        self.sensor_failed = True
             
     def get_measurement_shape(self) -> Iterable[Tuple[str, Type]]:
         return [
@@ -7,10 +7,11 @@ from uuid import UUID
 from core.logic.commands.command import Command
 from core.content.general_commands.enable import DisableCommand, EnableCommand
 from core.logic.rocket_definition import Command, Part, Rocket
+from core.logic.threaded_part import ThreadedPart
 from plyer import gravity
 from plyer.facades.gravity import Gravity
 
-class PlyerGravitySensor(Part):
+class PlyerGravitySensor(ThreadedPart):
 
     type = 'Sensor.Gravity'
 
@@ -24,9 +25,9 @@ class PlyerGravitySensor(Part):
 
     sensor_failed: bool = False
 
-    gravity_value: Union[None, Tuple[float, float, float]]
+    gravity_value: Union[None, Tuple[float, float, float]] = None
 
-    iteration_gravity_value: Union[None, Tuple[float, float, float]]
+    iteration_gravity_value: Union[None, Tuple[float, float, float]] = None
 
     def __init__(self, _id: UUID, name: str, parent: Union[Part, Rocket, None], start_enabled = True):
 
@@ -55,7 +56,7 @@ class PlyerGravitySensor(Part):
     
         return True
    
-    def update(self, commands: Iterable[Command], now, iteration):
+    def update_commands(self, commands: Iterable[Command], now, iteration):
         
         for c in commands:
             if c is EnableCommand:
@@ -67,17 +68,23 @@ class PlyerGravitySensor(Part):
             else:
                 c.state = 'failed' # Part cannot handle this command
                 continue
-            
-        if self.enabled and not self.sensor_failed:
-            try:    
-                as_gravity = cast(Gravity, gravity)
-                self.iteration_gravity_value = self.gravity_value = as_gravity.gravity
-            except Exception as e:
-                self.logger.error(f'Plyer gravity sensor failed: {e}')
-                self.sensor_failed = True
-        else:
-            self.iteration_gravity_value = self.gravity_value = None
-            
+
+    def work(self, now, iteration):
+
+        if not self.enabled or self.sensor_failed:
+            return None
+
+        as_gravity = cast(Gravity, gravity)
+        return as_gravity.gravity
+
+    def apply_result(self, result, submit_time, finish_time):
+        self.iteration_gravity_value = self.gravity_value = result
+
+    def on_work_failed(self, exception: Exception):
+        self.logger.error(f'Plyer gravity sensor failed: {exception}')
+        self.sensor_failed = True
+        self.iteration_gravity_value = self.gravity_value = None
+
     def get_measurement_shape(self) -> Iterable[Tuple[str, Type]]:
         return [
             ('enabled', '?'),
@@ -0,0 +1,69 @@
+from datetime import timedelta
+import math
+from typing import Collection, Iterable, Sequence, Tuple, Type, Union
+from uuid import UUID
+
+from core.content.general_commands.enable import DisableCommand, EnableCommand
+from core.logic.commands.command import Command
+from core.logic.rocket_definition import Measurements, Part, Rocket
+
+
+class SyntheticPart(Part):
+    '''
+    Part without any hardware that produces a configurable amount of data.
+    Used to benchmark the flight executor (see `standalone/benchmark.py`)
+    '''
+
+    type = 'Testing.Synthetic'
+
+    virtual = True
+
+    min_update_period = timedelta(0)
+
+    min_measurement_period = timedelta(0)
+
+    enabled: bool = True
+
+    def __init__(self, _id: UUID, name: str, parent: Rocket, dependencies: Iterable[Part] = (), measurement_width: int = 8, measurements_per_tick: int = 1):
+        '''
+        :param measurement_width: Number of float values per measurement
+        :param measurements_per_tick: Number of measurements returned per collection
+        '''
+
+        self.measurement_width = measurement_width
+        self.measurements_per_tick = measurements_per_tick
+
+        super().__init__(_id, name, parent, dependencies) # type: ignore
+
+        self.values = [0.0]*measurement_width
+
+    def update(self, commands: Iterable[Command], now: float, iteration: int) -> Union[None, Collection[Command]]:
+
+        for c in commands:
+            if isinstance(c, EnableCommand):
+                self.enabled = True
+                c.state = 'success'
+            elif isinstance(c, DisableCommand):
+                self.enabled = False
+                c.state = 'success'
+            else:
+                c.state = 'failed'
+                c.response_message = f'Cannot process commands of type {c.command_type}'
+
+        # Some cheap work depending on the dependencies, so the update order matters
+        base = sum(d.values[0] for d in self.dependencies if isinstance(d, SyntheticPart))
+        for i in range(self.measurement_width):
+            self.values[i] = base + math.sin(now + i)
+
+    def get_measurement_shape(self) -> Collection[Tuple[str, str]]:
+        return [(f'value-{i}', 'f') for i in range(self.measurement_width)]
+
+    def get_accepted_commands(self) -> Iterable[Type[Command]]:
+        return [EnableCommand, DisableCommand]
+
+    def collect_measurements(self, now: float, iteration: int) -> Union[None, Sequence[Measurements]]:
+
+        if not self.enabled:
+            return []
+
+        return [self.values for _ in range(self.measurements_per_tick)]
@@ -1,9 +1,12 @@
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from logging import _nameToLevel, getLogger
 import time
+from time import perf_counter_ns
 from typing import Callable, Collection, Iterable, cast
 from datetime import datetime
 from core.api_client import ApiClient, RealtimeApiClient
+from core.helper.command_recorder import CommandRecorder
 from core.helper.file_logger import FileLogger
 from core.helper.global_data_dir import reset_flight_data_dir
 from core.logic.commands.command import Command, Command
@@ -11,8 +14,15 @@ from core.logic.commands.command_helper import deserialize_command, gather_known
 from core.logic.to_vessel_and_flight import to_vessel_and_flight
 from core.models.command import Command as CommandModel, CommandSchema
 from core.logic.execution import topological_sort
-from core.logic.measurement_sink import ApiMeasurementSinkBase, MeasurementSinkBase, MeasurementsByPart
+from core.logic.scheduler import DeadlineScheduler
+from core.logic.ticker import FixedRateTicker
+from core.content.executor.tick_timing import TickTimingSensor
+from core.content.executor.profiler import PHASE_COLLECT, PHASE_FLUSH, PHASE_UPDATE, ExecutorProfiler
+from core.logic.measurement_sink import ApiMeasurementSinkBase, MeasurementChunkLog, MeasurementSinkBase
+from core.logic.measurement_ring_buffer import MeasurementStore
 from core.logic.rocket_definition import Part, Rocket
+from core.logic.threaded_part import ThreadedPart
+from core.logic.isolated_part import IsolatedPart
 
 from core.models.flight import Flight
 
@@ -33,9 +43,23 @@ class FlightExecuter:
 
     executed_commands: list[Command]
 
+    command_response_coalesce_window: float
+    '''Time in seconds to wait for more completed commands to send their responses in a single request'''
+
+    max_command_responses_in_flight: int
+    '''Maximum number of concurrent requests for regular (not critical) command responses'''
+
     deleted: bool = False
 
-    def __init__(self, rocket: Rocket, flight: Flight, api_client: ApiClient, min_computation_frame_time: float = 0.050, min_ui_frame_time: float = 0.050) -> None:
+    def __init__(self, rocket: Rocket, flight: Flight, api_client: ApiClient, min_computation_frame_time: float = 0.050, min_ui_frame_time: float = 0.050, fixed_rate: bool = True, part_worker_threads: int = 4, command_response_coalesce_window: float = 0.020, max_command_responses_in_flight: int = 2, clock: Callable[[], float] = time.time) -> None:
+        '''
+        :param fixed_rate: If true, ticks are scheduled against absolute deadlines (see `FixedRateTicker`).
+        Otherwise the loop waits for the remainder of `min_computation_frame_time` after every tick
+        :param part_worker_threads: Size of the thread pool running the work of `ThreadedPart`s
+        :param command_response_coalesce_window: See `FlightExecuter.command_response_coalesce_window`
+        :param max_command_responses_in_flight: See `FlightExecuter.max_command_responses_in_flight`
+        :param clock: Source of the current time in unix seconds. Replaced by a virtual clock during replays
+        '''
     
         self.logger = getLogger('Flight Exector')
 
@@ -44,15 +68,33 @@ class FlightExecuter:
 
         self.rocket = rocket
         self.flight = flight
+        self.clock = clock
         self.min_computation_frame_time = min_computation_frame_time
         self.min_ui_frame_time = min_ui_frame_time
+        self.ticker = FixedRateTicker(min_computation_frame_time) if fixed_rate else None
 
         self.execution_order = topological_sort(self.rocket.parts)
+
+        # Compile all measurement shapes once, so the loop and the sinks don't have to
+        for p in self.execution_order:
+            p.get_measurement_descriptor()
+
+        # Replayed parts are stand-ins for recorded data and are never called
+        self.replayed_parts = set(p for p in self.execution_order if p.replayed)
+
+        self.scheduler = DeadlineScheduler([p for p in self.execution_order if not p.replayed])
         self.known_commands = gather_known_commands(self.rocket)
         self.command_schemas = make_command_schemas(self.known_commands)
 
         self.api_client = api_client
 
+        # Set by the control loop whenever commands completed, so responses are sent without polling
+        self.command_responses_available = asyncio.Event()
+        self.critical_command_responses_available = asyncio.Event()
+        self.command_response_coalesce_window = command_response_coalesce_window
+        self.max_command_responses_in_flight = max_command_responses_in_flight
+        self.command_response_slots = asyncio.Semaphore(max_command_responses_in_flight)
+        self.command_response_tasks = set[asyncio.Task]()
 
         self.send_command_responses_task = asyncio.get_event_loop().create_task(self.send_command_responses())
 
@@ -61,16 +103,48 @@ class FlightExecuter:
 
         reset_flight_data_dir()
         self.file_logger = FileLogger()
+        self.command_recorder = CommandRecorder()
 
         # Get list of all available measurement sinks
         self.measurement_sinks = [p for p in self.rocket.parts if isinstance(p, MeasurementSinkBase)]
 
+        # Measurements are written once into per part ring buffers, which the sinks read from
+        self.measurement_store = MeasurementStore(self.execution_order)
+
+        # and encoded once into the wire format for all sinks, bounded by the backlog limits of the sinks
+        self.measurement_chunks = MeasurementChunkLog(self.measurement_store, readers=self.measurement_sinks)
+
+        for sink in self.measurement_sinks:
+            sink.measurement_store = self.measurement_store
+            sink.measurement_chunks = self.measurement_chunks
+
         for p in self.rocket.parts:
             if isinstance(p, ApiMeasurementSinkBase):
                 self.logger.debug(f'Initialized part {p.type} as a measurement sink')
                 p.api_client = self.api_client
                 p.flight = self.flight
 
+            if isinstance(p, TickTimingSensor):
+                p.ticker = self.ticker
+
+        # Blocking work of threaded parts runs on a shared pool
+        threaded_parts = [p for p in self.rocket.parts if isinstance(p, ThreadedPart)]
+        self.thread_pool = ThreadPoolExecutor(part_worker_threads, thread_name_prefix='Part Worker') if len(threaded_parts) > 0 else None
+        for p in threaded_parts:
+            p.thread_pool = self.thread_pool
+            p.clock = self.clock
+
+        # Isolated parts compute in their own worker processes
+        self.isolated_parts = [p for p in self.rocket.parts if isinstance(p, IsolatedPart) and p.isolated]
+        for p in self.isolated_parts:
+            try:
+                p.start_worker()
+            except Exception as e:
+                self.logger.exception(f'{LOGGER_NAME}: Failed starting worker process of part {p.name}, running it on the control loop instead: {e}')
+
+        # Only time the part calls if there is a profiler to report them
+        self.profiler = next((p for p in self.rocket.parts if isinstance(p, ExecutorProfiler)), None)
+
         self.logger.addHandler(self.file_logger)
 
     def make_on_new_command(self):
@@ -81,6 +155,8 @@ class FlightExecuter:
                 self.logger.info(f'{LOGGER_NAME}: Received new command of type {c._command_type} with creation time {c.create_time} (ID: {c._id}, PartID: {c._part_id})')
                 c.state = 'received'
 
+            self.command_recorder.record(self.clock(), models)
+
             self.command_buffer.extend([deserialize_command(self.known_commands, c) for c in models])
         return on_new_command
 
@@ -92,13 +168,15 @@ class FlightExecuter:
 
     async def run_control_loop(self, update_ui_hook: Callable | None = None):
 
+        if self.ticker is not None:
+            await self.run_fixed_rate_control_loop(update_ui_hook)
+            return
+
         # Run the update loop
         flight_loop_iteration = 0
-        last_update: float = time.time()
+        last_update: float = self.clock()
         last_ui_update = 0
         while True:
-
-            update_start_time = time.time()
             
             update_end_time = self.control_loop(flight_loop_iteration, last_update)
             
@@ -115,6 +193,7 @@ class FlightExecuter:
 
             wait_time = self.min_computation_frame_time - time_passed
             if wait_time < 0:
+               await asyncio.sleep(0) # Still yield to not starve other tasks
                continue
         
             # cast(Label, core.label).text = f'Frame Time: {str((time_passed if time_passed > MAX_FRAME_TIME else MAX_FRAME_TIME)*1000)}ms'
@@ -136,9 +215,33 @@ class FlightExecuter:
 
             # await draw()
 
+    async def run_fixed_rate_control_loop(self, update_ui_hook: Callable | None = None):
+
+        assert self.ticker is not None
+
+        flight_loop_iteration = 0
+        last_update: float = self.clock()
+        last_ui_update = 0
+
+        self.ticker.start()
+
+        while True:
+
+            last_update = self.control_loop(flight_loop_iteration, last_update)
+
+            if last_update > (last_ui_update + self.min_ui_frame_time):
+                last_ui_update = last_update
+
+                if update_ui_hook is not None:
+                    update_ui_hook()
+
+            flight_loop_iteration += 1
+
+            await self.ticker.wait()
+
     def control_loop(self, iteration: int, last_update: float):
 
-        now = time.time()
+        now = self.clock()
         now_as_date = datetime.fromtimestamp(now)
 
         # Make a list of all new commands sorted by part
@@ -149,20 +252,21 @@ class FlightExecuter:
         if(self.logger.isEnabledFor(_nameToLevel['DEBUG'])):
             self.logger.debug(f'{LOGGER_NAME}: Control loop iteration {iteration}. Time {datetime.fromtimestamp(now)}. {len(new_commands)} pending')
 
-        # Call update on every part
-        for p in self.execution_order:
+        profiler = self.profiler
 
-            commands = commands_by_part.get(p) or []
+        # Call update on every part that is due this iteration
+        updated_parts = self.scheduler.pop_due_updates(now)
+        for p in updated_parts:
 
-            # Only update if the part is due for update this iteration
-            if (p.last_update is not None) and ((now - p.last_update) < p.min_update_period.total_seconds()):
-                self.command_buffer.extend(commands) # Re-queue all commands in this case
-                if p in commands_by_part:
-                    del commands_by_part[p]
-                continue
+            commands = commands_by_part.get(p) or []
 
             try:
-                generated_commands = p.update(commands, now, iteration)
+                if profiler is not None:
+                    call_start = perf_counter_ns()
+                    generated_commands = p.update(commands, now, iteration)
+                    profiler.record(p, PHASE_UPDATE, perf_counter_ns() - call_start)
+                else:
+                    generated_commands = p.update(commands, now, iteration)
 
                 if generated_commands is not None:
 
@@ -187,14 +291,32 @@ class FlightExecuter:
                 # print(f'{LOGGER_NAME}: Iteration {iteration}: Part {p.name} failed to update {e}')
                 self.logger.exception(f'{LOGGER_NAME}: Iteration {iteration}: Part {p.name} failed to update {e}')
 
-        # Gather all measurements of all parts
-        current_measurements = MeasurementsByPart()
-        for p in self.execution_order:
-            # Only get measurements if the part is due for update this iteration or if there was a command for the part
-            if (p not in commands_by_part) and (p.last_measurement is not None) and ((now - p.last_measurement) < p.min_measurement_period.total_seconds()):
-                continue
+        self.scheduler.reschedule_updates(updated_parts)
+
+        # There is no part to process commands for replayed parts, the recording already contains the outcome
+        for p in [p for p in commands_by_part if p in self.replayed_parts]:
+            replayed_commands = commands_by_part.pop(p)
+            for c in replayed_commands:
+                c.state = 'success'
+                c.response_message = 'Replayed part'
+            self.queue_command_responses(replayed_commands)
+
+        # Re-queue all commands of parts that were not due for an update
+        updated_set = set(updated_parts)
+        for p in [p for p in commands_by_part if p not in updated_set]:
+            self.command_buffer.extend(commands_by_part.pop(p))
+
+        # Gather all measurements of all parts that are due or that had commands this iteration
+        measured_parts = self.scheduler.pop_due_measurements(now, commands_by_part.keys())
+        measurement_count = 0
+        for p in measured_parts:
             try:
-                measurements = p.collect_measurements(now, iteration)
+                if profiler is not None:
+                    call_start = perf_counter_ns()
+                    measurements = p.collect_measurements(now, iteration)
+                    profiler.record(p, PHASE_COLLECT, perf_counter_ns() - call_start)
+                else:
+                    measurements = p.collect_measurements(now, iteration)
 
                 if(self.logger.isEnabledFor(_nameToLevel['DEBUG'])):
                     self.logger.debug(f'{LOGGER_NAME}: Iteration {iteration}. Part {p.name} successfully collected measurements. New measurements: {len(measurements) if measurements is not None else "None"}')
@@ -202,37 +324,50 @@ class FlightExecuter:
                 if measurements is None:
                     continue
 
-                shape =  p.get_measurement_shape()
+                p.get_measurement_descriptor().validate(measurements)
+
+                start, end = (p.last_measurement or now, now)
+
+                # Measurements of threaded parts are as old as the result of their work
+                if isinstance(p, ThreadedPart) and p.result_time is not None:
+                    start = end = p.result_time
+                    p.result_time = None
 
-                for m in measurements:
-                    if len(m) <= len(shape):
-                        continue
-                    raise Exception(f'A measurement of length {len(m)} was returned, but the part only supports measurements up to length {len(shape)}. Please verify that the get_measurement_shape method matches what is returned by collect_measurements')
+                rejected = self.measurement_store.append(p, start, end, measurements)
+                if rejected > 0:
+                    self.logger.warning(f'{LOGGER_NAME}: Iteration {iteration}: {rejected} measurements of part {p.name} could not be stored as they do not match the measurement shape')
 
-                current_measurements[p] = (p.last_measurement or now, now, measurements)
+                measurement_count += len(measurements)
                 p.last_measurement = now
             except Exception as e:
                 self.logger.exception(f'{LOGGER_NAME}: Iteration {iteration}: Part {p.name} failed to take measurements: {e}')
 
-        # Flush all parts (free memory)
-        for p in self.execution_order:
+        self.scheduler.reschedule_measurements(measured_parts)
+
+        self.measurement_chunks.update(now)
+
+        # Flush all parts that did something this iteration (free memory)
+        measured_set = set(measured_parts)
+        for p in self.scheduler.sort(updated_set.union(measured_set)):
             try:
-                p.flush()
+                if profiler is not None:
+                    call_start = perf_counter_ns()
+                    p.flush()
+                    profiler.record(p, PHASE_FLUSH, perf_counter_ns() - call_start)
+                else:
+                    p.flush()
             except:
                 self.logger.exception(f'{LOGGER_NAME}: Iteration {iteration}: Part {p.name} failed to flush')
 
 
         # Set all commands to be executed, except those that are currently set to be prossesing
         for commands in commands_by_part.values():
-            self.executed_commands.extend([c for c in commands if is_completed_command(c)])
+            self.queue_command_responses([c for c in commands if is_completed_command(c)])
             self.command_buffer.extend([c for c in commands if not is_completed_command(c)])
 
-        if len(current_measurements) < 1:
+        if measurement_count < 1:
             return now
 
-        for sink in self.measurement_sinks:
-            sink.measurement_buffer.append(current_measurements)
-
         self.file_logger.flush()
 
         return now
@@ -250,29 +385,74 @@ class FlightExecuter:
                 commands_by_part[part_of_command] = list()
             commands_by_part[part_of_command].append(c)
     
+    def queue_command_responses(self, commands: Collection[Command]):
+        '''Queues the responses of completed commands and wakes up the response task'''
+
+        if len(commands) < 1:
+            return
+
+        self.executed_commands.extend(commands)
+        self.command_responses_available.set()
+
+        if any(c.critical_response for c in commands):
+            self.critical_command_responses_available.set()
+
     async def send_command_responses(self):
 
-        # abort = await self.init_flight_task
+        while not self.deleted:
 
-        # if abort:
-        #     return
+            await self.command_responses_available.wait()
 
-        while True:
+            # Give commands completing shortly after each other the chance to be sent in
+            # a single request. Critical responses skip the wait
+            if not self.critical_command_responses_available.is_set():
+                try:
+                    await asyncio.wait_for(self.critical_command_responses_available.wait(), self.command_response_coalesce_window)
+                except asyncio.TimeoutError:
+                    pass
 
-            if self.deleted:
-                return
+            uses_slot = False
+            if not self.critical_command_responses_available.is_set():
+                uses_slot = await self.wait_for_command_response_slot()
 
-            if len(self.executed_commands) < 1:
-                await asyncio.sleep(0.01)
-                continue
+            self.command_responses_available.clear()
+            self.critical_command_responses_available.clear()
 
             # swap buffer
             commands_to_send = self.executed_commands
             self.executed_commands = list()
 
             if len(commands_to_send) < 1:
-                return
+                if uses_slot:
+                    self.command_response_slots.release()
+                continue
+
+            task = asyncio.create_task(self.send_command_response_batch(commands_to_send, uses_slot))
+            self.command_response_tasks.add(task)
+            task.add_done_callback(self.command_response_tasks.discard)
+
+    async def wait_for_command_response_slot(self) -> bool:
+        '''
+        Waits until less than `max_command_responses_in_flight` regular requests are running.
+        Returns True if a slot was taken, or False if a critical response arrived in the meantime
+        (critical responses are sent regardless of the number of requests in flight)
+        '''
+
+        acquire_task = asyncio.ensure_future(self.command_response_slots.acquire())
+        critical_task = asyncio.ensure_future(self.critical_command_responses_available.wait())
+
+        try:
+            await asyncio.wait([acquire_task, critical_task], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            critical_task.cancel()
+            if not acquire_task.done():
+                acquire_task.cancel()
 
+        return acquire_task.done() and not acquire_task.cancelled()
+
+    async def send_command_response_batch(self, commands_to_send: list[Command], uses_slot: bool):
+
+        try:
             # Set all commands to failed, if they haven't been processed yet
             for c in commands_to_send:
                 if c.state == 'dispatched' or c.state == 'received':
@@ -293,18 +473,26 @@ class FlightExecuter:
                 self.logger.info(f'{LOGGER_NAME}: Successfully trasmitted {len(commands_to_send)} commands')
             except Exception as e:
                 self.logger.exception(f'{LOGGER_NAME}: Failed sending {len(models)} command responses: {e}')
+        finally:
+            if uses_slot:
+                self.command_response_slots.release()
 
     def __del__(self):
 
-        if not self.control_loop_task.done():
-            self.control_loop_task.cancel()
-
-        if not self.init_flight_task.done():
-            self.init_flight_task.cancel()
-
         if not self.send_command_responses_task.done():
             self.send_command_responses_task.cancel()
 
+        for task in list(self.command_response_tasks):
+            task.cancel()
+
+        if self.thread_pool is not None:
+            self.thread_pool.shutdown(wait=False, cancel_futures=True)
+
+        for p in self.isolated_parts:
+            p.stop_worker()
+
+        self.command_recorder.close()
+
         if self.file_logger is not None:
             self.file_logger.flush()
             self.logger.removeHandler(self.file_logger)
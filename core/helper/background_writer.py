@@ -0,0 +1,278 @@
+import atexit
+from collections import deque
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Union
+
+IOV_MAX = 1024
+'''Maximum number of buffers passed to a single writev call'''
+
+
+class BackgroundFile:
+    '''
+    File written by the background writer thread. Writing only queues the data,
+    so it never blocks on the storage. Create through `BackgroundWriter.open`
+    '''
+
+    fd: Union[None, int] = None
+
+    failed: bool = False
+    '''Set if the file could not be opened or written to. All further writes are dropped'''
+
+    closed: bool = False
+
+    last_sync: float = 0
+
+    dropped_bytes: int = 0
+    '''Bytes written to this file that were dropped, see `BackgroundWriter.dropped_bytes`'''
+
+    def __init__(self, writer: 'BackgroundWriter', path: Path, fsync_period: Union[None, float]):
+        self.writer = writer
+        self.path = path
+        self.fsync_period = fsync_period
+
+    def write(self, data: bytes) -> bool:
+        '''Queues the data. Returns False if it was dropped (queue full or file failed)'''
+        return self.writer.enqueue(self, data)
+
+    def close(self):
+        '''Closes the file after all queued data is written'''
+        self.writer.enqueue(self, None)
+
+
+class BackgroundWriter:
+    '''
+    Single thread doing the file I/O of the flight computer, so a slow storage can never
+    delay the control loop. Writes of all files are queued into one bounded queue. The
+    thread drains the queue every `flush_period` (or as soon as it is half full) and
+    writes all data queued for a file with a single writev call.
+
+    If the queue is full, new data is dropped and counted in `dropped_bytes`.
+    '''
+
+    max_queue_bytes: int
+
+    flush_period: float
+    '''Max time in seconds data waits in the queue before it is written to the OS'''
+
+    queued_bytes: int = 0
+
+    dropped_bytes: int = 0
+
+    written_bytes: int = 0
+
+    write_errors: int = 0
+
+    def __init__(self, max_queue_bytes: int = 8*1024*1024, flush_period: float = 0.1):
+
+        self.max_queue_bytes = max_queue_bytes
+        self.flush_period = flush_period
+
+        self.queue = deque[tuple[BackgroundFile, Union[None, bytes]]]()
+        self.condition = threading.Condition()
+        self.open_files = set[BackgroundFile]()
+
+        self.stopping = False
+        self.busy = False
+
+        self.thread = threading.Thread(target=self.run, name='Background Writer', daemon=True)
+        self.thread.start()
+
+    @property
+    def queue_depth(self) -> int:
+        '''Number of writes currently waiting in the queue'''
+        return len(self.queue)
+
+    def open(self, path: Union[str, Path], fsync_period: Union[None, float] = None) -> BackgroundFile:
+        '''
+        Returns a file data is appended to. The file (and its folder) is created by the writer thread.
+
+        :param fsync_period: If set, the file is synced to the storage at most this often (seconds).
+        Otherwise the data is only handed to the OS, which survives a crash of the app but not of the device
+        '''
+        return BackgroundFile(self, Path(path), fsync_period)
+
+    def enqueue(self, file: BackgroundFile, data: Union[None, bytes]) -> bool:
+
+        with self.condition:
+
+            if file.failed or file.closed:
+                if data is not None:
+                    self.drop(file, len(data))
+                return False
+
+            if data is None:
+                file.closed = True
+            elif self.queued_bytes + len(data) > self.max_queue_bytes:
+                self.drop(file, len(data))
+                return False
+            else:
+                self.queued_bytes += len(data)
+
+            self.queue.append((file, data))
+
+            if data is None or self.queued_bytes > self.max_queue_bytes/2:
+                self.condition.notify()
+
+        return True
+
+    def drop(self, file: BackgroundFile, size: int):
+        '''Counts dropped data. The counters are updated by the loop and the writer thread, so under the lock'''
+
+        with self.condition:
+            self.dropped_bytes += size
+            file.dropped_bytes += size
+
+    def flush(self, timeout: float = 5) -> bool:
+        '''Blocks until everything queued so far is written. Returns False on timeout'''
+
+        deadline = time.monotonic() + timeout
+
+        with self.condition:
+            self.condition.notify()
+            while len(self.queue) > 0 or self.busy:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(min(remaining, self.flush_period))
+
+        return True
+
+    def stop(self):
+        self.flush()
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        self.thread.join(timeout=5)
+
+    def run(self):
+
+        while True:
+
+            with self.condition:
+                if len(self.queue) < 1 and not self.stopping:
+                    self.condition.wait(self.flush_period)
+
+                if self.stopping and len(self.queue) < 1:
+                    break
+
+                batch = list(self.queue)
+                self.queue.clear()
+                self.queued_bytes = 0
+                self.busy = True
+
+            try:
+                self.write_batch(batch)
+                self.sync_due_files()
+            finally:
+                with self.condition:
+                    self.busy = False
+                    self.condition.notify_all()
+
+        for f in list(self.open_files):
+            self.close_file(f)
+
+    def write_batch(self, batch: list[tuple[BackgroundFile, Union[None, bytes]]]):
+
+        # Group the data by file, keeping the order of the writes of each file
+        buffers = dict[BackgroundFile, list[bytes]]()
+        to_close = list[BackgroundFile]()
+
+        for file, data in batch:
+            if data is None:
+                to_close.append(file)
+            else:
+                buffers.setdefault(file, list()).append(data)
+
+        for file, file_buffers in buffers.items():
+            self.write_file(file, file_buffers)
+
+        for file in to_close:
+            self.close_file(file)
+
+    def write_file(self, file: BackgroundFile, file_buffers: list[bytes]):
+
+        if file.failed:
+            self.drop(file, sum(len(b) for b in file_buffers))
+            return
+
+        try:
+            if file.fd is None:
+                file.path.parent.mkdir(parents=True, exist_ok=True)
+                file.fd = os.open(file.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+                file.last_sync = time.monotonic()
+                self.open_files.add(file)
+
+            for i in range(0, len(file_buffers), IOV_MAX):
+                self.write_all(file.fd, file_buffers[i:i + IOV_MAX])
+
+        except OSError:
+            file.failed = True
+            self.write_errors += 1
+            self.drop(file, sum(len(b) for b in file_buffers))
+
+    def write_all(self, fd: int, buffers: list[bytes]):
+
+        total = sum(len(b) for b in buffers)
+        written = os.writev(fd, buffers) if hasattr(os, 'writev') else os.write(fd, b''.join(buffers))
+        self.written_bytes += written
+
+        # Short write, write the rest in one piece
+        if written < total:
+            rest = memoryview(b''.join(buffers))[written:]
+            while len(rest) > 0:
+                n = os.write(fd, rest)
+                self.written_bytes += n
+                rest = rest[n:]
+
+    def sync_due_files(self):
+
+        now = time.monotonic()
+
+        for file in list(self.open_files):
+            if file.fd is None or file.fsync_period is None or now < file.last_sync + file.fsync_period:
+                continue
+
+            file.last_sync = now
+
+            try:
+                os.fsync(file.fd)
+            except OSError:
+                self.write_errors += 1
+
+    def close_file(self, file: BackgroundFile):
+
+        self.open_files.discard(file)
+
+        if file.fd is None:
+            return
+
+        try:
+            if file.fsync_period is not None:
+                os.fsync(file.fd)
+            os.close(file.fd)
+        except OSError:
+            self.write_errors += 1
+
+        file.fd = None
+
+
+background_writer: Union[None, BackgroundWriter] = None
+
+background_writer_lock = threading.Lock()
+
+
+def get_background_writer() -> BackgroundWriter:
+    '''The writer shared by all file writers of the flight computer, started on first use'''
+
+    global background_writer
+
+    with background_writer_lock:
+        if background_writer is None:
+            background_writer = BackgroundWriter()
+            # The thread is a daemon, write what is still queued when the app exits
+            atexit.register(background_writer.stop)
+
+    return background_writer
@@ -0,0 +1,253 @@
+# Crash safe ring file of the black box measurement sink
+#
+# The file is preallocated and memory mapped. Data written to the map is owned by the
+# OS as soon as it is copied, so it survives a crash of the app. It is synced to the
+# storage periodically, which bounds what can be lost if the whole device dies.
+#
+# Layout:
+#
+#   !4sHQI  magic, format version, size of the data region, length of the part header
+#   part header (see core.helper.measurement_file.encode_header)
+#   padding up to HEADER_REGION_SIZE
+#   data region, used as a ring of frames:
+#     !4sQHHII frame magic, sequence number, part index, record count, payload length, crc32
+#     payload: records in the layout of the measurement file
+#
+# The crc covers the frame header (without the crc itself) and the payload. Frames are
+# written back to back. If a frame does not fit before the end of the data region, writing
+# continues at its start. Older frames are overwritten, either completely or partially.
+# Partially overwritten frames fail the crc check and are skipped by the recovery scanner.
+
+from dataclasses import dataclass
+import mmap
+import os
+from pathlib import Path
+import struct
+from typing import Iterable, Tuple, Union
+import zlib
+
+import numpy as np
+
+from core.helper.measurement_file import BLOCK_HEADER, MeasurementFilePart, encode_header, read_header
+from core.logic.rocket_definition import Part
+
+MAGIC = b'RSSB'
+
+FORMAT_VERSION = 1
+
+BLACK_BOX_FILE_EXTENSION = '.rssb'
+
+FILE_HEADER = struct.Struct('!4sHQI')
+
+HEADER_REGION_SIZE = 64*1024
+'''Space reserved for the file header, the data region starts after it'''
+
+FRAME_MAGIC = b'BBFR'
+
+FRAME_HEADER = struct.Struct('!4sQHHII')
+
+MAX_FRAME_RECORDS = 2**16 - 1
+
+
+class BlackBoxFileError(Exception):
+    pass
+
+
+class BlackBoxWriter:
+    '''Writes frames into a preallocated, memory mapped ring file'''
+
+    sequence: int = 0
+    '''Sequence number of the next frame'''
+
+    position: int = 0
+    '''Position of the next frame within the data region'''
+
+    wraps: int = 0
+
+    bytes_written: int = 0
+
+    def __init__(self, path: Union[str, Path], data_size: int, parts: Iterable[Part]):
+
+        part_header = encode_header(parts)
+
+        if FILE_HEADER.size + len(part_header) > HEADER_REGION_SIZE:
+            raise BlackBoxFileError('Too many parts to fit the header region')
+
+        self.data_size = data_size
+
+        file_size = HEADER_REGION_SIZE + data_size
+
+        self.file = open(path, 'w+b')
+
+        # Allocate all blocks upfront, so writing to the map can't fail later because the storage is full
+        try:
+            os.posix_fallocate(self.file.fileno(), 0, file_size)
+        except (AttributeError, OSError):
+            self.file.truncate(file_size)
+
+        self.map = mmap.mmap(self.file.fileno(), file_size)
+
+        self.map[0:FILE_HEADER.size] = FILE_HEADER.pack(MAGIC, FORMAT_VERSION, data_size, len(part_header))
+        self.map[FILE_HEADER.size:FILE_HEADER.size + len(part_header)] = part_header
+
+        self.sequence = 0
+        self.position = 0
+
+    def write(self, part: Part, records: np.ndarray) -> int:
+        '''Writes the records (see `MeasurementRingBuffer`) of a part. Returns the number of bytes written'''
+
+        return self.write_block(part, len(records), part.get_measurement_descriptor().encode_records(records))
+
+    def write_block(self, part: Part, count: int, payload: bytes) -> int:
+        '''Writes records of a part already encoded in the wire format. Returns the number of bytes written'''
+
+        record_size = part.get_measurement_descriptor().size
+
+        written = 0
+
+        for start in range(0, count, MAX_FRAME_RECORDS):
+            frame_count = min(MAX_FRAME_RECORDS, count - start)
+            written += self.write_frame(part._index, frame_count, payload[start*record_size:(start + frame_count)*record_size])
+
+        return written
+
+    def write_frame(self, part_index: int, count: int, payload: bytes) -> int:
+
+        frame_size = FRAME_HEADER.size + len(payload)
+
+        if frame_size > self.data_size:
+            return 0
+
+        if self.position + frame_size > self.data_size:
+            self.position = 0
+            self.wraps += 1
+
+        crc = zlib.crc32(payload, zlib.crc32(FRAME_HEADER.pack(FRAME_MAGIC, self.sequence, part_index, count, len(payload), 0)[:-4]))
+
+        start = HEADER_REGION_SIZE + self.position
+
+        # Payload first, so a frame never has a valid header with a partially written payload
+        self.map[start + FRAME_HEADER.size:start + frame_size] = payload
+        self.map[start:start + FRAME_HEADER.size] = FRAME_HEADER.pack(FRAME_MAGIC, self.sequence, part_index, count, len(payload), crc)
+
+        self.sequence += 1
+        self.position += frame_size
+        self.bytes_written += frame_size
+
+        return frame_size
+
+    def sync(self):
+        '''Writes the dirty pages of the map to the storage (blocking)'''
+        self.map.flush()
+
+    def close(self):
+        try:
+            self.map.flush()
+            self.map.close()
+        finally:
+            self.file.close()
+
+
+@dataclass
+class RecoveredFrame:
+
+    sequence: int
+
+    part: MeasurementFilePart
+
+    records: np.ndarray
+
+
+@dataclass
+class RecoveredBlackBox:
+
+    parts: dict[int, MeasurementFilePart]
+
+    part_header: bytes
+    '''The encoded part header, as used in measurement files'''
+
+    frames: list[RecoveredFrame]
+    '''All intact frames, ordered by sequence number (i.e. the order they were written in)'''
+
+    missing_frames: int
+    '''Frames between the oldest and the newest recovered frame that were lost (partially overwritten or corrupted)'''
+
+
+def scan_black_box(path: Union[str, Path]) -> RecoveredBlackBox:
+    '''
+    Recovers all intact frames of a black box file, e.g. after an unclean shutdown.
+    The data region is scanned for frame headers, every frame with a valid crc is kept
+    '''
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    try:
+        magic, version, data_size, part_header_length = FILE_HEADER.unpack_from(data, 0)
+    except struct.error:
+        raise BlackBoxFileError('File is too short to contain a header')
+
+    if magic != MAGIC:
+        raise BlackBoxFileError('Not a black box file')
+
+    if version != FORMAT_VERSION:
+        raise BlackBoxFileError(f'Unsupported black box file version {version}')
+
+    parts, _ = read_header(data[FILE_HEADER.size:FILE_HEADER.size + part_header_length])
+
+    region = memoryview(data)[HEADER_REGION_SIZE:HEADER_REGION_SIZE + data_size]
+    region_bytes = data[HEADER_REGION_SIZE:HEADER_REGION_SIZE + data_size]
+
+    frames = dict[int, RecoveredFrame]()
+
+    pos = region_bytes.find(FRAME_MAGIC)
+    while pos >= 0 and pos + FRAME_HEADER.size <= len(region):
+
+        frame = read_frame(region, pos, parts)
+
+        if frame is None:
+            pos = region_bytes.find(FRAME_MAGIC, pos + 1)
+            continue
+
+        recovered, frame_size = frame
+        frames[recovered.sequence] = recovered
+        pos = region_bytes.find(FRAME_MAGIC, pos + frame_size)
+
+    ordered = [frames[s] for s in sorted(frames)]
+
+    missing = (ordered[-1].sequence - ordered[0].sequence + 1 - len(ordered)) if len(ordered) > 0 else 0
+
+    return RecoveredBlackBox(parts, data[FILE_HEADER.size:FILE_HEADER.size + part_header_length], ordered, missing)
+
+
+def read_frame(region: memoryview, pos: int, parts: dict[int, MeasurementFilePart]) -> Union[None, Tuple[RecoveredFrame, int]]:
+
+    _, sequence, part_index, count, payload_length, crc = FRAME_HEADER.unpack_from(region, pos)
+
+    part = parts.get(part_index)
+
+    if part is None or payload_length != count*part.dtype.itemsize:
+        return None
+
+    payload_start = pos + FRAME_HEADER.size
+
+    if payload_start + payload_length > len(region):
+        return None
+
+    header_crc = zlib.crc32(region[pos:pos + FRAME_HEADER.size - 4])
+    if zlib.crc32(region[payload_start:payload_start + payload_length], header_crc) != crc:
+        return None
+
+    records = np.frombuffer(region, dtype=part.dtype, count=count, offset=payload_start).copy()
+
+    return (RecoveredFrame(sequence, part, records), FRAME_HEADER.size + payload_length)
+
+
+def write_recovered_measurement_file(recovered: RecoveredBlackBox, path: Union[str, Path]):
+    '''Writes the recovered timeline as a measurement file (see `core.helper.measurement_file`), e.g. to replay it'''
+
+    with open(path, 'wb') as f:
+        f.write(recovered.part_header)
+        for frame in recovered.frames:
+            f.write(BLOCK_HEADER.pack(frame.part.index, len(frame.records)))
+            f.write(frame.records.tobytes())
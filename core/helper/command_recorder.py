@@ -0,0 +1,68 @@
+import json
+from pathlib import Path
+from typing import Any, Collection, Iterator, Tuple
+
+from core.helper.background_writer import BackgroundFile, get_background_writer
+from core.helper.global_data_dir import get_cur_flight_data_dir
+from core.models.command import Command as CommandModel, CommandSchema
+
+COMMANDS_FILE_NAME = 'commands.jsonl'
+
+
+class CommandRecorder:
+    '''
+    Records every command received from the server into the flight folder (one json object
+    per line with the receive time and the command), so a flight can be replayed later
+    '''
+
+    current_file_handle: BackgroundFile | None = None
+
+    def __init__(self):
+        self.cur_flight_dir = Path(get_cur_flight_data_dir())
+        self.failed = False
+        self.schema = CommandSchema()
+
+    def record(self, now: float, models: Collection[CommandModel]):
+
+        if self.failed or len(models) < 1:
+            return
+
+        if self.current_file_handle is None:
+            self.current_file_handle = get_background_writer().open(self.cur_flight_dir / COMMANDS_FILE_NAME, fsync_period=1)
+
+        lines = ''.join(json.dumps({ 'time': now, 'command': self.schema.dump(c) }) + '\n' for c in models)
+
+        self.current_file_handle.write(lines.encode())
+
+        if self.current_file_handle.failed:
+            self.failed = True
+
+    def close(self):
+        if self.current_file_handle is None:
+            return
+
+        self.current_file_handle.close()
+        self.current_file_handle = None
+
+
+def read_recorded_commands(folder: Path) -> Iterator[Tuple[float, CommandModel]]:
+    '''Reads the commands recorded into a flight folder (receive time, command)'''
+
+    path = folder / COMMANDS_FILE_NAME
+
+    if not path.exists():
+        return
+
+    schema = CommandSchema()
+
+    with path.open('r') as f:
+        for line in f:
+            if len(line.strip()) < 1:
+                continue
+
+            try:
+                record: dict[str, Any] = json.loads(line)
+            except json.JSONDecodeError:
+                break # Last line was not written completely
+
+            yield (float(record['time']), schema.load_safe(CommandModel, record['command']))
@@ -1,38 +1,27 @@
 from datetime import UTC, datetime
-from io import TextIOWrapper
 import logging
 from pathlib import Path
 import time
 
+from core.helper.background_writer import BackgroundFile, get_background_writer
 from core.helper.global_data_dir import get_cur_flight_data_dir
 
 
 class FileLogger(logging.Handler):
+    '''Writes all log records into the flight folder through the background writer'''
 
-    current_file_handle: TextIOWrapper | None = None
+    current_file_handle: BackgroundFile | None = None
 
     def __init__(self, level=logging.NOTSET):
         super(FileLogger, self).__init__(level=level)
 
         self.cur_flight_dir = Path(get_cur_flight_data_dir())
-        self.folder_created = False
         self.last_file_created = time.time()
         self.current_file_count = 0
         self.max_file_age = 60*5
 
     def create_next_file_handle_if_required(self):
 
-        if not self.folder_created:
-            try:
-
-                self.cur_flight_dir.mkdir(parents=True, exist_ok=True)
-
-            except Exception as e:
-                
-                pass # We cannot log here as this is called from the logger
-
-            self.folder_created = True
-
         self.open_new_file_if_required()
 
         
@@ -55,10 +44,8 @@ class FileLogger(logging.Handler):
 
         path = Path(f'{self.cur_flight_dir.as_posix()}/log_{self.current_file_count}.txt')
 
-        try:
-            self.current_file_handle = path.open('a')
-        except Exception as e:
-            pass
+        # The file and its folder are created by the background writer
+        self.current_file_handle = get_background_writer().open(path)
 
 
     def emit(self, record):
@@ -71,21 +58,13 @@ class FileLogger(logging.Handler):
             
             content = self.format(record)
 
-            try:
-                self.current_file_handle.write( f'{datetime.now(UTC).isoformat()}: {content}\n')
-            except Exception as e:
-                pass
+            # Never blocks, if the writer is overwhelmed the line is dropped
+            self.current_file_handle.write(f'{datetime.now(UTC).isoformat()}: {content}\n'.encode())
 
         f()
         # Clock.schedule_once(f)
 
     def flush(self):
-        if self.current_file_handle is None:
-            return
-        
-        try:
-            self.current_file_handle.flush()
-        except:
-            pass
+        pass # The background writer writes the queued lines periodically
 
 
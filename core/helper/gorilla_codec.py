@@ -0,0 +1,319 @@
+# Gorilla style compression of measurement records (delta of delta timestamps, XOR encoded values)
+#
+# The records of a block are encoded column by column, every column starts at a byte boundary:
+#
+#   timestamp  converted to integer microseconds. The first one is stored with 64 bits,
+#              every following one as the difference of its delta to the previous delta:
+#                '0'                   delta of delta is 0
+#                '10'   + 7 bits       zigzag encoded delta of delta < 2^7
+#                '110'  + 9 bits       < 2^9
+#                '1110' + 12 bits      < 2^12
+#                '1111' + 64 bits      otherwise
+#   numbers    (floats, integers, flags) the bit pattern is XORed with the previous value (0 for the first):
+#                '0'                   same value as before
+#                '1' + leading zeros (L bits) + meaningful bits - 1 (L bits) + meaningful bits
+#              with L = log2 of the width of the field, e.g. 5 for 32 bit floats
+#   strings    stored as is
+#
+# Unlike the original Gorilla encoding every value is encoded independently of the encoding of
+# the previous one (no reuse of the previous bit window), so the encoder can be vectorized.
+# Timestamps are rounded to microseconds, so the encoding is lossy for timestamps. All other values are lossless.
+#
+# The compression ratio depends on the data (see standalone/encode_benchmark.py): about 3x for
+# quantized sensor channels that partly hold their value between samples, about 1.6x if every
+# float changes with every sample.
+
+from typing import Tuple, Union
+
+import numpy as np
+
+from core.logic.measurement_descriptor import TIMESTAMP_FIELD
+
+TIMESTAMP_RESOLUTION = 1_000_000
+'''Timestamps are stored as integer multiples of 1/TIMESTAMP_RESOLUTION seconds'''
+
+DELTA_BUCKETS = [(0b10, 2, 7), (0b110, 3, 9), (0b1110, 4, 12), (0b1111, 4, 64)]
+'''Prefix, prefix length and payload length of the delta of delta encoding'''
+
+UNSIGNED_TYPES = {1: np.uint8, 2: np.uint16, 4: np.uint32, 8: np.uint64}
+
+SLICE_SIZE = 4096
+'''Records encoded at once. Bounds the temporary arrays of the vectorized encoder'''
+
+ALL_BITS = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def bit_length(values: np.ndarray) -> np.ndarray:
+    '''Number of bits required to represent each of the unsigned 64 bit values'''
+
+    values = values.astype(np.uint64)
+    res = np.zeros(values.shape, dtype=np.int64)
+
+    for shift in (32, 16, 8, 4, 2, 1):
+        shifted = values >> np.uint64(shift)
+        larger = shifted != 0
+        res += larger*shift
+        values = np.where(larger, shifted, values)
+
+    return res + (values != 0)
+
+
+def merge_into(words: np.ndarray, indices: np.ndarray, values: np.ndarray):
+    '''ORs the values into the words at the (non decreasing) indices'''
+
+    if len(indices) < 1:
+        return
+
+    firsts = np.flatnonzero(np.diff(indices, prepend=-1))
+
+    words[indices[firsts]] |= np.bitwise_or.reduceat(values, firsts)
+
+
+class BitWriter:
+    '''
+    Appends codes of up to 64 bits (most significant bit first) to a bitstream. The codes are
+    placed into 64 bit words directly, every code touches at most two of them
+    '''
+
+    def __init__(self):
+        self.words = list[np.ndarray]()
+        self.partial = np.uint64(0)
+        '''The word currently written to'''
+        self.bits = 0
+
+    def write(self, values: np.ndarray, lengths: np.ndarray):
+        '''Appends the lowest `lengths[i]` bits of every value'''
+
+        used = lengths > 0
+        values = values[used].astype(np.uint64)
+        lengths = lengths[used].astype(np.int64)
+
+        if len(values) < 1:
+            return
+
+        values &= ALL_BITS >> (64 - lengths).astype(np.uint64)
+
+        # Position of every code relative to the start of the current word
+        ends = np.cumsum(lengths) + (self.bits & 63)
+        starts = ends - lengths
+
+        word = starts >> 6
+        offset = starts & 63
+        spill = offset + lengths - 64
+
+        # Complete words and the one written to next
+        complete = int(ends[-1] >> 6)
+        words = np.zeros((complete + 1,), dtype=np.uint64)
+        words[0] = self.partial
+
+        inside = spill <= 0
+        merge_into(words, word[inside], values[inside] << (-spill[inside]).astype(np.uint64))
+
+        # Codes crossing a word boundary are split between two words
+        crossing = ~inside
+        merge_into(words, word[crossing], values[crossing] >> spill[crossing].astype(np.uint64))
+        merge_into(words, word[crossing] + 1, values[crossing] << (64 - spill[crossing]).astype(np.uint64))
+
+        self.bits += int(lengths.sum())
+
+        self.words.append(words[:complete])
+        self.partial = words[complete]
+
+    def getvalue(self) -> bytes:
+        '''The bitstream padded to full bytes'''
+
+        data = np.concatenate((*self.words, [self.partial])).astype('>u8').tobytes()
+
+        return data[:(self.bits + 7) >> 3]
+
+
+def interleave(prefix_values, prefix_lengths, payload_values, payload_lengths) -> Tuple[np.ndarray, np.ndarray]:
+    '''Merges the prefix and payload of every value into one sequence of codes'''
+
+    values = np.column_stack((prefix_values.astype(np.uint64), payload_values.astype(np.uint64))).ravel()
+    lengths = np.column_stack((prefix_lengths, payload_lengths)).ravel()
+
+    return (values, lengths)
+
+
+def encode_timestamps(timestamps: np.ndarray) -> bytes:
+
+    ticks = np.rint(timestamps.astype(np.float64)*TIMESTAMP_RESOLUTION).astype(np.int64)
+
+    writer = BitWriter()
+    writer.write(ticks[:1].view(np.uint64), np.array([64]))
+
+    # Code i holds the delta of delta of tick i + 1, the delta before the first one is 0
+    for start in range(0, len(ticks) - 1, SLICE_SIZE):
+
+        deltas = np.diff(ticks[start:start + SLICE_SIZE + 1])
+        previous = ticks[start] - ticks[start - 1] if start > 0 else 0
+
+        writer.write(*encode_delta_of_deltas(np.diff(deltas, prepend=previous)))
+
+    return writer.getvalue()
+
+
+def encode_delta_of_deltas(dods: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+
+    zigzag = ((dods << 1) ^ (dods >> 63)).view(np.uint64)
+
+    prefix_values = np.zeros(len(zigzag), dtype=np.uint64)
+    prefix_lengths = np.ones(len(zigzag), dtype=np.int64)
+    payload_lengths = np.zeros(len(zigzag), dtype=np.int64)
+
+    assigned = zigzag == 0
+
+    for prefix, prefix_length, payload_length in DELTA_BUCKETS:
+        fits = ~assigned & ((zigzag < (np.uint64(1) << np.uint64(payload_length))) if payload_length < 64 else True)
+        prefix_values[fits] = prefix
+        prefix_lengths[fits] = prefix_length
+        payload_lengths[fits] = payload_length
+        assigned |= fits
+
+    return interleave(prefix_values, prefix_lengths, zigzag, payload_lengths)
+
+
+def encode_numbers(column: np.ndarray) -> bytes:
+
+    width = column.dtype.itemsize
+    length_bits = {1: 3, 2: 4, 4: 5, 8: 6}[width]
+
+    patterns = column.astype(column.dtype.newbyteorder('=')).view(UNSIGNED_TYPES[width])
+
+    writer = BitWriter()
+
+    for start in range(0, len(patterns), SLICE_SIZE):
+
+        current = patterns[start:start + SLICE_SIZE].astype(np.uint64)
+        previous = patterns[max(0, start - 1):start + len(current) - 1].astype(np.uint64)
+
+        # The first value is XORed with 0
+        if start == 0:
+            previous = np.concatenate((np.zeros((1,), dtype=np.uint64), previous))
+
+        xor = current ^ previous
+
+        nonzero = xor != 0
+
+        significant = bit_length(xor)
+        trailing = bit_length(xor & (~xor + np.uint64(1))) - 1
+        trailing[~nonzero] = 0
+
+        leading = width*8 - significant
+        meaningful = significant - trailing
+
+        prefix_values = np.where(nonzero, (1 << (2*length_bits)) | (leading << length_bits) | (meaningful - 1), 0)
+        prefix_lengths = np.where(nonzero, 1 + 2*length_bits, 1)
+
+        payload_values = xor >> trailing.astype(np.uint64)
+        payload_lengths = np.where(nonzero, meaningful, 0)
+
+        writer.write(*interleave(prefix_values, prefix_lengths, payload_values, payload_lengths))
+
+    return writer.getvalue()
+
+
+def encode_records(records: np.ndarray) -> bytes:
+    '''Encodes the records (any byte order) of a part, see the format description above'''
+
+    if len(records) < 1:
+        return b''
+
+    columns = list[bytes]()
+
+    for name in records.dtype.names or []:
+
+        column = records[name]
+
+        if name == TIMESTAMP_FIELD:
+            columns.append(encode_timestamps(column))
+        elif column.dtype.kind in 'fiub':
+            columns.append(encode_numbers(column))
+        else:
+            columns.append(column.tobytes())
+
+    return b''.join(columns)
+
+
+class BitReader:
+
+    def __init__(self, data: Union[bytes, memoryview], pos: int = 0):
+        self.data = data
+        self.bit = pos*8
+
+    def read(self, length: int) -> int:
+
+        res = 0
+        for _ in range(length):
+            res = (res << 1) | ((self.data[self.bit >> 3] >> (7 - (self.bit & 7))) & 1)
+            self.bit += 1
+
+        return res
+
+    def align(self) -> int:
+        '''Skips to the next byte boundary and returns the byte position'''
+        self.bit = (self.bit + 7) & ~7
+        return self.bit >> 3
+
+
+def decode_records(data: Union[bytes, memoryview], dtype: np.dtype, count: int) -> np.ndarray:
+    '''Decodes records encoded by `encode_records` into the given record type (slow, for tests and tools)'''
+
+    records = np.zeros((count,), dtype=dtype)
+
+    if count < 1:
+        return records
+
+    reader = BitReader(data)
+
+    for name in dtype.names or []:
+
+        field = dtype[name]
+
+        if name == TIMESTAMP_FIELD:
+
+            tick = np.array([reader.read(64)], dtype=np.uint64).view(np.int64)[0].item()
+            delta = 0
+            ticks = [tick]
+
+            for _ in range(count - 1):
+                zigzag = 0
+                if reader.read(1) == 1:
+                    # The number of leading ones of the prefix selects the bucket
+                    ones = 1
+                    while ones < len(DELTA_BUCKETS) and reader.read(1) == 1:
+                        ones += 1
+                    zigzag = reader.read(DELTA_BUCKETS[ones - 1][2])
+                delta += (zigzag >> 1) ^ -(zigzag & 1)
+                tick += delta
+                ticks.append(tick)
+
+            records[name] = np.array(ticks, dtype=np.float64)/TIMESTAMP_RESOLUTION
+
+        elif field.kind in 'fiub':
+
+            width = field.itemsize
+            length_bits = {1: 3, 2: 4, 4: 5, 8: 6}[width]
+
+            pattern = 0
+            patterns = list[int]()
+
+            for _ in range(count):
+                if reader.read(1) == 1:
+                    leading = reader.read(length_bits)
+                    meaningful = reader.read(length_bits) + 1
+                    pattern ^= reader.read(meaningful) << (width*8 - leading - meaningful)
+                patterns.append(pattern)
+
+            records[name] = np.array(patterns, dtype=UNSIGNED_TYPES[width]).view(field.newbyteorder('='))
+
+        else:
+
+            pos = reader.align()
+            records[name] = np.frombuffer(data, dtype=field, count=count, offset=pos)
+            reader.bit = (pos + count*field.itemsize)*8
+
+        reader.align()
+
+    return records
@@ -0,0 +1,55 @@
+# Fixed bucket latency histograms cheap enough to be recorded on every part call
+
+import math
+
+BUCKET_COUNT = 16
+'''
+Bucket 0 holds durations below ~1us, bucket k durations below ~2^k us
+(1 unit = 1024ns). The last bucket holds everything above ~16ms
+'''
+
+def bucket_names() -> list[str]:
+    return ['lt_1us', *[f'lt_{1 << k}us' for k in range(1, BUCKET_COUNT - 1)], 'overflow']
+
+
+class LatencyHistogram:
+
+    __slots__ = ('counts', 'count', 'total_ns', 'max_ns')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.counts = [0]*BUCKET_COUNT
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, duration_ns: int):
+
+        bucket = (duration_ns >> 10).bit_length()
+        self.counts[bucket if bucket < BUCKET_COUNT else BUCKET_COUNT - 1] += 1
+
+        self.count += 1
+        self.total_ns += duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+
+    def percentile(self, q: float) -> int:
+        '''
+        Upper bound in ns of the bucket holding the q-quantile of the durations (0 if empty).
+        Never more than the longest duration, which also bounds the overflow bucket
+        '''
+
+        if self.count < 1:
+            return 0
+
+        rank = max(1, math.ceil(q*self.count))
+        seen = 0
+
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.max_ns if bucket == BUCKET_COUNT - 1 else min(self.max_ns, 1024 << bucket)
+
+        return self.max_ns
@@ -0,0 +1,183 @@
+# Binary measurement file format, as written by the FileMeasurementSink
+#
+# The file starts with a self describing header, so it can be read without the
+# vessel registration on the server:
+#
+#   !4sHH   magic, format version, part count
+#   per part:
+#     !H16s part index, part id
+#     name, type (each !B length + utf-8)
+#     !H    field count
+#     per field: name, struct descriptor (each !B length + utf-8)
+#
+# followed by any number of blocks of fixed size records:
+#
+#   !HI     part index, record count
+#   records packed as '!d' + struct descriptors of the part (timestamp first),
+#   i.e. the same layout as the measurements send over the api
+#
+# A truncated last block (crash) is read up to the last complete record
+
+from dataclasses import dataclass
+from pathlib import Path
+import struct
+from typing import Iterable, Iterator, Tuple, Union
+from uuid import UUID
+
+import numpy as np
+
+from core.logic.measurement_descriptor import dtype_for_shape
+from core.logic.rocket_definition import Part
+
+MAGIC = b'RSSM'
+
+FORMAT_VERSION = 1
+
+MEASUREMENT_FILE_EXTENSION = '.rssm'
+
+FILE_HEADER = struct.Struct('!4sHH')
+
+PART_HEADER = struct.Struct('!H16s')
+
+FIELD_COUNT = struct.Struct('!H')
+
+STRING_LENGTH = struct.Struct('!B')
+
+BLOCK_HEADER = struct.Struct('!HI')
+
+
+@dataclass
+class MeasurementFilePart:
+    '''Description of a part as stored in the file header'''
+
+    index: int
+
+    part_id: UUID
+
+    name: str
+
+    type: str
+
+    field_names: list[str]
+
+    field_descriptors: list[str]
+
+    dtype: np.dtype
+    '''Record type of the stored measurements (network byte order, timestamp first)'''
+
+
+def encode_string(value: str) -> bytes:
+    encoded = value.encode('utf-8')[:255]
+    return STRING_LENGTH.pack(len(encoded)) + encoded
+
+
+def encode_header(parts: Iterable[Part]) -> bytes:
+
+    parts = list(parts)
+
+    res = [FILE_HEADER.pack(MAGIC, FORMAT_VERSION, len(parts))]
+
+    for p in parts:
+        descriptor = p.get_measurement_descriptor()
+
+        res.append(PART_HEADER.pack(p._index, p._id.bytes))
+        res.append(encode_string(p.name))
+        res.append(encode_string(p.type))
+        res.append(FIELD_COUNT.pack(descriptor.field_count))
+
+        for name, field_descriptor in descriptor.shape:
+            res.append(encode_string(name))
+            res.append(encode_string(field_descriptor))
+
+    return b''.join(res)
+
+
+def encode_block(part: Part, records: np.ndarray) -> bytes:
+    '''Encodes records of the measurement store (see `MeasurementRingBuffer`) as a block'''
+
+    return BLOCK_HEADER.pack(part._index, len(records)) + part.get_measurement_descriptor().encode_records(records)
+
+
+class MeasurementFileError(Exception):
+    pass
+
+
+def read_string(data: Union[bytes, memoryview], pos: int) -> Tuple[str, int]:
+    length, = STRING_LENGTH.unpack_from(data, pos)
+    pos += STRING_LENGTH.size
+    return (bytes(data[pos:pos + length]).decode('utf-8', errors='replace'), pos + length)
+
+
+def read_header(data: Union[bytes, memoryview]) -> Tuple[dict[int, MeasurementFilePart], int]:
+    '''Returns the parts by index and the position of the first block'''
+
+    try:
+        magic, version, part_count = FILE_HEADER.unpack_from(data, 0)
+    except struct.error:
+        raise MeasurementFileError('File is too short to contain a header')
+
+    if magic != MAGIC:
+        raise MeasurementFileError('Not a measurement file')
+
+    if version != FORMAT_VERSION:
+        raise MeasurementFileError(f'Unsupported measurement file version {version}')
+
+    pos = FILE_HEADER.size
+    parts = dict[int, MeasurementFilePart]()
+
+    try:
+        for _ in range(part_count):
+            index, id_bytes = PART_HEADER.unpack_from(data, pos)
+            pos += PART_HEADER.size
+
+            name, pos = read_string(data, pos)
+            part_type, pos = read_string(data, pos)
+
+            field_count, = FIELD_COUNT.unpack_from(data, pos)
+            pos += FIELD_COUNT.size
+
+            field_names = list[str]()
+            field_descriptors = list[str]()
+            for _ in range(field_count):
+                field_name, pos = read_string(data, pos)
+                field_descriptor, pos = read_string(data, pos)
+                field_names.append(field_name)
+                field_descriptors.append(field_descriptor)
+
+            dtype = dtype_for_shape(zip(field_names, field_descriptors)).newbyteorder('>')
+
+            parts[index] = MeasurementFilePart(index, UUID(bytes=id_bytes), name, part_type, field_names, field_descriptors, dtype)
+    except struct.error:
+        raise MeasurementFileError('Header is truncated')
+
+    return (parts, pos)
+
+
+def read_blocks(data: Union[bytes, memoryview], parts: dict[int, MeasurementFilePart], pos: int) -> Iterator[Tuple[MeasurementFilePart, np.ndarray]]:
+    '''Yields the part and its records for every block'''
+
+    while pos + BLOCK_HEADER.size <= len(data):
+
+        index, count = BLOCK_HEADER.unpack_from(data, pos)
+        pos += BLOCK_HEADER.size
+
+        part = parts.get(index)
+        if part is None:
+            raise MeasurementFileError(f'Block of unknown part index {index}')
+
+        record_size = part.dtype.itemsize
+        complete_count = min(count, (len(data) - pos)//record_size)
+
+        yield (part, np.frombuffer(data, dtype=part.dtype, count=complete_count, offset=pos))
+
+        pos += count*record_size
+
+
+def read_measurement_file(path: Union[str, Path]) -> Tuple[dict[int, MeasurementFilePart], list[Tuple[MeasurementFilePart, np.ndarray]]]:
+    '''Reads the header and all blocks of a measurement file'''
+
+    data = Path(path).read_bytes()
+
+    parts, pos = read_header(data)
+
+    return (parts, list(read_blocks(data, parts, pos)))
@@ -0,0 +1,301 @@
+# Time index of measurement files (see core.helper.measurement_file), to query recorded flights offline
+#
+# Every measurement file N.rssm gets a sidecar index N.rssm.idx:
+#
+#   !4sHQ   magic, format version, size of the indexed part of the measurement file
+#   entries of BLOCK_INDEX_DTYPE, one per complete block in file order
+#
+# Only complete blocks are indexed. If the measurement file grew (e.g. it is still being
+# written), the index is extended from the end of the last indexed block. Indexing streams
+# over the block headers and reads only the first and last timestamp of each block, queries
+# read only the blocks overlapping the requested time range, so folders larger than the
+# memory can be queried.
+
+from dataclasses import dataclass
+from logging import getLogger
+import os
+from pathlib import Path
+import struct
+from typing import BinaryIO, Iterator, Tuple, Union
+from uuid import UUID
+
+import numpy as np
+
+from core.helper.measurement_file import BLOCK_HEADER, MEASUREMENT_FILE_EXTENSION, MeasurementFileError, MeasurementFilePart, read_header
+from core.logic.measurement_descriptor import TIMESTAMP_FIELD
+
+LOGGER_NAME = 'Measurement Index'
+
+INDEX_MAGIC = b'RSSI'
+
+INDEX_FORMAT_VERSION = 1
+
+INDEX_EXTENSION = '.idx'
+
+INDEX_HEADER = struct.Struct('!4sHQ')
+
+BLOCK_INDEX_DTYPE = np.dtype([('part', '>u2'), ('count', '>u4'), ('offset', '>u8'), ('start', '>f8'), ('end', '>f8')])
+'''Part index, record count, offset of the first record in the file and time range of a block'''
+
+TIMESTAMP = struct.Struct('!d')
+
+HEADER_READ_SIZE = 64*1024
+
+
+@dataclass
+class IndexedMeasurementFile:
+
+    path: Path
+
+    parts: dict[int, MeasurementFilePart]
+
+    blocks: np.ndarray
+    '''Index entries of all complete blocks (BLOCK_INDEX_DTYPE)'''
+
+    indexed_size: int
+
+
+def index_path(path: Path) -> Path:
+    return path.with_name(path.name + INDEX_EXTENSION)
+
+
+def read_file_header(f: BinaryIO) -> Tuple[dict[int, MeasurementFilePart], int]:
+    '''Reads the header of a measurement file without reading the blocks'''
+
+    size = HEADER_READ_SIZE
+
+    while True:
+        f.seek(0)
+        data = f.read(size)
+
+        try:
+            return read_header(data)
+        except MeasurementFileError:
+            # The header might just be longer than the data read so far
+            if len(data) < size:
+                raise
+            size *= 4
+
+
+def scan_blocks(f: BinaryIO, parts: dict[int, MeasurementFilePart], pos: int, file_size: int) -> Tuple[np.ndarray, int]:
+    '''Indexes the complete blocks from pos on. Returns the entries and the end of the last complete block'''
+
+    entries = list[Tuple[int, int, int, float, float]]()
+
+    while pos + BLOCK_HEADER.size <= file_size:
+
+        f.seek(pos)
+        index, count = BLOCK_HEADER.unpack(f.read(BLOCK_HEADER.size))
+
+        part = parts.get(index)
+        if part is None:
+            raise MeasurementFileError(f'Block of unknown part index {index}')
+
+        offset = pos + BLOCK_HEADER.size
+        end = offset + count*part.dtype.itemsize
+
+        if end > file_size:
+            break
+
+        if count > 0:
+            start_time, = TIMESTAMP.unpack(f.read(TIMESTAMP.size))
+            f.seek(end - part.dtype.itemsize)
+            end_time, = TIMESTAMP.unpack(f.read(TIMESTAMP.size))
+            entries.append((index, count, offset, start_time, end_time))
+
+        pos = end
+
+    return (np.array(entries, dtype=BLOCK_INDEX_DTYPE), pos)
+
+
+def load_index(path: Path) -> Union[None, Tuple[np.ndarray, int]]:
+    '''Returns the entries and indexed size of the sidecar index, None if it is missing or invalid'''
+
+    try:
+        data = index_path(path).read_bytes()
+    except OSError:
+        return None
+
+    if len(data) < INDEX_HEADER.size:
+        return None
+
+    magic, version, indexed_size = INDEX_HEADER.unpack_from(data, 0)
+
+    if magic != INDEX_MAGIC or version != INDEX_FORMAT_VERSION or (len(data) - INDEX_HEADER.size) % BLOCK_INDEX_DTYPE.itemsize != 0:
+        return None
+
+    return (np.frombuffer(data, dtype=BLOCK_INDEX_DTYPE, offset=INDEX_HEADER.size), indexed_size)
+
+
+def store_index(path: Path, blocks: np.ndarray, indexed_size: int):
+    '''Writes the sidecar index. The index is only a cache, so failing (e.g. read only media) is not an error'''
+
+    target = index_path(path)
+    temporary = target.with_name(target.name + '.tmp')
+
+    try:
+        temporary.write_bytes(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_FORMAT_VERSION, indexed_size) + blocks.tobytes())
+        os.replace(temporary, target)
+    except OSError as e:
+        getLogger(LOGGER_NAME).debug(f'Could not store index of {path}: {e}')
+
+
+def index_measurement_file(path: Union[str, Path], store: bool = True) -> IndexedMeasurementFile:
+    '''Loads the index of a measurement file, building or extending it if required'''
+
+    path = Path(path)
+
+    with path.open('rb') as f:
+
+        parts, data_start = read_file_header(f)
+
+        file_size = os.fstat(f.fileno()).st_size
+
+        loaded = load_index(path)
+
+        # An index larger than the file belongs to a different file with the same name
+        if loaded is None or loaded[1] > file_size or loaded[1] < data_start:
+            blocks, indexed_size = (np.empty((0,), dtype=BLOCK_INDEX_DTYPE), data_start)
+        else:
+            blocks, indexed_size = loaded
+
+        if indexed_size < file_size:
+            new_blocks, new_size = scan_blocks(f, parts, indexed_size, file_size)
+
+            if new_size > indexed_size:
+                # Concatenating converts to the native byte order
+                blocks = np.concatenate((blocks, new_blocks)).astype(BLOCK_INDEX_DTYPE)
+                indexed_size = new_size
+
+                if store:
+                    store_index(path, blocks, indexed_size)
+
+    return IndexedMeasurementFile(path, parts, blocks, indexed_size)
+
+
+class FlightDataReader:
+    '''
+    Reads the measurement files of a flight folder by part and time range.
+    Records are returned as numpy arrays in the file layout (see `MeasurementFilePart.dtype`)
+    '''
+
+    def __init__(self, folder: Union[str, Path], store_index: bool = True):
+
+        self.folder = Path(folder)
+        self.store_index = store_index
+
+        self.files = list[IndexedMeasurementFile]()
+
+        self.refresh()
+
+    def refresh(self):
+        '''Indexes measurement files that were added or grew since the last call'''
+
+        paths = sorted([p for p in self.folder.glob(f'*{MEASUREMENT_FILE_EXTENSION}') if p.stem.isdigit()], key=lambda p: int(p.stem))
+
+        files = list[IndexedMeasurementFile]()
+
+        for path in paths:
+            try:
+                files.append(index_measurement_file(path, self.store_index))
+            except (OSError, MeasurementFileError) as e:
+                getLogger(LOGGER_NAME).warning(f'Skipping measurement file {path}: {e}')
+
+        self.files = files
+
+    @property
+    def parts(self) -> dict[UUID, MeasurementFilePart]:
+        '''All recorded parts by id'''
+
+        res = dict[UUID, MeasurementFilePart]()
+
+        for f in self.files:
+            for part in f.parts.values():
+                res.setdefault(part.part_id, part)
+
+        return res
+
+    def find_part(self, part: Union[UUID, str]) -> MeasurementFilePart:
+        '''Finds a recorded part by id or name'''
+
+        for p in self.parts.values():
+            if p.part_id == part or p.name == part:
+                return p
+
+        raise KeyError(f'No measurements of part {part} recorded')
+
+    def time_range(self, part: Union[UUID, str]) -> Union[None, Tuple[float, float]]:
+        '''First and last recorded timestamp of the part, None if it has no measurements'''
+
+        part_id = self.find_part(part).part_id
+
+        starts = list[float]()
+        ends = list[float]()
+
+        for f, blocks in self.part_blocks(part_id):
+            if len(blocks) > 0:
+                starts.append(float(blocks['start'].min()))
+                ends.append(float(blocks['end'].max()))
+
+        if len(starts) < 1:
+            return None
+
+        return (min(starts), max(ends))
+
+    def part_blocks(self, part_id: UUID) -> Iterator[Tuple[IndexedMeasurementFile, np.ndarray]]:
+
+        for f in self.files:
+            indices = [i for i, p in f.parts.items() if p.part_id == part_id]
+            yield (f, f.blocks[np.isin(f.blocks['part'], indices)])
+
+    def iter_records(self, part: Union[UUID, str], start: Union[None, float] = None, end: Union[None, float] = None) -> Iterator[np.ndarray]:
+        '''
+        Yields the records of the part within [start, end] block by block, in file order.
+        Only blocks overlapping the range are read
+        '''
+
+        part_id = self.find_part(part).part_id
+
+        for f, blocks in self.part_blocks(part_id):
+
+            if start is not None:
+                blocks = blocks[blocks['end'] >= start]
+            if end is not None:
+                blocks = blocks[blocks['start'] <= end]
+
+            if len(blocks) < 1:
+                continue
+
+            with f.path.open('rb') as handle:
+                for block in blocks:
+
+                    dtype = f.parts[int(block['part'])].dtype
+
+                    handle.seek(int(block['offset']))
+                    records = np.fromfile(handle, dtype=dtype, count=int(block['count']))
+
+                    if start is not None or end is not None:
+                        mask = np.ones((len(records),), dtype=np.bool_)
+                        if start is not None:
+                            mask &= records[TIMESTAMP_FIELD] >= start
+                        if end is not None:
+                            mask &= records[TIMESTAMP_FIELD] <= end
+                        records = records[mask]
+
+                    if len(records) > 0:
+                        yield records
+
+    def read(self, part: Union[UUID, str], start: Union[None, float] = None, end: Union[None, float] = None) -> np.ndarray:
+        '''Returns the records of the part within [start, end], sorted by time'''
+
+        recorded = self.find_part(part)
+
+        chunks = list(self.iter_records(recorded.part_id, start, end))
+
+        if len(chunks) < 1:
+            return np.empty((0,), dtype=recorded.dtype)
+
+        records = np.concatenate(chunks)
+
+        # Sinks may store measurements out of order if a store was retried
+        return records[np.argsort(records[TIMESTAMP_FIELD], kind='stable')]
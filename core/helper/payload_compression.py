@@ -0,0 +1,141 @@
+# Compression of upload bodies with the standard library, announced by the Content-Encoding header
+#
+#   deflate   zlib stream (RFC 1950), levels 1-9
+#   xz        xz container (lzma), presets 1-6. Higher presets need hundreds of MiB of memory
+#
+# Level 0 stands for an uncompressed body.
+
+from dataclasses import dataclass
+import lzma
+import time
+from typing import Literal, Union
+import zlib
+
+PayloadEncoding = Literal['deflate', 'xz']
+
+LEVELS: dict[str, list[int]] = {
+    'deflate': list(range(1, 10)),
+    'xz': list(range(1, 7))
+}
+
+
+def compress_payload(data: bytes, encoding: PayloadEncoding, level: int) -> bytes:
+
+    if encoding == 'deflate':
+        return zlib.compress(data, level)
+
+    if encoding == 'xz':
+        return lzma.compress(data, format=lzma.FORMAT_XZ, preset=level)
+
+    raise ValueError(f'Unknown payload encoding {encoding}')
+
+
+def decompress_payload(data: bytes, encoding: PayloadEncoding) -> bytes:
+
+    if encoding == 'deflate':
+        return zlib.decompress(data)
+
+    if encoding == 'xz':
+        return lzma.decompress(data, format=lzma.FORMAT_XZ)
+
+    raise ValueError(f'Unknown payload encoding {encoding}')
+
+
+def timed_compress(data: bytes, encoding: PayloadEncoding, level: int) -> tuple[bytes, float]:
+    '''Compresses the data and returns the CPU time it took, to be run in a worker thread'''
+
+    start = time.thread_time()
+    compressed = compress_payload(data, encoding, level)
+
+    return (compressed, time.thread_time() - start)
+
+
+@dataclass
+class LevelStatistics:
+
+    cpu_per_byte: float
+    '''CPU seconds per uncompressed byte'''
+
+    ratio: float
+    '''Compressed to uncompressed size'''
+
+
+class AdaptiveCompression:
+    '''
+    Chooses the compression level of the uploads, so compression is only spent if the link is
+    the bottleneck. The cost of a level is the CPU time plus the time the compressed body needs
+    on the link, both per uncompressed byte and measured on the recent uploads.
+
+    Starting uncompressed, the level moves to the neighbouring level with the lowest cost.
+    Every `explore_period` uploads a neighbouring level is tried, so the statistics follow
+    changes of the data, the CPU load and the bandwidth.
+    '''
+
+    level: int = 0
+
+    min_size: int = 256
+    '''Smaller bodies are not worth compressing'''
+
+    explore_period: int = 20
+
+    smoothing: float = 0.2
+
+    uploads: int = 0
+
+    def __init__(self, encoding: PayloadEncoding):
+
+        self.encoding = encoding
+        self.levels = [0, *LEVELS[encoding]]
+        self.statistics = dict[int, LevelStatistics]({ 0: LevelStatistics(0, 1) })
+
+    def neighbours(self) -> list[int]:
+
+        i = self.levels.index(self.level)
+
+        return self.levels[max(0, i - 1):i + 2]
+
+    def next_level(self, size: int, bandwidth: Union[None, float]) -> int:
+        '''Level to compress the next upload of the given size with'''
+
+        if size < self.min_size or bandwidth is None:
+            return 0
+
+        self.uploads += 1
+
+        unmeasured = [l for l in self.neighbours() if l not in self.statistics]
+
+        if len(unmeasured) > 0:
+            return unmeasured[0]
+
+        if self.uploads % self.explore_period == 0:
+            others = [l for l in self.neighbours() if l != self.level]
+            return others[(self.uploads//self.explore_period) % len(others)]
+
+        return self.level
+
+    def cost(self, level: int, bandwidth: float) -> float:
+        '''Estimated seconds per uncompressed byte'''
+
+        statistics = self.statistics[level]
+
+        return statistics.cpu_per_byte + statistics.ratio/bandwidth
+
+    def record(self, level: int, size: int, compressed_size: int, cpu_time: float, bandwidth: Union[None, float]):
+        '''Adds a measured compression and moves to the cheapest neighbouring level'''
+
+        sample = LevelStatistics(cpu_time/size, compressed_size/size)
+
+        statistics = self.statistics.get(level)
+
+        if statistics is None:
+            self.statistics[level] = sample
+        else:
+            statistics.cpu_per_byte += self.smoothing*(sample.cpu_per_byte - statistics.cpu_per_byte)
+            statistics.ratio += self.smoothing*(sample.ratio - statistics.ratio)
+
+        if bandwidth is None:
+            return
+
+        measured = [l for l in self.neighbours() if l in self.statistics]
+
+        self.level = min(measured, key=lambda l: self.cost(l, bandwidth))
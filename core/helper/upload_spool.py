@@ -0,0 +1,243 @@
+# Store and forward queue of measurement uploads that could not be send
+#
+# The spool is a folder of append-only segment files (N.spool) holding entries:
+#
+#   !4s16s8sII  entry magic, flight id, encoding (utf-8, zero padded), payload length, crc32 of the payload
+#   payload     the body of the failed upload
+#
+# Entries are appended through the background writer, so spooling never blocks the control loop.
+# Sent entries are recorded in an append-only acknowledgement file (acks) as !II segment number
+# and offset of the next entry to send, so the spool continues where it stopped after a restart.
+# Segments are deleted once all of their entries are acknowledged. The acknowledgements are then
+# emptied, as the next entry to send is the first of the oldest remaining segment, so the file
+# never holds more than the acknowledgements of one segment.
+
+from dataclasses import dataclass
+import os
+from pathlib import Path
+import struct
+from typing import Union
+from uuid import UUID
+import zlib
+
+from core.helper.background_writer import BackgroundFile, get_background_writer
+
+ENTRY_MAGIC = b'SPL1'
+
+ENTRY_HEADER = struct.Struct('!4s16s8sII')
+
+ACK = struct.Struct('!II')
+
+SEGMENT_EXTENSION = '.spool'
+
+ACKS_FILE_NAME = 'acks'
+
+
+@dataclass
+class SpooledUpload:
+
+    flight_id: UUID
+
+    encoding: Union[None, str]
+
+    data: bytes
+
+    segment: int
+
+    next_offset: int
+    '''Offset of the entry following this one within the segment'''
+
+
+class UploadSpool:
+    '''
+    Persistent FIFO queue of failed uploads. `append` is non-blocking, `open` and `read_next`
+    access the storage and must be called from a worker thread (e.g. `asyncio.to_thread`)
+    '''
+
+    segment_size: int
+    '''Entries are appended to a new segment once the current one exceeds this size'''
+
+    max_size: int
+    '''Upper bound of the spooled bytes. Uploads exceeding it are dropped'''
+
+    opened: bool = False
+
+    pending_bytes: int = 0
+    '''Approximate number of spooled bytes that were not send yet'''
+
+    dropped_bytes: int = 0
+
+    def __init__(self, folder: Union[str, Path], segment_size: int = 4*1024*1024, max_size: int = 256*1024*1024):
+
+        self.folder = Path(folder)
+        self.segment_size = segment_size
+        self.max_size = max_size
+
+        self.read_segment = 0
+        self.read_offset = 0
+
+        self.write_segment = 0
+        self.write_offset = 0
+
+        self.write_handle: Union[None, BackgroundFile] = None
+        self.acks_handle: Union[None, BackgroundFile] = None
+
+    def segment_path(self, segment: int) -> Path:
+        return self.folder / f'{segment}{SEGMENT_EXTENSION}'
+
+    def open(self):
+        '''Loads the state left by a previous run (blocking)'''
+
+        segments = sorted(int(p.stem) for p in self.folder.glob(f'*{SEGMENT_EXTENSION}') if p.stem.isdigit()) if self.folder.exists() else []
+
+        acks_path = self.folder / ACKS_FILE_NAME
+
+        if len(segments) > 0:
+
+            self.read_segment = segments[0]
+            self.read_offset = 0
+
+            if acks_path.exists():
+                with acks_path.open('rb') as f:
+                    # Only the last complete acknowledgement counts
+                    complete = os.fstat(f.fileno()).st_size//ACK.size*ACK.size
+                    if complete > 0:
+                        f.seek(complete - ACK.size)
+                        self.read_segment, self.read_offset = ACK.unpack(f.read(ACK.size))
+
+            # Never append to a segment of a previous run, its end might be torn
+            self.write_segment = segments[-1] + 1
+
+            self.pending_bytes = sum(self.segment_path(s).stat().st_size for s in segments if s >= self.read_segment) - self.read_offset
+
+        elif acks_path.exists():
+            acks_path.unlink()
+
+        self.write_offset = 0
+        self.acks_handle = get_background_writer().open(acks_path)
+        self.opened = True
+
+    def append(self, flight_id: UUID, encoding: Union[None, str], data: bytes) -> bool:
+        '''Queues the upload. Returns False if it was dropped'''
+
+        if self.pending_bytes + len(data) > self.max_size:
+            self.dropped_bytes += len(data)
+            return False
+
+        if self.write_handle is None or self.write_offset > self.segment_size:
+            if self.write_handle is not None:
+                self.write_handle.close()
+                self.write_segment += 1
+            self.write_handle = get_background_writer().open(self.segment_path(self.write_segment))
+            self.write_offset = 0
+
+        entry = ENTRY_HEADER.pack(ENTRY_MAGIC, flight_id.bytes, (encoding or '').encode('utf-8'), len(data), zlib.crc32(data)) + data
+
+        if not self.write_handle.write(entry):
+            self.dropped_bytes += len(data)
+            return False
+
+        self.write_offset += len(entry)
+        self.pending_bytes += len(entry)
+
+        return True
+
+    def read_next(self) -> Union[None, SpooledUpload]:
+        '''Returns the oldest upload that was not acknowledged yet (blocking)'''
+
+        while True:
+
+            path = self.segment_path(self.read_segment)
+
+            entry = self.read_entry(path, self.read_offset)
+
+            if entry is not None:
+                return entry
+
+            # The segment currently written to might just not be written completely yet
+            if self.read_segment >= self.write_segment:
+                return None
+
+            # Entries of an older segment might still be queued in the background writer
+            get_background_writer().flush()
+
+            entry = self.read_entry(path, self.read_offset)
+
+            if entry is not None:
+                return entry
+
+            # Either the segment is complete, or its remainder is corrupted (torn write of a previous run)
+            if path.exists():
+                path.unlink()
+
+            self.read_segment += 1
+            self.read_offset = 0
+
+            self.reset_acks()
+
+    def read_entry(self, path: Path, offset: int) -> Union[None, SpooledUpload]:
+
+        try:
+            with path.open('rb') as f:
+                f.seek(offset)
+                header = f.read(ENTRY_HEADER.size)
+
+                if len(header) < ENTRY_HEADER.size:
+                    return None
+
+                magic, id_bytes, encoding, length, crc = ENTRY_HEADER.unpack(header)
+
+                # A torn or corrupted header could claim gigabytes, no valid entry is larger than the spool
+                if magic != ENTRY_MAGIC or length > self.max_size:
+                    return None
+
+                data = f.read(length)
+        except FileNotFoundError:
+            return None
+
+        if len(data) < length or zlib.crc32(data) != crc:
+            return None
+
+        decoded_encoding = encoding.rstrip(b'\0').decode('utf-8')
+
+        return SpooledUpload(UUID(bytes=id_bytes), decoded_encoding or None, data, self.read_segment, offset + ENTRY_HEADER.size + length)
+
+    def reset_acks(self):
+        '''Empties the acknowledgements once the read position is the start of the oldest segment, where `open` starts without them'''
+
+        if self.acks_handle is None:
+            return
+
+        writer = get_background_writer()
+
+        # Acknowledgements still queued would be appended to the emptied file
+        self.acks_handle.close()
+        writer.flush()
+
+        acks_path = self.folder / ACKS_FILE_NAME
+
+        try:
+            acks_path.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+        self.acks_handle = writer.open(acks_path)
+
+    def acknowledge(self, upload: SpooledUpload):
+        '''Marks the upload as send, so it is not returned again (also after a restart)'''
+
+        # Already acknowledged, e.g. the upload was read twice
+        if (upload.segment, upload.next_offset) <= (self.read_segment, self.read_offset):
+            return
+
+        self.pending_bytes = max(0, self.pending_bytes - (ENTRY_HEADER.size + len(upload.data)))
+
+        self.read_segment = upload.segment
+        self.read_offset = upload.next_offset
+
+        if self.acks_handle is not None:
+            self.acks_handle.write(ACK.pack(self.read_segment, self.read_offset))
+
+    @property
+    def empty(self) -> bool:
+        return self.pending_bytes <= 0
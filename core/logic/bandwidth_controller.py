@@ -0,0 +1,117 @@
+from collections import deque
+import math
+from typing import Union
+
+
+class BandwidthController:
+    '''
+    Congestion control of the measurement uploads (AIMD). The rate the uploads may use starts
+    with the first delivery, doubles with every upload (slow start) until the link shows
+    congestion, then grows additively and is cut by `decrease_factor` on congestion, at most
+    once per round trip.
+
+    The achievable bandwidth is estimated from the delivery rate of the recent uploads: bytes
+    acknowledged while an upload was in flight (including overlapping uploads) divided by its
+    duration, as BBR does. The rate never exceeds it by more than `max_rate_gain`, so it does
+    not grow without bound while the uploads are limited by the measurements, not the link.
+    '''
+
+    rate: Union[None, float] = None
+    '''Bytes per second the uploads may use, None until the first upload was delivered'''
+
+    min_rate: float = 1024
+    '''Lower bound of the rate, so critical measurements keep flowing on a congested link'''
+
+    additive_increase: float = 4*1024
+    '''Increase of the rate in bytes per second per delivered upload, after the slow start'''
+
+    decrease_factor: float = 0.7
+
+    max_rate_gain: float = 2
+
+    sample_window: float = 10
+    '''Seconds the delivery rate samples are kept for'''
+
+    burst_period: float = 1
+    '''Unused budget is kept for this many seconds, so bursts of measurements are not decimated'''
+
+    credit: float = 0
+    '''Unused budget in bytes'''
+
+    slow_start: bool = True
+
+    delivered: int = 0
+    '''Total number of bytes delivered'''
+
+    last_decrease: float = -math.inf
+
+    def __init__(self):
+        self.samples = deque[tuple[float, float, float]]()
+        '''Acknowledge time, delivery rate and duration of the recent uploads'''
+
+    @property
+    def bandwidth(self) -> Union[None, float]:
+        '''Estimated achievable bandwidth in bytes per second, the highest recent delivery rate'''
+        return max((s[1] for s in self.samples), default=None)
+
+    @property
+    def min_rtt(self) -> Union[None, float]:
+        '''Shortest duration of the recent uploads'''
+        return min((s[2] for s in self.samples), default=None)
+
+    def budget(self, interval: float) -> Union[None, float]:
+        '''Bytes an upload covering the interval (seconds) may use, see `consume`'''
+
+        if self.rate is None:
+            return None
+
+        self.credit = min(self.credit + self.rate*interval, self.rate*max(interval, self.burst_period))
+
+        return self.credit
+
+    def consume(self, sent_bytes: int):
+        '''Deducts the bytes of an upload from the budget'''
+        self.credit = max(0, self.credit - sent_bytes)
+
+    def on_delivered(self, sent_at: float, delivered_at_send: int, acked_at: float, sent_bytes: int, congested: bool = False):
+        '''
+        Records a successful upload.
+
+        :param delivered_at_send: `delivered` when the upload was started
+        :param congested: The upload was delivered, but slower than the link should allow
+        '''
+
+        self.delivered += sent_bytes
+
+        duration = max(acked_at - sent_at, 0.001)
+
+        self.samples.append((acked_at, (self.delivered - delivered_at_send)/duration, duration))
+
+        while len(self.samples) > 1 and self.samples[0][0] < acked_at - self.sample_window:
+            self.samples.popleft()
+
+        if congested:
+            self.on_congestion(sent_at, acked_at)
+            return
+
+        # The first upload is not limited by the rate, so its delivery rate is only a lower bound
+        if self.rate is None:
+            self.rate = (self.bandwidth or 0)*self.max_rate_gain
+        elif self.slow_start:
+            self.rate *= 2
+        else:
+            self.rate += self.additive_increase
+
+        self.rate = max(self.min_rate, min(self.rate or 0, (self.bandwidth or 0)*self.max_rate_gain))
+
+    def on_congestion(self, sent_at: float, now: float):
+        '''Records a failed or too slow upload'''
+
+        # Uploads started before the last decrease were send at the old rate, the decrease already accounts for them
+        if sent_at < self.last_decrease:
+            return
+
+        self.slow_start = False
+        self.last_decrease = now
+
+        self.rate = max(self.min_rate, (self.rate or self.bandwidth or self.min_rate)*self.decrease_factor)
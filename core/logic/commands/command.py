@@ -46,6 +46,12 @@ class Command(ABC):
     response_message: str = ''
 
     response_schema: Union[SchemaExt, None]
+
+    critical_response: bool = False
+    '''
+    If true, the response is sent to the server as soon as the command completes,
+    without waiting for other responses to be batched with it
+    '''
     
     state: str = 'new'
     '''
@@ -0,0 +1,217 @@
+from abc import abstractmethod
+from logging import getLogger
+import multiprocessing
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Collection, Iterable, Union
+
+import numpy as np
+
+from core.logic.commands.command import Command
+from core.logic.rocket_definition import Part
+
+FLOAT_SIZE = np.dtype(np.float64).itemsize
+
+
+def make_buffers(memory: SharedMemory, input_size: int, output_size: int, state_size: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''Layout of the shared memory block: inputs, outputs, state (all float64)'''
+
+    all_values = np.ndarray((input_size + output_size + state_size,), dtype=np.float64, buffer=memory.buf)
+
+    return (
+        all_values[:input_size],
+        all_values[input_size:input_size + output_size],
+        all_values[input_size + output_size:]
+    )
+
+
+def run_isolated_worker(part_type: type, memory_name: str, input_size: int, output_size: int, state_size: int, connection: Connection):
+    '''Entry point of the worker process. Computes whenever the part signals a new tick'''
+
+    memory = SharedMemory(name=memory_name)
+    inputs, outputs, state = make_buffers(memory, input_size, output_size, state_size)
+
+    try:
+        while True:
+            now = connection.recv()
+
+            if now is None:
+                break
+
+            try:
+                part_type.compute(inputs, outputs, state, now)
+                connection.send(None)
+            except Exception as e:
+                connection.send(str(e))
+    finally:
+        del inputs, outputs, state
+        memory.close()
+
+
+class IsolatedPartWorker:
+    '''Worker process of an isolated part and the shared memory it exchanges values through'''
+
+    busy: bool = False
+
+    start_time: float = 0
+    '''The time passed with the last started computation'''
+
+    def __init__(self, part: 'IsolatedPart'):
+
+        size = max(1, (part.input_size + part.output_size + part.state_size)*FLOAT_SIZE)
+        self.memory = SharedMemory(create=True, size=size)
+
+        self.inputs, self.outputs, self.state = make_buffers(self.memory, part.input_size, part.output_size, part.state_size)
+        self.state[:] = part.initial_state()
+
+        # Spawn instead of fork, as the parent process runs other threads
+        context = multiprocessing.get_context('spawn')
+        self.connection, worker_connection = context.Pipe()
+
+        self.process = context.Process(
+            target=run_isolated_worker,
+            args=(type(part), self.memory.name, part.input_size, part.output_size, part.state_size, worker_connection),
+            name=f'Isolated {part.name}',
+            daemon=True
+        )
+
+        try:
+            self.process.start()
+        except Exception:
+            # The part falls back to computing on the control loop, do not leak the shared memory
+            del self.inputs, self.outputs, self.state
+            self.memory.close()
+            self.memory.unlink()
+            raise
+
+    def start(self, now: float):
+        self.connection.send(now)
+        self.start_time = now
+        self.busy = True
+
+    def poll_done(self) -> tuple[bool, Union[None, str]]:
+        '''Returns if the last computation finished and the error message if it failed'''
+
+        if not self.busy or not self.connection.poll():
+            return (False, None)
+
+        self.busy = False
+
+        return (True, self.connection.recv())
+
+    def stop(self):
+
+        try:
+            self.connection.send(None)
+            self.process.join(timeout=1)
+        except Exception:
+            pass
+
+        if self.process.is_alive():
+            self.process.kill()
+
+        del self.inputs, self.outputs, self.state
+        self.memory.close()
+        self.memory.unlink()
+
+
+class IsolatedPart(Part):
+    '''
+    Base class for pure compute parts that can be run in a separate process.
+
+    The computation is split into three steps:
+    1. `write_inputs` copies everything the computation needs from the dependencies
+        into a float64 input vector (event loop)
+    2. `compute` calculates the output vector from the inputs and a persistent state
+        vector. It must be a pure static method as it may run in another process
+    3. `read_outputs` applies the output vector to the part (event loop)
+
+    If the part is `isolated`, the vectors live in shared memory and `compute` runs
+    in a worker process started by the flight executor. The results are then consumed
+    one tick later, so the computation of this part never lengthens the control tick.
+    Otherwise all three steps are run directly within update.
+    '''
+
+    isolated: bool = False
+
+    input_size: int = 0
+
+    output_size: int = 0
+
+    state_size: int = 0
+
+    worker: Union[None, IsolatedPartWorker] = None
+
+    def __init__(self, *args, isolated: bool = False, **kwargs):
+
+        self.isolated = isolated
+
+        super().__init__(*args, **kwargs)
+
+        self.logger = getLogger('Isolated Part')
+
+        self.inputs = np.zeros((self.input_size,), dtype=np.float64)
+        self.outputs = np.zeros((self.output_size,), dtype=np.float64)
+        self.state = np.array(self.initial_state(), dtype=np.float64)
+
+    def start_worker(self):
+        if self.isolated and self.worker is None:
+            self.worker = IsolatedPartWorker(self)
+
+    def stop_worker(self):
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker = None
+
+    def update(self, commands: Iterable[Command], now: float, iteration: int) -> Union[None, Collection[Command]]:
+
+        generated_commands = self.update_commands(commands, now, iteration)
+
+        worker = self.worker
+
+        if worker is None:
+            if self.write_inputs(self.inputs, now):
+                self.compute(self.inputs, self.outputs, self.state, now)
+                self.read_outputs(self.outputs, now)
+            return generated_commands
+
+        done, error = worker.poll_done()
+
+        if done:
+            if error is None:
+                self.read_outputs(worker.outputs, worker.start_time)
+            else:
+                self.logger.error(f'Isolated computation of part {self.name} failed: {error}')
+
+        if not worker.busy and self.write_inputs(worker.inputs, now):
+            worker.start(now)
+
+        return generated_commands
+
+    def update_commands(self, commands: Iterable[Command], now: float, iteration: int) -> Union[None, Collection[Command]]:
+        '''Processes the commands of this tick. Commands not handled are set to failed'''
+
+        for c in commands:
+            c.state = 'failed'
+
+        return None
+
+    def initial_state(self) -> Any:
+        '''Initial value of the state vector'''
+        return np.zeros((self.state_size,), dtype=np.float64)
+
+    @abstractmethod
+    def write_inputs(self, inputs: np.ndarray, now: float) -> bool:
+        '''Fills the input vector. Return False to skip the computation this tick'''
+        return True
+
+    @staticmethod
+    @abstractmethod
+    def compute(inputs: np.ndarray, outputs: np.ndarray, state: np.ndarray, now: float):
+        '''Computes the outputs (in place). Must not access anything but its arguments'''
+        pass
+
+    @abstractmethod
+    def read_outputs(self, outputs: np.ndarray, now: float):
+        '''Applies the output vector to the part. `now` is the time the inputs were written at'''
+        pass
@@ -0,0 +1,121 @@
+import re
+import struct
+from typing import Collection, Iterable, Sequence, Tuple, Union
+
+import numpy as np
+
+from core.helper.measurement_binary_helper import get_struct_format_for_part
+
+STRUCT_TO_NUMPY = {
+    '?': np.bool_,
+    'c': 'S1',
+    'b': np.int8,
+    'B': np.uint8,
+    'h': np.int16,
+    'H': np.uint16,
+    'i': np.int32,
+    'I': np.uint32,
+    'l': np.int32,
+    'L': np.uint32,
+    'q': np.int64,
+    'Q': np.uint64,
+    'e': np.float16,
+    'f': np.float32,
+    'd': np.float64,
+}
+'''Numpy equivalents of the struct descriptors (standard sizes, as used with "!")'''
+
+STRUCT_DESCRIPTOR_REGEX = re.compile(r'^(\d*)([a-zA-Z?])$')
+
+TIMESTAMP_FIELD = 'timestamp'
+
+
+def numpy_type_for_descriptor(descriptor: str):
+
+    match = STRUCT_DESCRIPTOR_REGEX.match(descriptor)
+
+    if match is None:
+        raise ValueError(f'Unsupported struct descriptor "{descriptor}"')
+
+    count, code = match.groups()
+
+    if code == 's':
+        return f'S{count or 1}'
+
+    if count not in ('', '1') or code not in STRUCT_TO_NUMPY:
+        raise ValueError(f'Unsupported struct descriptor "{descriptor}"')
+
+    return STRUCT_TO_NUMPY[code]
+
+
+def dtype_for_shape(shape: Iterable[Tuple[str, str]]) -> np.dtype:
+    '''Record type of a measurement with the given shape, prefixed by its timestamp'''
+    return np.dtype([(TIMESTAMP_FIELD, np.float64), *[(name, numpy_type_for_descriptor(descriptor)) for name, descriptor in shape]])
+
+
+class MeasurementDescriptor:
+    '''
+    Compiled form of the measurement shape of a part (see `Part.get_measurement_shape`).
+    Compiled once per part, so the control loop, the sinks and the UI don't have to
+    re-walk the shape, rebuild struct formats and recompute sizes for every measurement
+    '''
+
+    shape: list[Tuple[str, str]]
+
+    field_names: list[str]
+
+    field_descriptors: list[str]
+
+    field_indices: dict[str, int]
+
+    field_count: int
+
+    struct: struct.Struct
+    '''Binary (network byte order) format of a measurement, prefixed by its timestamp as double'''
+
+    dtype: np.dtype
+    '''Record type of a measurement, prefixed by its timestamp'''
+
+    wire_dtype: np.dtype
+    '''Record type with the same binary layout as `struct` (network byte order)'''
+
+    defaults: tuple
+    '''Values of all fields if they are not included in a measurement'''
+
+    def __init__(self, shape: Collection[Tuple[str, str]]):
+
+        self.shape = [(name, descriptor) for name, descriptor in shape]
+
+        self.field_names = [name for name, _ in self.shape]
+        self.field_descriptors = [descriptor for _, descriptor in self.shape]
+        self.field_indices = {name: i for i, name in enumerate(self.field_names)}
+        self.field_count = len(self.shape)
+
+        self.struct = struct.Struct(get_struct_format_for_part(self.field_descriptors))
+        self.dtype = dtype_for_shape(self.shape)
+        self.wire_dtype = self.dtype.newbyteorder('>')
+        self.defaults = tuple(np.zeros((1,), dtype=self.dtype)[0].tolist()[1:])
+
+    @property
+    def size(self) -> int:
+        '''Size of a single binary measurement in bytes'''
+        return self.struct.size
+
+    def encode_records(self, records: np.ndarray) -> bytes:
+        '''
+        Packs records of the measurement store (see `MeasurementRingBuffer`) into the wire format
+        with a single buffer copy. Byte identical to packing every record with `struct`
+        '''
+        return records.astype(self.wire_dtype, copy=False).tobytes()
+
+    def validate(self, measurements: Sequence[Sequence]):
+        '''Raises if any measurement has more values than the shape'''
+
+        if max(map(len, measurements), default=0) <= self.field_count:
+            return
+
+        longest = max(map(len, measurements))
+        raise Exception(f'A measurement of length {longest} was returned, but the part only supports measurements up to length {self.field_count}. Please verify that the get_measurement_shape method matches what is returned by collect_measurements')
+
+    def inflate(self, measurement: Sequence) -> dict[str, Union[str, int, float]]:
+        return {name: m for name, m in zip(self.field_names, measurement) if m is not None}
@@ -0,0 +1,83 @@
+from typing import Union
+
+import numpy as np
+
+from core.logic.rocket_definition import Part
+
+
+def average_records(records: np.ndarray, factor: int) -> np.ndarray:
+    '''
+    Reduces the records by the factor by averaging groups of consecutive records.
+    Numeric fields (including the timestamp) are averaged, all other fields
+    (flags, strings) take the value of the last record of the group
+    '''
+
+    if factor <= 1 or len(records) < 2:
+        return records
+
+    starts = np.arange(0, len(records), factor)
+    ends = np.minimum(starts + factor, len(records))
+    sizes = ends - starts
+
+    res = np.empty((len(starts),), dtype=records.dtype)
+
+    for name in records.dtype.names or []:
+
+        column = records[name]
+
+        if column.dtype.kind in 'fiu':
+            means = np.add.reduceat(column.astype(np.float64), starts)/sizes
+            if column.dtype.kind != 'f':
+                means = np.rint(means)
+            res[name] = means
+        else:
+            res[name] = column[ends - 1]
+
+    return res
+
+
+def changed_records(records: np.ndarray, last_values: Union[None, bytes]) -> np.ndarray:
+    '''
+    Returns the records whose values (ignoring the timestamp) differ from the previous
+    record. The first record is compared to `last_values`, the raw values of the last
+    record that was kept before. If it is None, the first record is always kept
+    '''
+
+    if len(records) < 1:
+        return records
+
+    # Compare the raw bytes of the values, the timestamp is the first 8 bytes of a record
+    values = records.view(np.uint8).reshape(len(records), records.dtype.itemsize)[:, 8:]
+
+    changed = np.empty((len(records),), dtype=np.bool_)
+    changed[1:] = np.any(values[1:] != values[:-1], axis=1)
+    changed[0] = last_values is None or values[0].tobytes() != last_values
+
+    return records[changed]
+
+
+def last_values(records: np.ndarray) -> bytes:
+    '''Raw values (without timestamp) of the last record, see `changed_records`'''
+    return records[-1:].tobytes()[8:]
+
+
+def allocate_budget(demands: dict[Part, int], budget: float) -> dict[Part, float]:
+    '''
+    Divides the budget (bytes) between the parts. Every part gets an equal share, parts
+    needing less than their share give the rest to the others (max-min fairness).
+    Returns the bytes granted to each part
+    '''
+
+    granted = dict[Part, float]()
+
+    remaining = sorted(demands.items(), key=lambda d: d[1])
+
+    while len(remaining) > 0:
+
+        share = max(budget, 0)/len(remaining)
+        part, demand = remaining.pop(0)
+
+        granted[part] = min(demand, share)
+        budget -= granted[part]
+
+    return granted
@@ -0,0 +1,114 @@
+from typing import Collection, Iterable, Tuple, Union
+
+import numpy as np
+
+from core.logic.measurement_descriptor import MeasurementDescriptor
+from core.logic.rocket_definition import Measurements, Part
+
+def records_to_measurements(records: np.ndarray) -> list[Tuple[float, list[Union[str, int, float]]]]:
+    '''Converts records back into (timestamp, measurement) tuples of python values'''
+
+    string_fields = [i for i, name in enumerate(records.dtype.names or []) if records.dtype[name].kind == 'S']
+
+    res = list[Tuple[float, list[Union[str, int, float]]]]()
+
+    for row in records.tolist():
+        values = list(row)
+        for i in string_fields:
+            values[i] = values[i].decode(errors='replace')
+        res.append((values[0], values[1:]))
+
+    return res
+
+
+class MeasurementRingBuffer:
+    '''
+    Fixed size buffer of the latest measurements of a single part. The measurements
+    are stored as records of a structured numpy array, so appending does not allocate.
+
+    Readers keep their own cursor (the total number of records written at the time of
+    their last read). If a reader falls behind by more than the capacity, the oldest
+    records are lost for that reader.
+    '''
+
+    write_count: int = 0
+    '''Total number of records ever written'''
+
+    def __init__(self, descriptor: MeasurementDescriptor, capacity: int):
+
+        self.descriptor = descriptor
+        self.dtype = descriptor.dtype
+        self.capacity = capacity
+        self.records = np.zeros((capacity,), dtype=self.dtype)
+
+        self.defaults = descriptor.defaults
+
+        self.write_count = 0
+
+    def append(self, timestamp: float, measurement: Measurements):
+
+        if len(measurement) < len(self.defaults):
+            measurement = (*measurement, *self.defaults[len(measurement):])
+
+        self.records[self.write_count % self.capacity] = (timestamp, *measurement)
+        self.write_count += 1
+
+    def read(self, cursor: int) -> tuple[np.ndarray, int, int]:
+        '''
+        Returns a copy of all records written since the cursor, the new cursor
+        and the number of records that were overwritten before they could be read
+        '''
+
+        available = self.write_count - cursor
+        dropped = 0
+
+        if available > self.capacity:
+            dropped = available - self.capacity
+            available = self.capacity
+
+        start = (self.write_count - available) % self.capacity
+        end = start + available
+
+        if end <= self.capacity:
+            res = self.records[start:end].copy()
+        else:
+            res = np.concatenate((self.records[start:], self.records[:end - self.capacity]))
+
+        return (res, self.write_count, dropped)
+
+    @property
+    def nbytes(self) -> int:
+        return self.records.nbytes
+
+
+class MeasurementStore:
+    '''The measurement ring buffers of all parts of a rocket'''
+
+    buffers: dict[Part, MeasurementRingBuffer]
+
+    def __init__(self, parts: Iterable[Part]):
+        self.buffers = {p: MeasurementRingBuffer(p.get_measurement_descriptor(), p.measurement_buffer_size) for p in parts}
+
+    def append(self, part: Part, start: float, end: float, measurements: Collection[Measurements]) -> int:
+        '''
+        Stores the measurements of one collection, evenly spread between start and end.
+        Returns the number of measurements that could not be stored as they don't fit the shape
+        '''
+
+        buffer = self.buffers[part]
+        time_increment = (end - start)/len(measurements) if len(measurements) > 0 else 0
+
+        rejected = 0
+        i = 0
+        for m in measurements:
+            try:
+                buffer.append(start + time_increment*i, m)
+            except (TypeError, ValueError, OverflowError):
+                rejected += 1
+            i += 1
+
+        return rejected
+
+    @property
+    def nbytes(self) -> int:
+        return sum(b.nbytes for b in self.buffers.values())
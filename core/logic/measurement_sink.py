@@ -1,6 +1,6 @@
 
 from datetime import datetime
-from typing import Iterable, Sequence, Tuple, Type, Union
+from typing import Iterable, Literal, Sequence, Tuple, Type, Union
 from typing_extensions import Self
 from uuid import UUID
 from core.api_client import ApiClient
@@ -8,10 +8,16 @@ from core.logic.commands.command import Command
 from core.content.general_commands.enable import DisableCommand, EnableCommand
 from core.logic.rocket_definition import Command, Measurements, Part, Rocket
 from random import random
+from collections import deque
+from dataclasses import dataclass
+import numpy as np
+from core.logic.measurement_downsampling import average_records
+from core.logic.measurement_ring_buffer import MeasurementStore
 
 from core.models.flight import Flight
 
-MeasurementsByPart = dict[Part, tuple[float, float, Sequence[Measurements]]]
+
+OverflowPolicy = Literal['drop_oldest', 'downsample', 'spill']
 
 
 class MeasurementSinkBase(Part):
@@ -22,17 +28,44 @@ class MeasurementSinkBase(Part):
     of all the other parts to store them, send them away, etc.
     '''
 
-    measurement_buffer: list[MeasurementsByPart]
+    measurement_store: MeasurementStore
+    '''
+    The ring buffers holding the latest measurements of all parts. Set by the
+    flight executor and shared by all sinks. Sinks read the measurements through
+    `measurement_chunks`, the store only tells them which parts there are
+    '''
+
+    measurement_chunks: 'MeasurementChunkLog'
+    '''
+    The measurements encoded into the wire format (see `MeasurementChunkLog`). Set by the
+    flight executor and shared by all sinks, so every measurement is only encoded once
+    '''
+
+    chunk_cursor: int = 0
+    '''Number of encoded measurements this sink has read from `measurement_chunks`'''
+
+    dropped_measurements: int = 0
+    '''Number of measurements that were overwritten before this sink read them'''
+
+    max_backlog_bytes: int = 4*1024*1024
+    '''Max size of the encoded measurements this sink did not read yet. If exceeded, the `overflow_policy` is applied'''
+
+    overflow_policy: OverflowPolicy = 'drop_oldest'
     '''
-    The measurement buffer. It gets appended with all new measurements with
-    each iteration of the main flight loop. The part itself is responsible
-    to flush the buffer periodically and ensure that it doesn't grow too
-    much if the data cannot be cleared in time.
+    What happens to the oldest unread measurements if the backlog exceeds `max_backlog_bytes`:
+    - drop_oldest: they are lost
+    - downsample: they are averaged by `overflow_downsample_factor` and kept by the sink
+    - spill: they are handed to `spill` (e.g. to store them on disk). Dropped if the sink does not support it
 
-    Warning: The list can be modified, but not individual values, as they
-    might be held by other sinks as well
+    The policy only applies to parts with the `sampled` measurement priority. The measurements
+    of `critical` and `status` parts are kept by the sink unchanged
     '''
 
+    overflow_downsample_factor: int = 10
+
+    overflowed_measurements: int = 0
+    '''Number of measurements the overflow policy was applied to'''
+
     def __init__(self, _id: UUID, name: str, parent: Union[Self, Rocket, None], **kwargs):
 
         if 'dependencies' not in kwargs:
@@ -40,10 +73,266 @@ class MeasurementSinkBase(Part):
 
         super().__init__(_id, name, parent, **kwargs)
 
-        self.measurement_buffer = list()
+        self.chunk_cursor = 0
+        self.kept_chunks = list[MeasurementChunk]()
+
+    def read_new_chunks(self) -> list['MeasurementChunk']:
+        '''Returns all encoded chunks since the last call, oldest first'''
+
+        chunks, self.chunk_cursor, dropped = self.measurement_chunks.read(self.chunk_cursor)
+        self.dropped_measurements += dropped
+
+        if len(self.kept_chunks) > 0:
+            chunks = self.kept_chunks + chunks
+            self.kept_chunks = list()
+
+        return chunks
+
+    @property
+    def backlog_bytes(self) -> int:
+        '''Size of the encoded measurements this sink did not read yet'''
+        return self.measurement_chunks.backlog_bytes(self.chunk_cursor) + sum(c.nbytes for c in self.kept_chunks)
+
+    def handle_overflow(self, chunks: list['MeasurementChunk']):
+        '''
+        Applies the overflow policy to the oldest unread chunks, which the sink will not read anymore.
+        The blocks of critical and status parts are exempt, the sink keeps them to be read next
+        '''
+
+        self.overflowed_measurements += sum(c.count for c in chunks)
+
+        sampled_chunks = [c.with_blocks([b for b in c.blocks if b.part.measurement_priority == 'sampled']) for c in chunks]
+        sampled_chunks = [c for c in sampled_chunks if c.count > 0]
+
+        spilled = self.overflow_policy == 'spill' and len(sampled_chunks) > 0 and self.spill(sampled_chunks)
+
+        for chunk in chunks:
+            blocks = list[EncodedBlock]()
+
+            for block in chunk.blocks:
+                if block.part.measurement_priority != 'sampled':
+                    blocks.append(block)
+                elif self.overflow_policy == 'downsample':
+                    averaged = average_records(block.records, self.overflow_downsample_factor)
+                    blocks.append(EncodedBlock(block.part, len(averaged), averaged.tobytes()))
+
+            kept = chunk.with_blocks(blocks)
+
+            if kept.count > 0:
+                self.kept_chunks.append(kept)
+
+            if not spilled:
+                self.dropped_measurements += chunk.count - kept.count
+
+        # The kept measurements are bounded as well. The averaged ones are dropped first
+        for i, chunk in enumerate(self.kept_chunks):
+            if sum(c.nbytes for c in self.kept_chunks) <= self.max_backlog_bytes:
+                break
+            unsampled = chunk.with_blocks([b for b in chunk.blocks if b.part.measurement_priority != 'sampled'])
+            self.dropped_measurements += chunk.count - unsampled.count
+            self.kept_chunks[i] = unsampled
+
+        self.kept_chunks = [c for c in self.kept_chunks if c.count > 0]
+
+        # Only if the measurements of critical and status parts alone exceed the bound
+        while sum(c.nbytes for c in self.kept_chunks) > self.max_backlog_bytes:
+            self.dropped_measurements += self.kept_chunks.pop(0).count
+
+    def spill(self, chunks: list['MeasurementChunk']) -> bool:
+        '''Stores chunks that overflowed the backlog elsewhere. Returns False if not supported'''
+        return False
+
+    def read_new_blocks(self) -> dict[Part, list['EncodedBlock']]:
+        '''Returns the encoded blocks of all measurements since the last call, by part'''
+
+        res = dict[Part, list[EncodedBlock]]()
+
+        for chunk in self.read_new_chunks():
+            for block in chunk.blocks:
+                res.setdefault(block.part, list()).append(block)
+
+        return res
+
+
+@dataclass
+class EncodedBlock:
+    '''Measurements of a single part, encoded in the wire format'''
+
+    part: Part
+
+    count: int
+
+    payload: bytes
+    '''The records packed with the measurement struct of the part (`MeasurementDescriptor.wire_dtype`)'''
+
+    @property
+    def records(self) -> np.ndarray:
+        '''Read only view of the payload as records'''
+        return np.frombuffer(self.payload, dtype=self.part.get_measurement_descriptor().wire_dtype, count=self.count)
+
+
+@dataclass
+class MeasurementChunk:
+    '''All measurements taken since the previous chunk, with one block per part'''
+
+    offset: int
+    '''Number of measurements encoded before this chunk'''
+
+    count: int
+
+    nbytes: int
+
+    byte_offset: int
+    '''Number of bytes encoded before this chunk'''
+
+    blocks: list[EncodedBlock]
+
+    def with_blocks(self, blocks: list[EncodedBlock]) -> 'MeasurementChunk':
+        '''Chunk at the same position, holding only the given blocks'''
+        return MeasurementChunk(self.offset, sum(b.count for b in blocks), sum(len(b.payload) for b in blocks), self.byte_offset, blocks)
+
+
+class MeasurementChunkLog:
+    '''
+    Shared encoding stage of the measurement sinks. New measurements are taken from the
+    measurement store and encoded into the wire format once, no matter how many sinks
+    read them. Sinks keep their own cursor (the number of measurements they have read)
+    and only add their transport specific framing.
+
+    Encoding happens when the first sink asks for new data, or at the latest every
+    `encode_period` (see `update`). Chunks are kept until all sinks read them. If the
+    backlog of a sink exceeds its `max_backlog_bytes`, the oldest chunks are handed
+    to its overflow policy. Independent of the sinks, the log never keeps more than
+    `max_bytes` of encoded data.
+    '''
+
+    max_bytes: int
+
+    nbytes: int = 0
+
+    encoded_count: int = 0
+    '''Total number of measurements ever encoded'''
+
+    encoded_bytes: int = 0
+    '''Total number of bytes ever encoded'''
+
+    encode_period: float = 0.1
+
+    last_encode: float = 0
+
+    dropped_measurements: int = 0
+    '''Measurements overwritten in the store before they were encoded'''
+
+    def __init__(self, measurement_store: MeasurementStore, max_bytes: int = 16*1024*1024, readers: Iterable[MeasurementSinkBase] = ()):
+
+        self.measurement_store = measurement_store
+        self.max_bytes = max_bytes
+        self.readers = list(readers)
+
+        self.chunks = deque[MeasurementChunk]()
+        self.store_cursors = dict[Part, int]()
+
+    def update(self, now: float):
+        '''Called every iteration. Encodes pending measurements periodically, so the backlog of stalled sinks is accounted'''
+
+        if now < self.last_encode + self.encode_period:
+            return
+
+        self.last_encode = now
+        self.encode()
+
+    def encode(self):
+        '''Encodes all measurements added to the store since the last call into a new chunk'''
+
+        blocks = list[EncodedBlock]()
+
+        for part, buffer in self.measurement_store.buffers.items():
+
+            cursor = self.store_cursors.get(part, 0)
+
+            if cursor == buffer.write_count:
+                continue
+
+            records, self.store_cursors[part], dropped = buffer.read(cursor)
+            self.dropped_measurements += dropped
+
+            blocks.append(EncodedBlock(part, len(records), buffer.descriptor.encode_records(records)))
+
+        if len(blocks) < 1:
+            return
+
+        count = sum(b.count for b in blocks)
+        nbytes = sum(len(b.payload) for b in blocks)
+
+        self.chunks.append(MeasurementChunk(self.encoded_count, count, nbytes, self.encoded_bytes, blocks))
+        self.encoded_count += count
+        self.encoded_bytes += nbytes
+        self.nbytes += nbytes
+
+        self.apply_backlog_limits()
+
+    def apply_backlog_limits(self):
+
+        for sink in self.readers:
+
+            if self.backlog_bytes(sink.chunk_cursor) <= sink.max_backlog_bytes:
+                continue
+
+            overflowed = list[MeasurementChunk]()
+
+            for chunk in self.chunks:
+                if chunk.offset < sink.chunk_cursor:
+                    continue
+                if self.encoded_bytes - chunk.byte_offset <= sink.max_backlog_bytes:
+                    break
+                overflowed.append(chunk)
+
+            if len(overflowed) > 0:
+                sink.chunk_cursor = overflowed[-1].offset + overflowed[-1].count
+                sink.handle_overflow(overflowed)
+
+        # Chunks read by all sinks are not needed anymore
+        if len(self.readers) > 0:
+            oldest_cursor = min(s.chunk_cursor for s in self.readers)
+            while len(self.chunks) > 0 and self.chunks[0].offset + self.chunks[0].count <= oldest_cursor:
+                self.nbytes -= self.chunks.popleft().nbytes
+
+        while self.nbytes > self.max_bytes and len(self.chunks) > 1:
+            self.nbytes -= self.chunks.popleft().nbytes
+
+    def backlog_bytes(self, cursor: int) -> int:
+        '''Size of the encoded chunks after the cursor'''
+
+        for chunk in self.chunks:
+            if chunk.offset >= cursor:
+                return self.encoded_bytes - chunk.byte_offset
+
+        return 0
+
+    def read(self, cursor: int) -> tuple[list[MeasurementChunk], int, int]:
+        '''
+        Returns all chunks after the cursor, the new cursor and the number
+        of measurements that were evicted before they could be read
+        '''
+
+        self.encode()
+
+        if cursor >= self.encoded_count:
+            return ([], self.encoded_count, 0)
+
+        # Chunks are ordered, walk back from the newest one
+        first = len(self.chunks)
+        while first > 0 and self.chunks[first - 1].offset >= cursor:
+            first -= 1
+
+        chunks = [self.chunks[i] for i in range(first, len(self.chunks))]
+
+        dropped = max(0, chunks[0].offset - cursor) if len(chunks) > 0 else 0
+
+        return (chunks, self.encoded_count, dropped)
 
 
 class ApiMeasurementSinkBase(MeasurementSinkBase):
     api_client: ApiClient
 
-    flight: Flight
\ No newline at end of file
+    flight: Flight
@@ -0,0 +1,316 @@
+import asyncio
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+import json
+from logging import getLogger
+from pathlib import Path
+import time
+from typing import Any, Iterable, Iterator, Tuple, Union, cast
+from uuid import UUID
+
+from core.api_client import ApiClient
+from core.flight_executer import FlightExecuter
+from core.helper.command_recorder import read_recorded_commands
+from core.helper.measurement_file import MEASUREMENT_FILE_EXTENSION, MeasurementFileError, read_measurement_file
+from core.logic.isolated_part import IsolatedPart
+from core.logic.measurement_ring_buffer import records_to_measurements
+from core.logic.measurement_sink import MeasurementSinkBase
+from core.logic.rocket_definition import Part, Rocket
+from core.logic.threaded_part import ThreadedPart
+from core.models.command import Command as CommandModel
+from core.models.flight import Flight
+from core.models.flight_measurement_compact import FlightMeasurementCompact, FlightMeasurementCompactSchema
+
+LOGGER_NAME = 'Replay'
+
+
+@dataclass
+class RecordedPartMeasurements:
+    '''All recorded measurements of a single part, sorted by time'''
+
+    field_names: list[str]
+
+    timestamps: list[float] = field(default_factory=list)
+
+    values: list[list[Union[str, int, float, None]]] = field(default_factory=list)
+
+
+@dataclass
+class RecordedFlight:
+
+    measurements: dict[UUID, RecordedPartMeasurements]
+
+    commands: list[Tuple[float, CommandModel]]
+    '''Commands received from the server with their receive time, sorted by time'''
+
+    @property
+    def start_time(self) -> float:
+        return min([m.timestamps[0] for m in self.measurements.values() if len(m.timestamps) > 0] + [t for t, _ in self.commands[:1]], default=0)
+
+    @property
+    def end_time(self) -> float:
+        return max([m.timestamps[-1] for m in self.measurements.values() if len(m.timestamps) > 0] + [t for t, _ in self.commands[-1:]], default=0)
+
+
+def read_json_documents(path: Path) -> Iterator[Any]:
+    '''
+    Reads the json documents of a measurement file written by older versions of the
+    `FileMeasurementSink`. The documents are written back to back, a truncated last document (crash) is ignored
+    '''
+
+    content = path.read_text()
+    decoder = json.JSONDecoder()
+
+    pos = 0
+    while pos < len(content):
+        try:
+            document, pos = decoder.raw_decode(content, pos)
+        except json.JSONDecodeError:
+            return
+
+        yield document
+
+        while pos < len(content) and content[pos].isspace():
+            pos += 1
+
+
+def add_recorded_measurements(measurements: dict[UUID, RecordedPartMeasurements], part_id: UUID, field_names: list[str], values: Iterable[Tuple[float, list[Union[str, int, float, None]]]]):
+
+    recorded = measurements.get(part_id)
+    if recorded is None:
+        recorded = measurements[part_id] = RecordedPartMeasurements(field_names)
+
+    for timestamp, v in values:
+        recorded.timestamps.append(timestamp)
+        recorded.values.append(v)
+
+
+def numbered_files(folder: Path, extension: str) -> list[Path]:
+    return sorted([p for p in folder.glob(f'*{extension}') if p.stem.isdigit()], key=lambda p: int(p.stem))
+
+
+def load_recorded_flight(folder: Union[str, Path]) -> RecordedFlight:
+    '''Loads the measurements and commands of a flight folder'''
+
+    folder = Path(folder)
+
+    measurements = dict[UUID, RecordedPartMeasurements]()
+
+    for path in numbered_files(folder, MEASUREMENT_FILE_EXTENSION):
+        try:
+            _, blocks = read_measurement_file(path)
+        except MeasurementFileError as e:
+            getLogger('Flight Replay').warning(f'{LOGGER_NAME}: Skipping measurement file {path}: {e}')
+            continue
+
+        for part, records in blocks:
+            add_recorded_measurements(measurements, part.part_id, part.field_names, records_to_measurements(records))
+
+    # Flights recorded before the binary format was introduced
+    schema = FlightMeasurementCompactSchema()
+
+    for path in numbered_files(folder, '.json'):
+        for document in read_json_documents(path):
+            for m in schema.load_list_safe(FlightMeasurementCompact, document):
+                if m.part_id is not None:
+                    add_recorded_measurements(measurements, m.part_id, m.field_names, m.measurements)
+
+    # Sinks may store measurements out of order if a store was retried
+    for recorded in measurements.values():
+        order = sorted(range(len(recorded.timestamps)), key=recorded.timestamps.__getitem__)
+        recorded.timestamps = [recorded.timestamps[i] for i in order]
+        recorded.values = [recorded.values[i] for i in order]
+
+    commands = sorted(read_recorded_commands(folder), key=lambda c: c[0])
+
+    return RecordedFlight(measurements, commands)
+
+
+class VirtualClock:
+    '''Clock for the flight executor that only advances when told to'''
+
+    now: float
+
+    def __init__(self, start: float):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class OfflineApiClient:
+    '''Stands in for the api client when no server should be contacted. Every request succeeds immediately'''
+
+    endpoint = ''
+
+    async def try_report_binray_flight_data(self, flight_id, data: bytes, timeout: float, encoding: Union[None, str] = None, sequence: Union[None, int] = None, content_encoding: Union[None, str] = None) -> tuple[bool, str]:
+        return (True, 'OFFLINE')
+
+    async def try_report_flight_data_compact(self, flight_id, data: list[FlightMeasurementCompact], timeout: float) -> tuple[bool, str]:
+        return (True, 'OFFLINE')
+
+    async def try_send_command_responses(self, flight_id: str, commands):
+        pass
+
+
+@dataclass
+class ReplayResult:
+
+    iterations: int
+
+    simulated_duration: float
+    '''Flight time covered by the replay in seconds'''
+
+    wall_duration: float
+    '''Time the replay took in seconds'''
+
+    replayed_commands: int
+
+    replayed_measurements: int
+
+
+class FlightReplay:
+    '''
+    Drives a `FlightExecuter` with the data recorded during a flight. The replayed parts (by
+    default all hardware parts with recorded measurements) are stand-ins: they are not updated,
+    instead their recorded measurements are fed back through `Part.apply_recorded_measurement`
+    and into the measurement store. All other parts run as usual on top of that data.
+
+    The executor runs on a virtual clock that advances by `period` per tick, as fast as the
+    CPU allows. Received commands are re-issued at their recorded receive time. To keep the
+    replay deterministic, threaded and isolated parts run their work inline.
+    '''
+
+    def __init__(self, rocket: Rocket, recording: RecordedFlight, replayed_parts: Union[None, Iterable[Part]] = None, period: float = 0.01):
+
+        self.logger = getLogger('Flight Replay')
+
+        self.rocket = rocket
+        self.recording = recording
+        self.period = period
+
+        if replayed_parts is None:
+            replayed_parts = [p for p in rocket.parts if not p.virtual and not isinstance(p, MeasurementSinkBase) and p._id in recording.measurements]
+
+        self.replayed_parts = list(replayed_parts)
+
+        for p in self.replayed_parts:
+            p.replayed = True
+
+        for p in rocket.parts:
+            if isinstance(p, IsolatedPart):
+                p.isolated = False
+
+        self.clock = VirtualClock(recording.start_time)
+
+    async def run(self, until: Union[None, float] = None, yield_interval: int = 100) -> ReplayResult:
+        '''
+        Replays the recording up to `until` (unix seconds, default: end of the recording).
+        Yields to the event loop every `yield_interval` ticks, so the sinks can store their data
+        '''
+
+        start = self.recording.start_time
+        end = until if until is not None else self.recording.end_time
+
+        flight = Flight(start=datetime.fromtimestamp(start, UTC), name=f'Replay of flight at {datetime.fromtimestamp(start)}')
+
+        executor = FlightExecuter(self.rocket, flight, cast(ApiClient, OfflineApiClient()), self.period, fixed_rate=False, clock=self.clock)
+
+        # Results of threaded work would depend on thread timing
+        if executor.thread_pool is not None:
+            executor.thread_pool.shutdown(wait=False)
+            executor.thread_pool = None
+        for p in self.rocket.parts:
+            if isinstance(p, ThreadedPart):
+                p.thread_pool = None
+
+        on_new_command = executor.make_on_new_command()
+
+        command_cursor = 0
+        commands = self.recording.commands
+        measurement_cursors = dict[Part, int]({ p: 0 for p in self.replayed_parts })
+
+        replayed_commands = 0
+        replayed_measurements = 0
+
+        wall_start = time.perf_counter()
+
+        iteration = 0
+        last_update = start
+        self.clock.now = start
+
+        while self.clock.now <= end:
+
+            now = self.clock.now
+
+            # Commands received until now
+            due_commands = list[CommandModel]()
+            while command_cursor < len(commands) and commands[command_cursor][0] <= now:
+                due_commands.append(commands[command_cursor][1])
+                command_cursor += 1
+
+            if len(due_commands) > 0:
+                on_new_command(due_commands)
+                replayed_commands += len(due_commands)
+
+            # Measurements of the stand-in parts until now
+            for p in self.replayed_parts:
+                replayed_measurements += self.feed_measurements(executor, p, measurement_cursors, now)
+
+            last_update = executor.control_loop(iteration, last_update)
+
+            iteration += 1
+            if iteration % yield_interval == 0:
+                await asyncio.sleep(0)
+
+            # Multiply instead of adding up, to not accumulate rounding errors
+            self.clock.now = start + iteration*self.period
+
+        await asyncio.sleep(0)
+
+        result = ReplayResult(iteration, self.clock.now - start, time.perf_counter() - wall_start, replayed_commands, replayed_measurements)
+
+        self.logger.info(f'{LOGGER_NAME}: Replayed {result.simulated_duration:.1f}s of flight in {result.wall_duration:.2f}s ({result.iterations} iterations, {replayed_commands} commands, {replayed_measurements} measurements)')
+
+        return result
+
+    def feed_measurements(self, executor: FlightExecuter, part: Part, cursors: dict[Part, int], now: float) -> int:
+
+        recorded = self.recording.measurements.get(part._id)
+
+        if recorded is None:
+            return 0
+
+        descriptor = part.get_measurement_descriptor()
+        buffer = executor.measurement_store.buffers[part]
+
+        # Map the recorded fields onto the current shape, in case the part changed since
+        field_map = [(i, descriptor.field_indices.get(name)) for i, name in enumerate(recorded.field_names)]
+
+        cursor = cursors[part]
+        start_cursor = cursor
+
+        while cursor < len(recorded.timestamps) and recorded.timestamps[cursor] <= now:
+
+            timestamp = recorded.timestamps[cursor]
+            values = recorded.values[cursor]
+            cursor += 1
+
+            part.apply_recorded_measurement({ name: v for name, v in zip(recorded.field_names, values) if v is not None }, timestamp)
+
+            row = list(descriptor.defaults)
+            for recorded_index, index in field_map:
+                if index is not None and recorded_index < len(values) and values[recorded_index] is not None:
+                    row[index] = values[recorded_index]
+
+            try:
+                buffer.append(timestamp, row)
+            except (TypeError, ValueError, OverflowError):
+                pass
+
+        cursors[part] = cursor
+
+        if cursor > start_cursor:
+            part.last_measurement = recorded.timestamps[cursor - 1]
+
+        return cursor - start_cursor
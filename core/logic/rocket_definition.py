@@ -7,6 +7,7 @@ from marshmallow import Schema
 
 from core.helper.model_helper import SchemaExt
 from core.logic.commands.command import Command, Command
+from core.logic.measurement_descriptor import MeasurementDescriptor
 
 #Maybe
 
@@ -29,6 +30,8 @@ class Rocket: pass # type: ignore
 MeasurementTypes = Union[str, int, float, None]
 Measurements = Sequence[MeasurementTypes]
 
+MeasurementPriority = Literal['critical', 'status', 'sampled']
+
 #endregion
 
     
@@ -67,6 +70,24 @@ class Part(ABC):
     than this min period, the part will be called for every iteration
     '''
 
+    measurement_buffer_size: int = 2048
+    '''
+    Number of measurements of this part that are kept in memory for the measurement sinks.
+    If a sink falls further behind, it loses the oldest measurements. Increase for parts
+    that return many measurements per collection
+    '''
+
+    measurement_priority: MeasurementPriority = 'sampled'
+    '''
+    How measurement sinks treat the measurements of this part if they can't send everything:
+    - critical: never dropped, e.g. for actuators
+    - status: only changed measurements are sent, but never dropped, e.g. for state machines
+    - sampled: decimated by averaging consecutive measurements, e.g. for high rate sensors
+    '''
+
+    measurement_descriptor: Union[None, MeasurementDescriptor] = None
+    '''Compiled measurement shape, see `get_measurement_descriptor`'''
+
     last_update: Union[None, float] = None
     '''
     Time in unix seconds since the part was last updated
@@ -79,6 +100,13 @@ class Part(ABC):
     Set by the main execution loop after collect_measurements is called
     '''
 
+    replayed: bool = False
+    '''
+    If true, the part is a stand-in for recorded data during a replay (see `core.logic.replay`).
+    Its update, collect_measurements and flush are not called, instead the recorded
+    measurements are passed to `apply_recorded_measurement`
+    '''
+
     def __init__(self, _id: UUID, name: str, parent: Union[Self, Rocket, None], dependencies: Iterable[Self]):
         '''
         :param dependencies: parts that will be updated before this part
@@ -131,18 +159,24 @@ class Part(ABC):
         """Method called at the end of each flight tick. This is to release any memory from the last iteration"""
         pass        
 
+    def get_measurement_descriptor(self) -> MeasurementDescriptor:
+        '''
+        The compiled measurement shape. It is compiled on first use (latest when the flight
+        executor is set up), therefore the measurement shape must not change afterwards
+        '''
+        if self.measurement_descriptor is None:
+            self.measurement_descriptor = MeasurementDescriptor(self.get_measurement_shape())
+        return self.measurement_descriptor
+
     def inflate_measurement(self, measurement: Measurements) -> dict[str, Union[str, int, float]]:
-        res = dict[str, Union[str, int, float]]()
-        i = 0
-        for (key, _) in self.get_measurement_shape():
-            if measurement[i] is None:
-                continue
-            m = measurement[i]
-            if m is not None:
-                res[key] = m
-            i += 1
-        
-        return res
+        return self.get_measurement_descriptor().inflate(measurement)
+
+    def apply_recorded_measurement(self, measurement: dict[str, Union[str, int, float]], timestamp: float):
+        '''
+        Called during a replay with every recorded measurement of a replayed part. Override to
+        restore the state other parts read from this part (e.g. the orientation of a sensor)
+        '''
+        pass
 
 class Rocket:
     """ Class representing the rocket """
@@ -151,14 +185,16 @@ class Rocket:
 
     version: int = 0
 
-    parts = list[Part]()
+    parts: list[Part]
 
     id: Union[None, UUID] = None
 
-    part_lookup = dict[UUID, Part]()
+    part_lookup: dict[UUID, Part]
     
     def __init__(self, name: str):
         self.name = name
+        self.parts = list[Part]()
+        self.part_lookup = dict[UUID, Part]()
 
     def add_part(self, part: Part):
         self.parts.append(part)
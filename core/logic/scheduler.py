@@ -0,0 +1,120 @@
+import heapq
+from typing import Callable, Iterable, Union
+
+from core.logic.rocket_definition import Part
+
+
+class DeadlineQueue:
+    '''
+    Min-heap of parts keyed by the next point in time they are due.
+    Entries are invalidated lazily: a part only counts as scheduled
+    for the deadline stored in `deadlines`, any other heap entry for
+    it is stale and skipped when popped
+    '''
+
+    def __init__(self, order_index: dict[Part, int]):
+        self.order_index = order_index
+        self.deadlines = dict[Part, float]()
+        self.heap = list[tuple[float, int, Part]]()
+
+    def push(self, part: Part, deadline: float):
+        self.deadlines[part] = deadline
+        heapq.heappush(self.heap, (deadline, self.order_index[part], part))
+
+    def cancel(self, part: Part):
+        self.deadlines.pop(part, None)
+
+    def pop_due(self, now: float) -> list[Part]:
+        '''Removes and returns all parts with a deadline at or before `now`'''
+
+        due = list[Part]()
+        heap = self.heap
+        deadlines = self.deadlines
+
+        while heap and heap[0][0] <= now:
+            deadline, _, part = heapq.heappop(heap)
+
+            if deadlines.get(part) != deadline:
+                continue # Stale entry
+
+            del deadlines[part]
+            due.append(part)
+
+        return due
+
+    def next_deadline(self) -> Union[float, None]:
+        '''The earliest deadline of any scheduled part (may be stale)'''
+        return self.heap[0][0] if self.heap else None
+
+
+def deadline_from(last: Union[float, None], period: float) -> float:
+    '''A part that never ran is due immediately'''
+    return float('-inf') if last is None else last + period
+
+
+class DeadlineScheduler:
+    '''
+    Schedules the update and measurement calls of parts by their next deadline,
+    so that each tick only has to visit the parts that are actually due instead
+    of walking the entire execution order. Due parts are always returned in the
+    order of the topological sort to respect the dependencies between parts.
+
+    The deadlines are derived from `Part.last_update` and `Part.last_measurement`,
+    which are still maintained by the flight executor. Therefore a part that fails
+    to update (and does not get `last_update` set) stays due for the next tick.
+    '''
+
+    def __init__(self, execution_order: Iterable[Part]):
+
+        self.execution_order = list(execution_order)
+        self.order_index = {p: i for i, p in enumerate(self.execution_order)}
+
+        self.update_queue = DeadlineQueue(self.order_index)
+        self.measurement_queue = DeadlineQueue(self.order_index)
+
+        self.reschedule_updates(self.execution_order)
+        self.reschedule_measurements(self.execution_order)
+
+    def sort(self, parts: Iterable[Part]) -> list[Part]:
+        '''Sorts the parts by execution order'''
+        return sorted(parts, key=self.order_index.__getitem__)
+
+    def pop_due_updates(self, now: float) -> list[Part]:
+        '''
+        Returns all parts that are due for an update in execution order.
+        They have to be passed to `reschedule_updates` after they were processed
+        '''
+        due = self.update_queue.pop_due(now)
+        due.sort(key=self.order_index.__getitem__)
+        return due
+
+    def pop_due_measurements(self, now: float, additional: Iterable[Part] = ()) -> list[Part]:
+        '''
+        Returns all parts that are due for measurement collection in execution order,
+        including the `additional` parts, independent of their deadline (e.g. because
+        they received commands this tick).
+        They have to be passed to `reschedule_measurements` after they were processed
+        '''
+        due = self.measurement_queue.pop_due(now)
+
+        seen = set(due)
+        for p in additional:
+            if p in seen:
+                continue
+            self.measurement_queue.cancel(p)
+            due.append(p)
+            seen.add(p)
+
+        due.sort(key=self.order_index.__getitem__)
+        return due
+
+    def reschedule_updates(self, parts: Iterable[Part]):
+        self._reschedule(self.update_queue, parts, lambda p: (p.last_update, p.min_update_period.total_seconds()))
+
+    def reschedule_measurements(self, parts: Iterable[Part]):
+        self._reschedule(self.measurement_queue, parts, lambda p: (p.last_measurement, p.min_measurement_period.total_seconds()))
+
+    def _reschedule(self, queue: DeadlineQueue, parts: Iterable[Part], get_timing: Callable[[Part], tuple[Union[float, None], float]]):
+        for p in parts:
+            last, period = get_timing(p)
+            queue.push(p, deadline_from(last, period))
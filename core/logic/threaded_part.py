@@ -0,0 +1,121 @@
+from abc import abstractmethod
+from concurrent.futures import Executor, Future
+from logging import getLogger
+import time
+from typing import Any, Callable, Collection, Iterable, Union
+
+from core.logic.commands.command import Command
+from core.logic.rocket_definition import Part
+
+
+class ThreadedPart(Part):
+    '''
+    Base class for parts that have to do blocking work (device calls, I/O, etc.).
+    The blocking work is defined in `work` and is run on the thread pool of the
+    flight executor instead of the event loop thread.
+
+    Every update the part:
+    1. Processes the commands on the event loop thread (`update_commands`)
+    2. Applies the result of the work that finished since the last update (`apply_result`)
+    3. Submits the next call of `work`, unless the previous one is still running
+
+    Therefore a slow device call delays only the data of this part instead of
+    the whole control loop. Results arrive at the earliest with the next update.
+    The measurements collected after a result was applied are timestamped with
+    the time its work finished, not the time they were collected.
+
+    Warning: `work` runs on another thread. It should only read the state it
+    needs and return its result instead of modifying the part.
+    '''
+
+    thread_pool: Union[None, Executor] = None
+    '''
+    Set by the flight executor. If no thread pool is set, the work is run
+    directly within update
+    '''
+
+    clock: Callable[[], float] = time.time
+    '''
+    Source of the finish times of the work. Set by the flight executor to its own clock,
+    so the results are timestamped in the same timebase as all other measurements
+    '''
+
+    pending_work: Union[None, Future] = None
+
+    work_submit_time: Union[None, float] = None
+
+    last_result_time: Union[None, float] = None
+    '''Time in unix seconds at which the work of the last applied result finished'''
+
+    result_time: Union[None, float] = None
+    '''
+    Time the work of the result applied since the last collection of measurements finished.
+    Used by the flight executor as the timestamp of the measurements, then reset
+    '''
+
+    def update(self, commands: Iterable[Command], now: float, iteration: int) -> Union[None, Collection[Command]]:
+
+        generated_commands = self.update_commands(commands, now, iteration)
+
+        if self.thread_pool is None:
+            self.work_submit_time = now
+            result, exception, _ = self.run_work(now, iteration)
+            # Finished within this tick
+            self.handle_work_result((result, exception, now))
+            return generated_commands
+
+        if self.pending_work is not None and self.pending_work.done():
+            future = self.pending_work
+            self.pending_work = None
+            self.handle_work_result(future.result())
+
+        if self.pending_work is None:
+            self.work_submit_time = now
+            self.pending_work = self.thread_pool.submit(self.run_work, now, iteration)
+
+        return generated_commands
+
+    def run_work(self, now: float, iteration: int) -> tuple[Any, Union[None, Exception], float]:
+        try:
+            return (self.work(now, iteration), None, self.clock())
+        except Exception as e:
+            return (None, e, self.clock())
+
+    def handle_work_result(self, work_result: tuple[Any, Union[None, Exception], float]):
+
+        result, exception, finish_time = work_result
+
+        if exception is not None:
+            self.on_work_failed(exception)
+            return
+
+        self.last_result_time = finish_time
+        self.result_time = finish_time
+        self.apply_result(result, self.work_submit_time or finish_time, finish_time)
+
+    def update_commands(self, commands: Iterable[Command], now: float, iteration: int) -> Union[None, Collection[Command]]:
+        '''Processes the commands of this tick on the event loop thread. Commands not handled are set to failed'''
+
+        for c in commands:
+            c.state = 'failed'
+
+        return None
+
+    @abstractmethod
+    def work(self, now: float, iteration: int) -> Any:
+        '''The blocking work of the part. Runs on a worker thread'''
+        pass
+
+    @abstractmethod
+    def apply_result(self, result: Any, submit_time: float, finish_time: float):
+        '''
+        Called on the event loop thread with the result of `work`
+
+        submit_time: Time the work was submitted in epoch seconds
+        finish_time: Time the work finished in epoch seconds
+        '''
+        pass
+
+    def on_work_failed(self, exception: Exception):
+        '''Called on the event loop thread if `work` raised. The update continues, so the commands of this tick are not lost'''
+        getLogger('Threaded Part').error(f'Work of part {self.name} failed: {exception}')
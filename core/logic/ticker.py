@@ -0,0 +1,102 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+import time
+from typing import Callable, Union
+
+
+@dataclass
+class TickStatistics:
+    '''Timing statistics of all ticks since the statistics were last taken'''
+
+    ticks: int
+
+    jitter_p50: float
+    '''Median delay between the scheduled and the actual tick start in seconds'''
+
+    jitter_p99: float
+
+    jitter_max: float
+
+    missed_deadlines: int
+    '''Deadlines that were skipped by the catch-up policy'''
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if len(sorted_values) < 1:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(q*len(sorted_values)))]
+
+
+class FixedRateTicker:
+    '''
+    Paces a loop at a fixed rate by scheduling every tick against an absolute
+    deadline on a monotonic clock. Unlike sleeping for the remainder of the
+    frame time this does not accumulate error, so the average rate stays exact
+    even if individual ticks are delayed.
+
+    If the loop falls behind, up to `max_catch_up_ticks` ticks are run back to back
+    to catch up. If it is further behind than that, the missed deadlines are dropped
+    and the schedule is re-aligned to the clock. In either case `wait` always yields
+    to the event loop, so other tasks (sinks, command responses) are never starved.
+    '''
+
+    period: float
+
+    max_catch_up_ticks: int
+
+    next_deadline: Union[float, None] = None
+
+    max_samples = 4096
+    '''Jitter samples kept between two calls of `take_statistics`, older ones are dropped'''
+
+    def __init__(self, period: float, max_catch_up_ticks: int = 2, clock: Callable[[], float] = time.monotonic):
+        self.period = period
+        self.max_catch_up_ticks = max_catch_up_ticks
+        self.clock = clock
+
+        self.jitter_samples = deque[float](maxlen=self.max_samples)
+        self.missed_deadlines = 0
+
+    def start(self):
+        self.next_deadline = self.clock()
+
+    async def wait(self):
+        '''Waits until the deadline of the next tick'''
+
+        if self.next_deadline is None:
+            self.start()
+
+        assert self.next_deadline is not None
+
+        self.next_deadline += self.period
+
+        now = self.clock()
+        behind = now - self.next_deadline
+
+        # Too far behind, drop the missed ticks instead of racing through them
+        if behind > self.max_catch_up_ticks*self.period:
+            missed = int(behind/self.period)
+            self.next_deadline += missed*self.period
+            self.missed_deadlines += missed
+
+        await asyncio.sleep(max(0, self.next_deadline - now))
+
+        self.jitter_samples.append(max(0, self.clock() - self.next_deadline))
+
+    def take_statistics(self) -> TickStatistics:
+        '''Returns the statistics since the last call and resets them'''
+
+        samples = sorted(self.jitter_samples)
+        self.jitter_samples.clear()
+
+        missed = self.missed_deadlines
+        self.missed_deadlines = 0
+
+        return TickStatistics(
+            len(samples),
+            percentile(samples, 0.5),
+            percentile(samples, 0.99),
+            samples[-1] if len(samples) > 0 else 0,
+            missed
+        )
@@ -29,6 +29,8 @@ class FlightDirector(Part):
 
     type = 'FlightDirector'
 
+    measurement_priority = 'status'
+
     enabled: bool = True
 
     connected: bool = False
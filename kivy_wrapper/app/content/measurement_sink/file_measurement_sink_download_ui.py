@@ -1,6 +1,7 @@
 import os
 import shutil
 from core.content.measurement_sinks.file_measurement_sink import FileMeasurementSink
+from core.helper.measurement_file import MEASUREMENT_FILE_EXTENSION
 
 from kivy.uix.label import Label
 from kivy.uix.boxlayout import BoxLayout
@@ -54,7 +55,7 @@ class FileMeasurementSinkDownloadUI(BoxLayout, PartUi[FileMeasurementSink]):
     def prepare_files_for_download(self):
 
         # Select all files up but not including the current one
-        current_files = [f'{self.part.flight_data_folder}/{c}.json' for c in range(1, self.part.current_file_count)] 
+        current_files = [self.part.get_file_path(c) for c in range(1, self.part.current_file_count)]
 
         Logger.info(f'Downloading following files: {current_files}')
 
@@ -63,7 +64,7 @@ class FileMeasurementSinkDownloadUI(BoxLayout, PartUi[FileMeasurementSink]):
         i = 0
         for f in current_files:
             i += 1
-            filename = join(SharedStorage().get_cache_dir(), f'{i}.json')
+            filename = join(SharedStorage().get_cache_dir(), f'{i}{MEASUREMENT_FILE_EXTENSION}')
             shutil.copyfile(f, filename)
             shared_storage_locations.append(SharedStorage().copy_to_shared(filename))
 
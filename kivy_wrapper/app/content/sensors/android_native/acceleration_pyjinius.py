@@ -30,6 +30,9 @@ class PyjiniusAccelerationSensor(Part):
 
     min_measurement_period = timedelta(milliseconds=10)
 
+    measurement_buffer_size = 8192
+    '''Several sensor events are returned per collection'''
+
     status_data_rate = 1_000
 
     calibration_duration = 5
@@ -179,6 +179,13 @@ class InertialReferenceFrame(Part, IOrientationSensor):
             *self.position
         ]]
     
+    def apply_recorded_measurement(self, measurement, timestamp: float):
+
+        self.orientation = np.array([measurement.get(f'orientation-{a}', 0) for a in 'wxyz'], dtype=float)
+        self.air_velocity = np.array([measurement.get(f'air_velocity-{a}', 0) for a in 'xyz'], dtype=float)
+        self.ground_velocity = np.array([measurement.get(f'ground-velocity-{a}', 0) for a in 'xyz'], dtype=float)
+        self.position = np.array([measurement.get(f'position-{a}', 0) for a in 'xyz'], dtype=float)
+
     def get_orientation(self):
         if(self.orientation is None):
             return None
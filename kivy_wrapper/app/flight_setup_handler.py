@@ -196,9 +196,13 @@ class FlightSetupHandler():
 
         if canceled:
             self.logger.warning(f'Flight execution loop canceled, aborting')
+            await self.api_client.close()
             return
 
-        await self.executor.run_control_loop(self.make_ui_hook())
+        try:
+            await self.executor.run_control_loop(self.make_ui_hook())
+        finally:
+            await self.api_client.close()
         
 
         
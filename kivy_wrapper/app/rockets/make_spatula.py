@@ -4,11 +4,14 @@ from kivy_wrapper.app.content.flight_director.flight_director import FlightDirec
 from core.content.flight_director.positive_attitude_alanyzer import PositiveAttitudeAnalyzer
 from core.content.measurement_sinks.api_measurement_sink import ApiMeasurementSink
 from core.content.measurement_sinks.file_measurement_sink import FileMeasurementSink
+from core.content.measurement_sinks.black_box_sink import BlackBoxMeasurementSink
 from core.content.microcontroller.arduino_serial import ArduinoOverSerial
 from kivy_wrapper.app.content.microcontroller.arduino_serial_select_ui import ArduinoSerialSelectUI
 from core.content.sensors.computed.barometric_altitude import BarometricAltitudeSensor
 from kivy_wrapper.app.ui.barometric_altitude_config_ui import BarometricAltitudeConfigUI
 from core.content.sensors.plyer.framerate import FramerateSensor, FramerateSensor
+from core.content.executor.tick_timing import TickTimingSensor
+from core.content.executor.profiler import ExecutorProfiler
 from core.content.sensors.plyer.gps_plyer import PlyerGPSSensor
 from core.content.sensors.plyer.battery_plyer import PlyerBatterySensor, PlyerBatterySensor
 from core.content.microcontroller.arduino.parts.servo import ServoSensor
@@ -40,8 +43,11 @@ def make_spatula() -> FlightConfig:
 
     # Computer status parts
     FramerateSensor(UUID('8d45c8e7-7ae2-4496-a5e0-047a631ef17c'), 'Framerate', rocket)
+    TickTimingSensor(UUID('3c1f6a52-9d0e-4b7f-8f2a-6d4e1b7c2a90'), 'Tick Timing', rocket)
+    ExecutorProfiler(UUID('e2b7d4c8-51a3-4f96-9c0d-7a8e3f5b1d64'), 'Executor Profiler', rocket)
     measurement_sink = ApiMeasurementSink(UUID('fa9eac88-5d2f-41a6-aeab-85c1591433a2'), 'Measurement dispatch', rocket)
     file_sink = FileMeasurementSink(UUID('ebcf7ca3-9757-42f8-b972-af769e5d0d75'), 'Measurement File Storage', rocket)
+    BlackBoxMeasurementSink(UUID('5b0e9c1d-7f3a-4e82-b6d4-2c9a8f1e7d35'), 'Black Box', rocket)
 
     # # Plyer sensors
     PlyerBatterySensor(UUID('547a50de-589e-4744-aada-a85bd72deba0'), 'Battery Sensor', rocket)
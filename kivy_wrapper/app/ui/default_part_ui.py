@@ -25,7 +25,7 @@ class DefaultPartUI(BoxLayout, PartUi[Part]):
 
 
     def add_labels_for_measurements(self):
-        for name, type in self.part.get_measurement_shape():
+        for name in self.part.get_measurement_descriptor().field_names:
             self.labels[name] = Label(text=name)
             self.add_widget(self.labels[name])
 
@@ -35,10 +35,8 @@ class DefaultPartUI(BoxLayout, PartUi[Part]):
         if measurement is None:
             return
 
-        i = 0
-        for name, type in self.part.get_measurement_shape():
-            self.labels[name].text = f'{name}: {measurement[-1][i]}'
-            i += 1
+        for name, value in zip(self.part.get_measurement_descriptor().field_names, measurement[-1]):
+            self.labels[name].text = f'{name}: {value}'
 
     def draw(self):
         self.update_text()
\ No newline at end of file
@@ -18,16 +18,16 @@ async def main():
 
         config = json.load(f)
 
-    api_client = ApiClient(config['api_token'])
+    async with ApiClient(config['api_token']) as api_client:
 
-    flight = await api_client.run_full_setup_handshake(rocket, f'Flight at {datetime.now()}')
+        flight = await api_client.run_full_setup_handshake(rocket, f'Flight at {datetime.now()}')
 
-    executor = FlightExecuter(rocket, flight, api_client)
+        executor = FlightExecuter(rocket, flight, api_client)
 
-    realtime_client = RealtimeApiClient(api_client, flight)
-    await realtime_client.connect(executor.make_on_new_command())
+        realtime_client = RealtimeApiClient(api_client, flight)
+        await realtime_client.connect(executor.make_on_new_command())
 
-    await executor.run_control_loop()
+        await executor.run_control_loop()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,184 @@
+import argparse
+import asyncio
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import platform
+import ssl
+import threading
+import time
+from typing import Awaitable, Callable, Union
+from uuid import uuid4
+
+import httpx
+import jwt
+
+from core.api_client import ApiClient
+from core.logic.ticker import percentile
+
+RESULT_FORMAT_VERSION = 1
+
+
+class StandInServer(ThreadingHTTPServer):
+    '''
+    Minimal stand in for the FlightManagementServer. Every new connection and every request is
+    delayed by the simulated round trip time, so the cost of handshakes shows like on a real link
+    '''
+
+    daemon_threads = True
+
+    connections = 0
+
+    def __init__(self, rtt: float, certfile: Union[None, str], keyfile: Union[None, str]):
+
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+
+        self.rtt = rtt
+        self.lock = threading.Lock()
+
+        if certfile is not None:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.socket = context.wrap_socket(self.socket, server_side=True)
+
+    def get_request(self):
+
+        connection = super().get_request()
+
+        with self.lock:
+            self.connections += 1
+
+        # The TCP handshake
+        time.sleep(self.rtt)
+
+        return connection
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    server: StandInServer
+
+    def do_POST(self):
+
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        time.sleep(self.server.rtt)
+
+        if self.path.startswith('/auth/'):
+            body = json.dumps({ 'token': jwt.encode({ 'exp': time.time() + 3600, 'uid': str(uuid4()) }, 'stand-in', algorithm='HS256') }).encode('utf-8')
+        else:
+            body = b''
+
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@dataclass
+class UploadResult:
+
+    client: str
+
+    uploads: int
+
+    connections: int
+    '''Connections the server accepted'''
+
+    mean_ms: float
+
+    p50_ms: float
+
+    p99_ms: float
+
+
+async def post_per_request(api_client: ApiClient, flight_id: str, data: bytes, timeout: float) -> tuple[bool, str]:
+    '''Opens a new client per upload, as the api client did before it pooled its connections'''
+
+    async with httpx.AsyncClient(verify=api_client.verify) as client:
+
+        bearer = await api_client.authenticate()
+
+        client.base_url = api_client.endpoint
+        client.headers.setdefault('Authorization', 'Bearer ' + bearer)
+        client.headers.setdefault('Content-Type', 'application/octet-stream')
+
+        res = await client.post(f'/flight_data/report_binary/{flight_id}', content=data, timeout=timeout)
+
+        return (res.status_code >= 200 and res.status_code < 300, str(res.status_code))
+
+
+async def measure(name: str, server: StandInServer, upload: Callable[[], Awaitable[tuple[bool, str]]], uploads: int) -> UploadResult:
+
+    # Authenticate (and with the pooled client connect) before measuring
+    await upload()
+
+    connections_before = server.connections
+    durations = list[float]()
+
+    for _ in range(uploads):
+
+        start = time.perf_counter()
+        success, reason = await upload()
+        durations.append(time.perf_counter() - start)
+
+        if not success:
+            raise Exception(f'Upload failed: {reason}')
+
+    durations.sort()
+
+    return UploadResult(name, uploads, server.connections - connections_before, sum(durations)/len(durations)*1000, percentile(durations, 0.5)*1000, percentile(durations, 0.99)*1000)
+
+
+async def run(args) -> list[UploadResult]:
+
+    server = StandInServer(args.rtt/1000, args.certfile, args.keyfile)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    scheme = 'https' if args.certfile is not None else 'http'
+    endpoint = f'{scheme}://127.0.0.1:{server.server_address[1]}'
+
+    data = bytes(args.size)
+    flight_id = str(uuid4())
+
+    try:
+        async with ApiClient('stand-in', endpoint=endpoint, verify=args.certfile is None) as api_client:
+
+            return [
+                await measure('per_request', server, lambda: post_per_request(api_client, flight_id, data, 10), args.uploads),
+                await measure('pooled', server, lambda: api_client.try_report_binray_flight_data(flight_id, data, 10), args.uploads)
+            ]
+    finally:
+        server.shutdown()
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Benchmarks measurement uploads against a local stand in server, with a new connection per upload and with the pooled connections of the api client. Prints the results as json')
+    parser.add_argument('--uploads', type=int, default=50)
+    parser.add_argument('--size', type=int, default=4096, help='Bytes per upload')
+    parser.add_argument('--rtt', type=float, default=50, help='Simulated round trip time in ms')
+    parser.add_argument('--certfile', default=None, help='Certificate to serve https with, so the TLS handshake is included')
+    parser.add_argument('--keyfile', default=None)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    print(json.dumps({
+        'format_version': RESULT_FORMAT_VERSION,
+        'time': datetime.now(UTC).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'rtt_ms': args.rtt,
+        'results': [asdict(r) for r in results]
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+from array import array
+import argparse
+import asyncio
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+import gc
+import json
+from logging import _nameToLevel, getLogger
+import platform
+import resource
+import sys
+from tempfile import TemporaryDirectory
+import time
+import tracemalloc
+from typing import Union, cast
+from uuid import UUID, uuid4
+
+from core.api_client import ApiClient
+from core.content.general_commands.enable import EnableCommand
+from core.content.measurement_sinks.api_measurement_sink import ApiMeasurementSink
+from core.content.testing.synthetic_part import SyntheticPart
+from core.flight_executer import FlightExecuter
+from core.helper.global_data_dir import set_user_data_dir
+from core.logic.measurement_sink import MeasurementSinkBase
+from core.logic.replay import OfflineApiClient, VirtualClock
+from core.logic.ticker import percentile
+from core.models.command import Command as CommandModel
+from core.models.flight import Flight
+from core.logic.rocket_definition import Rocket
+
+RESULT_FORMAT_VERSION = 2
+
+
+@dataclass
+class BenchmarkConfig:
+
+    parts: int = 50
+
+    measurement_width: int = 8
+    '''Float values per measurement'''
+
+    measurements_per_tick: int = 1
+
+    dependency_depth: int = 4
+    '''Length of the dependency chains the parts are arranged in'''
+
+    commands_per_second: float = 10
+    '''Commands received per simulated second, spread over all parts'''
+
+    period: float = 0.01
+    '''Simulated time per tick in seconds'''
+
+    ticks: int = 2000
+
+    warmup_ticks: int = 200
+
+    trace_allocations: bool = False
+    '''Trace the bytes allocated per tick with tracemalloc (slows down the loop considerably)'''
+
+
+@dataclass
+class BenchmarkResult:
+
+    config: BenchmarkConfig
+
+    ticks_per_second: float
+    '''Ticks per wall clock second, including the time given to other tasks (sinks, etc.)'''
+
+    tick_cpu_mean_us: float
+
+    tick_cpu_p50_us: float
+
+    tick_cpu_p99_us: float
+
+    tick_cpu_max_us: float
+
+    tick_wall_p99_us: float
+
+    allocated_blocks_per_tick: float
+    '''Mean net growth of allocated python memory blocks per tick'''
+
+    gc_collections: int
+
+    measurement_store_bytes: int
+    '''Size of the ring buffers of all parts, fixed when the executor is created'''
+
+    chunk_log_bytes: int
+    '''Encoded measurements kept for the sinks at the end of the run'''
+
+    max_chunk_log_bytes: int
+
+    sink_backlog_bytes: dict[str, int]
+    '''Measurements each sink did not read yet at the end of the run, by sink name'''
+
+    max_sink_backlog_bytes: int
+    '''Peak of the backlogs of all sinks together, sampled after every tick'''
+
+    sink_dropped_measurements: int
+
+    max_rss_growth_kb: int
+
+    commands_sent: int
+
+    traced_bytes_per_tick: Union[None, float] = None
+    '''Mean peak of traced memory allocated during a tick (only if allocations are traced)'''
+
+
+def make_synthetic_rocket(config: BenchmarkConfig) -> tuple[Rocket, list[SyntheticPart]]:
+    '''Rocket with `config.parts` synthetic parts arranged in dependency chains and an api measurement sink'''
+
+    rocket = Rocket('Benchmark')
+
+    parts = list[SyntheticPart]()
+
+    for i in range(config.parts):
+        dependencies = [parts[-1]] if i % max(1, config.dependency_depth) != 0 else []
+        parts.append(SyntheticPart(uuid4(), f'Synthetic {i}', rocket, dependencies, config.measurement_width, config.measurements_per_tick))
+
+    ApiMeasurementSink(uuid4(), 'Measurement dispatch', rocket)
+
+    return (rocket, parts)
+
+
+def make_command(part_id: UUID, now: float) -> CommandModel:
+    return CommandModel(uuid4(), EnableCommand.command_type, datetime.fromtimestamp(now), part_id, state='dispatched')
+
+
+async def run_benchmark(config: BenchmarkConfig) -> BenchmarkResult:
+
+    rocket, parts = make_synthetic_rocket(config)
+
+    clock = VirtualClock(time.time())
+    start = clock.now
+
+    executor = FlightExecuter(rocket, Flight(start=datetime.now(UTC)), cast(ApiClient, OfflineApiClient()), config.period, fixed_rate=False, clock=clock)
+    on_new_command = executor.make_on_new_command()
+
+    # Arrays instead of lists, so recording the samples does not show up as allocated blocks
+    cpu_samples = array('q')
+    wall_samples = array('q')
+    traced_samples = array('q')
+    chunk_log_samples = array('q')
+    backlog_samples = array('q')
+
+    sinks = [p for p in rocket.parts if isinstance(p, MeasurementSinkBase)]
+
+    commands_sent = 0
+    gc_before = 0
+    blocks_before = 0
+    rss_before = 0
+    wall_start = 0.0
+
+    last_update = start
+
+    for iteration in range(config.warmup_ticks + config.ticks):
+
+        if iteration == config.warmup_ticks:
+            gc_before = sum(s['collections'] for s in gc.get_stats())
+            blocks_before = sys.getallocatedblocks()
+            rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            wall_start = time.perf_counter()
+            if config.trace_allocations:
+                tracemalloc.start()
+
+        # Commands arriving from the server since the last tick
+        due_commands = int((clock.now - start)*config.commands_per_second) - commands_sent
+        if due_commands > 0 and len(parts) > 0:
+            on_new_command([make_command(parts[(commands_sent + i) % len(parts)]._id, clock.now) for i in range(due_commands)])
+            commands_sent += due_commands
+
+        measuring = iteration >= config.warmup_ticks
+
+        if measuring and config.trace_allocations:
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+
+        cpu_start = time.process_time_ns()
+        wall_tick_start = time.perf_counter_ns()
+
+        last_update = executor.control_loop(iteration, last_update)
+
+        if measuring:
+            wall_samples.append(time.perf_counter_ns() - wall_tick_start)
+            cpu_samples.append(time.process_time_ns() - cpu_start)
+
+            if config.trace_allocations:
+                traced_samples.append(tracemalloc.get_traced_memory()[1] - traced_before)
+
+            # The real buffer of the sinks, it grows while the sinks fall behind
+            chunk_log_samples.append(executor.measurement_chunks.nbytes)
+            backlog_samples.append(sum(s.backlog_bytes for s in sinks))
+
+        # Give the sinks and the command responses a chance to run, as the real loop does
+        await asyncio.sleep(0)
+
+        clock.now = start + (iteration + 1)*config.period
+
+    wall_duration = time.perf_counter() - wall_start
+
+    if config.trace_allocations:
+        tracemalloc.stop()
+
+    blocks_after = sys.getallocatedblocks()
+    gc_after = sum(s['collections'] for s in gc.get_stats())
+
+    cpu_sorted = sorted(cpu_samples)
+    wall_sorted = sorted(wall_samples)
+
+    result = BenchmarkResult(
+        config,
+        ticks_per_second=config.ticks/wall_duration if wall_duration > 0 else 0,
+        tick_cpu_mean_us=sum(cpu_samples)/max(1, len(cpu_samples))/1000,
+        tick_cpu_p50_us=percentile(cpu_sorted, 0.5)/1000,
+        tick_cpu_p99_us=percentile(cpu_sorted, 0.99)/1000,
+        tick_cpu_max_us=(cpu_sorted[-1] if len(cpu_sorted) > 0 else 0)/1000,
+        tick_wall_p99_us=percentile(wall_sorted, 0.99)/1000,
+        allocated_blocks_per_tick=(blocks_after - blocks_before)/max(1, config.ticks),
+        gc_collections=gc_after - gc_before,
+        measurement_store_bytes=executor.measurement_store.nbytes,
+        chunk_log_bytes=executor.measurement_chunks.nbytes,
+        max_chunk_log_bytes=max(chunk_log_samples, default=0),
+        sink_backlog_bytes={ s.name: s.backlog_bytes for s in sinks },
+        max_sink_backlog_bytes=max(backlog_samples, default=0),
+        sink_dropped_measurements=sum(s.dropped_measurements for s in sinks),
+        max_rss_growth_kb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before,
+        commands_sent=commands_sent,
+        traced_bytes_per_tick=sum(traced_samples)/len(traced_samples) if len(traced_samples) > 0 else None
+    )
+
+    executor.__del__()
+
+    return result
+
+
+async def main():
+
+    defaults = BenchmarkConfig()
+
+    parser = argparse.ArgumentParser(description='Benchmarks the flight executor control loop with synthetic rockets. Prints the results as json')
+    parser.add_argument('--parts', type=int, nargs='+', default=[defaults.parts], help='Number of parts, one run per value')
+    parser.add_argument('--width', type=int, default=defaults.measurement_width, help='Float values per measurement')
+    parser.add_argument('--measurements-per-tick', type=int, default=defaults.measurements_per_tick)
+    parser.add_argument('--depth', type=int, default=defaults.dependency_depth, help='Length of the dependency chains')
+    parser.add_argument('--commands-per-second', type=float, default=defaults.commands_per_second)
+    parser.add_argument('--period', type=float, default=defaults.period, help='Simulated time per tick in seconds')
+    parser.add_argument('--ticks', type=int, default=defaults.ticks)
+    parser.add_argument('--warmup-ticks', type=int, default=defaults.warmup_ticks)
+    parser.add_argument('--trace-allocations', action='store_true')
+    parser.add_argument('--output', type=str, default=None, help='Write the results to this file instead of stdout')
+    args = parser.parse_args()
+
+    getLogger().setLevel(_nameToLevel['WARNING'])
+
+    results = list[BenchmarkResult]()
+
+    with TemporaryDirectory() as data_dir:
+
+        # The executor writes logs and the received commands into the flight folder
+        set_user_data_dir(data_dir)
+
+        for part_count in args.parts:
+            config = BenchmarkConfig(
+                part_count,
+                args.width,
+                args.measurements_per_tick,
+                args.depth,
+                args.commands_per_second,
+                args.period,
+                args.ticks,
+                args.warmup_ticks,
+                args.trace_allocations
+            )
+            results.append(await run_benchmark(config))
+            gc.collect()
+
+    report = {
+        'format_version': RESULT_FORMAT_VERSION,
+        'time': datetime.now(UTC).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': [asdict(r) for r in results]
+    }
+
+    serialized = json.dumps(report, indent=2)
+
+    if args.output is None:
+        print(serialized)
+        return
+
+    with open(args.output, 'w') as f:
+        f.write(serialized)
+
+
+if __name__ == '__main__':
+    with asyncio.Runner() as runner:
+        runner.run(main())
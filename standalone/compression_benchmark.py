@@ -0,0 +1,146 @@
+import argparse
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+import json
+import math
+import platform
+import time
+
+import numpy as np
+
+from core.content.measurement_sinks.api_measurement_sink import PART_HEADER
+from core.helper.measurement_index import FlightDataReader
+from core.helper.payload_compression import LEVELS, AdaptiveCompression, PayloadEncoding, compress_payload
+from core.logic.measurement_descriptor import TIMESTAMP_FIELD
+
+RESULT_FORMAT_VERSION = 1
+
+
+@dataclass
+class CompressionResult:
+
+    encoding: str
+
+    level: int
+
+    ratio: float
+    '''Compressed to uncompressed size'''
+
+    cpu_us_per_kib: float
+
+    upload_ms: dict[str, float]
+    '''Mean time per upload (compression plus transfer) by link bandwidth in bytes per second'''
+
+
+@dataclass
+class AdaptiveResult:
+
+    encoding: str
+
+    bandwidth: float
+
+    final_level: int
+
+    upload_ms: float
+
+
+def make_payloads(reader: FlightDataReader, period: float) -> list[bytes]:
+    '''Rebuilds the bodies of the api uploads from the recorded measurements, one per period of flight time'''
+
+    batches = dict[int, list[bytes]]()
+
+    for part in reader.parts.values():
+
+        records = reader.read(part.part_id)
+
+        if len(records) < 1:
+            continue
+
+        batch_indices = np.floor(records[TIMESTAMP_FIELD]/period).astype(np.int64)
+        starts = np.flatnonzero(np.diff(batch_indices, prepend=batch_indices[0] - 1))
+        ends = [*starts[1:], len(records)]
+
+        for start, end in zip(starts, ends):
+            batches.setdefault(int(batch_indices[start]), list()).append(PART_HEADER.pack(part.index, end - start) + records[start:end].tobytes())
+
+    return [b''.join(batches[k]) for k in sorted(batches)]
+
+
+def measure_level(payloads: list[bytes], encoding: PayloadEncoding, level: int, bandwidths: list[float]) -> CompressionResult:
+
+    size = sum(len(p) for p in payloads)
+
+    if level == 0:
+        compressed_size = size
+        cpu_time = 0.0
+    else:
+        start = time.process_time()
+        compressed_size = sum(len(compress_payload(p, encoding, level)) for p in payloads)
+        cpu_time = time.process_time() - start
+
+    upload_ms = { f'{b:.0f}': (cpu_time + compressed_size/b)/len(payloads)*1000 for b in bandwidths }
+
+    return CompressionResult(encoding, level, compressed_size/size, cpu_time/size*1024*1e6, upload_ms)
+
+
+def run_adaptive(payloads: list[bytes], encoding: PayloadEncoding, bandwidth: float) -> AdaptiveResult:
+    '''Runs the adaptive level selection of the api sink over the payloads, with a link of the given bandwidth'''
+
+    compression = AdaptiveCompression(encoding)
+    total = 0.0
+
+    for p in payloads:
+
+        level = compression.next_level(len(p), bandwidth)
+
+        if level == 0:
+            total += len(p)/bandwidth
+            continue
+
+        start = time.thread_time()
+        compressed = compress_payload(p, encoding, level)
+        cpu_time = time.thread_time() - start
+
+        compression.record(level, len(p), len(compressed), cpu_time, bandwidth)
+
+        total += cpu_time + min(len(compressed), len(p))/bandwidth
+
+    return AdaptiveResult(encoding, bandwidth, compression.level, total/len(payloads)*1000)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Benchmarks the compression of measurement uploads with the measurements of a recorded flight. Prints the results as json')
+    parser.add_argument('folder', help='Flight folder with measurement files (.rssm)')
+    parser.add_argument('--period', type=float, default=0.5, help='Flight time covered by an upload in seconds')
+    parser.add_argument('--bandwidths', type=float, nargs='+', default=[16e3, 128e3, 1e6, 10e6], help='Link bandwidths in bytes per second')
+    args = parser.parse_args()
+
+    payloads = make_payloads(FlightDataReader(args.folder, store_index=False), args.period)
+
+    if len(payloads) < 1:
+        raise Exception(f'No measurements recorded in {args.folder}')
+
+    encodings: list[PayloadEncoding] = ['deflate', 'xz']
+
+    results = [measure_level(payloads, 'deflate', 0, args.bandwidths)]
+    adaptive = list[AdaptiveResult]()
+
+    for encoding in encodings:
+        results.extend(measure_level(payloads, encoding, level, args.bandwidths) for level in LEVELS[encoding])
+        adaptive.extend(run_adaptive(payloads, encoding, b) for b in args.bandwidths)
+
+    print(json.dumps({
+        'format_version': RESULT_FORMAT_VERSION,
+        'time': datetime.now(UTC).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'uploads': len(payloads),
+        'mean_upload_bytes': math.fsum(len(p) for p in payloads)/len(payloads),
+        'results': [asdict(r) for r in results],
+        'adaptive': [asdict(r) for r in adaptive]
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
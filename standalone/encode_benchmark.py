@@ -0,0 +1,193 @@
+import argparse
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+import json
+import math
+import platform
+import time
+from typing import Callable, Union
+
+import numpy as np
+
+from core.helper.gorilla_codec import encode_records
+from core.helper.measurement_file import read_measurement_file
+from core.logic.measurement_descriptor import MeasurementDescriptor
+from core.logic.measurement_ring_buffer import MeasurementRingBuffer
+
+RESULT_FORMAT_VERSION = 2
+
+SAMPLE_PERIOD = 0.01
+'''Period of the synthetic records, the default frame time of the flight executor'''
+
+
+@dataclass
+class EncodeResult:
+
+    encoder: str
+
+    samples: int
+
+    seconds_per_run: float
+
+    samples_per_second: float
+
+    bytes_per_sample: float
+
+    compression_ratio: float
+    '''Size of the uncompressed wire format divided by the encoded size'''
+
+
+def make_sine_records(samples: int, width: int) -> tuple[MeasurementDescriptor, np.ndarray]:
+    '''Records shaped like an IMU part: float channels, a counter and a flag. Every float changes with every sample'''
+
+    descriptor = MeasurementDescriptor([*[(f'v{i}', 'f') for i in range(width)], ('sequence', 'I'), ('calibrated', '?')])
+
+    buffer = MeasurementRingBuffer(descriptor, samples)
+
+    for i in range(samples):
+        t = i*SAMPLE_PERIOD
+        buffer.append(1700000000 + t, [*[float(np.sin(t + c)) for c in range(width)], i, i > 10])
+
+    records, _, _ = buffer.read(0)
+
+    return (descriptor, records)
+
+
+def make_sensor_records(samples: int) -> tuple[MeasurementDescriptor, np.ndarray]:
+    '''
+    Records shaped like the sensors of a slow flight, sampled every frame: a noisy accelerometer and
+    gyroscope quantized to the resolution of their ADC, a barometer updating every 4th frame, a
+    GPS every 10th, temperature and battery voltage once per second, a counter and a flag
+    '''
+
+    descriptor = MeasurementDescriptor([
+        ('acc_x', 'f'), ('acc_y', 'f'), ('acc_z', 'f'),
+        ('gyro_x', 'f'), ('gyro_y', 'f'), ('gyro_z', 'f'),
+        ('pressure', 'f'), ('latitude', 'd'), ('longitude', 'd'), ('gps_altitude', 'f'),
+        ('temperature', 'f'), ('battery', 'f'), ('sequence', 'I'), ('armed', '?')
+    ])
+
+    # Resolution of a 16 bit accelerometer (+-16 g) and gyroscope (+-2000 deg/s)
+    acc_lsb = 16*9.81/32768
+    gyro_lsb = 2000/32768
+
+    rng = np.random.default_rng(0)
+
+    buffer = MeasurementRingBuffer(descriptor, samples)
+
+    def held(i: int, every: int) -> float:
+        '''Time of the last update of a sensor updating every `every` frames'''
+        return (i - i % every)*SAMPLE_PERIOD
+
+    for i in range(samples):
+
+        t = i*SAMPLE_PERIOD
+        altitude = 500*(1 - math.cos(2*math.pi*held(i, 4)/120))
+        gps_altitude = 500*(1 - math.cos(2*math.pi*held(i, 10)/120))
+
+        acc = [round((9.81*(c == 2) + rng.normal(0, 0.05))/acc_lsb)*acc_lsb for c in range(3)]
+        gyro = [round(rng.normal(0, 0.1)/gyro_lsb)*gyro_lsb for _ in range(3)]
+
+        buffer.append(1700000000 + t, [
+            *acc, *gyro,
+            round(101325*math.exp(-altitude/8434), 1),
+            round(48.137 + held(i, 10)*1e-6, 7), round(11.575 + held(i, 10)*2e-6, 7), round(gps_altitude, 1),
+            round(21 - altitude*0.0065 + 0.5*math.sin(held(i, 100)/60), 2),
+            round(12.6 - held(i, 100)*1e-3, 2),
+            i, i > 100
+        ])
+
+    records, _, _ = buffer.read(0)
+
+    return (descriptor, records)
+
+
+def load_flight_records(path: str) -> list[np.ndarray]:
+    '''All records of each part of a recorded measurement file, in the wire format'''
+
+    parts, blocks = read_measurement_file(path)
+
+    records = list[np.ndarray]()
+
+    for part in parts.values():
+        part_blocks = [b for p, b in blocks if p is part]
+        if len(part_blocks) > 0:
+            records.append(np.concatenate(part_blocks))
+
+    return records
+
+
+def encode_struct(descriptor: MeasurementDescriptor, records: np.ndarray) -> bytes:
+    '''Per measurement packing, as the api sink did before the records were vectorized'''
+
+    measurement_bytes = bytearray(len(records)*descriptor.size)
+    cur = 0
+
+    for m in records.tolist():
+        descriptor.struct.pack_into(measurement_bytes, cur, *m)
+        cur += descriptor.struct.size
+
+    return bytes(measurement_bytes)
+
+
+def measure(name: str, encode: Callable[[], bytes], samples: int, raw_bytes: int, repeat: int) -> EncodeResult:
+
+    encoded = encode()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encode()
+    duration = (time.perf_counter() - start)/repeat
+
+    return EncodeResult(name, samples, duration, samples/duration, len(encoded)/samples, raw_bytes/len(encoded))
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Benchmarks the encoding of measurements into the binary wire format. Prints the results as json')
+    parser.add_argument('--data', choices=['sensor', 'sine'], default='sensor', help='Synthetic records to encode, see make_sensor_records and make_sine_records')
+    parser.add_argument('--flight', help='Encode the records of a recorded measurement file instead of synthetic ones')
+    parser.add_argument('--samples', type=int, default=10000, help='Synthetic measurements encoded per run')
+    parser.add_argument('--width', type=int, default=6, help='Float values per measurement of the sine records')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    data: str = args.flight or args.data
+
+    if args.flight is not None:
+
+        flight_records = load_flight_records(args.flight)
+        samples = sum(len(r) for r in flight_records)
+        raw_bytes = sum(r.nbytes for r in flight_records)
+
+        results = [
+            measure('numpy', lambda: b''.join(r.tobytes() for r in flight_records), samples, raw_bytes, args.repeat),
+            measure('gorilla', lambda: b''.join(encode_records(r) for r in flight_records), samples, raw_bytes, args.repeat)
+        ]
+
+    else:
+
+        descriptor, records = make_sensor_records(args.samples) if args.data == 'sensor' else make_sine_records(args.samples, args.width)
+        raw_bytes = len(descriptor.encode_records(records))
+
+        if descriptor.encode_records(records) != encode_struct(descriptor, records):
+            raise Exception('Vectorized encoding differs from the struct encoding')
+
+        results = [
+            measure('struct', lambda: encode_struct(descriptor, records), args.samples, raw_bytes, args.repeat),
+            measure('numpy', lambda: descriptor.encode_records(records), args.samples, raw_bytes, args.repeat),
+            measure('gorilla', lambda: encode_records(records), args.samples, raw_bytes, args.repeat)
+        ]
+
+    print(json.dumps({
+        'format_version': RESULT_FORMAT_VERSION,
+        'time': datetime.now(UTC).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'data': data,
+        'results': [asdict(r) for r in results]
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
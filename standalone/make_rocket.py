@@ -5,6 +5,8 @@ from core.content.measurement_sinks.file_measurement_sink import FileMeasurement
 from core.content.microcontroller.arduino_serial import ArduinoOverSerial
 from core.content.sensors.computed.barometric_altitude import BarometricAltitudeSensor
 from core.content.sensors.plyer.framerate import FramerateSensor, FramerateSensor
+from core.content.executor.tick_timing import TickTimingSensor
+from core.content.executor.profiler import ExecutorProfiler
 from core.content.sensors.plyer.gps_plyer import PlyerGPSSensor
 from core.content.sensors.plyer.battery_plyer import PlyerBatterySensor, PlyerBatterySensor
 from core.content.microcontroller.arduino.parts.servo import ServoSensor
@@ -28,6 +30,8 @@ def make_rocket(name = 'New rocket') -> Rocket:
 
     # Computer status parts
     FramerateSensor(UUID('8d45c8e7-7ae2-4496-a5e0-047a631ef17c'), 'Framerate', rocket)
+    TickTimingSensor(UUID('3c1f6a52-9d0e-4b7f-8f2a-6d4e1b7c2a90'), 'Tick Timing', rocket)
+    ExecutorProfiler(UUID('e2b7d4c8-51a3-4f96-9c0d-7a8e3f5b1d64'), 'Executor Profiler', rocket)
     measurement_sink = ApiMeasurementSink(UUID('fa9eac88-5d2f-41a6-aeab-85c1591433a2'), 'Measurement dispatch', rocket)
 
     # File sink has to be made working with standalone
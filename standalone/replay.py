@@ -0,0 +1,34 @@
+import argparse
+import asyncio
+from logging import _nameToLevel, getLogger
+from pathlib import Path
+
+from core.helper.global_data_dir import set_user_data_dir
+from core.logic.replay import FlightReplay, load_recorded_flight
+from standalone.make_rocket import make_rocket
+
+
+async def main():
+
+    parser = argparse.ArgumentParser(description='Replays a recorded flight folder through the flight executor')
+    parser.add_argument('flight_folder', type=Path)
+    parser.add_argument('--period', type=float, default=0.01, help='Virtual time per tick in seconds')
+    args = parser.parse_args()
+
+    getLogger().setLevel(_nameToLevel['INFO'])
+
+    # The replay itself is recorded next to the original flight
+    set_user_data_dir((args.flight_folder.parent / 'replays').as_posix())
+
+    recording = load_recorded_flight(args.flight_folder)
+
+    replay = FlightReplay(make_rocket(), recording, period=args.period)
+
+    result = await replay.run()
+
+    print(result)
+
+
+if __name__ == '__main__':
+    with asyncio.Runner() as runner:
+        runner.run(main())
@@ -0,0 +1,32 @@
+from datetime import timedelta
+from typing import Iterable, Union
+import uuid
+
+from core.logic.rocket_definition import Part, Rocket
+
+
+class StubPart(Part):
+    '''Part without behaviour, measuring nothing itself. Shared by the tests needing parts with a given shape or period'''
+
+    type = 'Test.Stub'
+
+    def __init__(self, rocket: Union[None, Rocket], name: str = 'Value', shape: Iterable[tuple[str, str]] = (('value', 'i'),),
+                 dependencies: Iterable[Part] = (), period_ms: Union[None, int] = None):
+        self.shape = list(shape)
+        super().__init__(uuid.uuid4(), name, rocket, dependencies)
+
+        if period_ms is not None:
+            self.min_update_period = timedelta(milliseconds=period_ms)
+            self.min_measurement_period = timedelta(milliseconds=period_ms)
+
+    def update(self, commands, now, iteration):
+        pass
+
+    def get_measurement_shape(self):
+        return self.shape
+
+    def get_accepted_commands(self):
+        return []
+
+    def collect_measurements(self, now, iteration):
+        return []
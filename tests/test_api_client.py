@@ -0,0 +1,176 @@
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+from unittest import TestCase, main
+
+import httpx
+import jwt
+
+from core.api_client import ApiClient
+
+
+class StubAuthApiClient(ApiClient):
+    '''Answers token requests locally, with tokens expiring after `token_lifetime`'''
+
+    token_lifetime = 0.4
+
+    token_requests = 0
+
+    async def request_with_error_handling_and_retry(self, func, retries: int = 0) -> httpx.Response:
+
+        self.token_requests += 1
+        await asyncio.sleep(0.01)
+
+        token = jwt.encode({ 'exp': time.time() + self.token_lifetime, 'uid': 'stub' }, 'stub', algorithm='HS256')
+
+        return httpx.Response(200, content=json.dumps({ 'token': token }))
+
+
+class LocalServer(ThreadingHTTPServer):
+    '''Answers /slow after a delay and drops the connection of /drop without answering'''
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), LocalHandler)
+
+        self.connections = set[tuple[str, int]]()
+
+    @property
+    def endpoint(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class LocalHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    server: LocalServer
+
+    def do_POST(self):
+
+        self.server.connections.add(self.client_address)
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if self.path == '/drop':
+            self.close_connection = True
+            return
+
+        if self.path == '/slow':
+            time.sleep(0.2)
+
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_authenticated_client(endpoint: str) -> ApiClient:
+
+    api_client = ApiClient('code', endpoint=endpoint)
+
+    api_client.old_token = 'token'
+    api_client.old_token_decoded = { 'exp': time.time() + 3600, 'uid': 'local' }
+    api_client.authorization = 'Bearer token'
+
+    return api_client
+
+
+class TestApiClient(TestCase):
+
+    def setUp(self):
+
+        self.server = LocalServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_requests_reuse_the_client_and_connection(self):
+
+        async def run():
+
+            async with make_authenticated_client(self.server.endpoint) as api_client:
+
+                client = api_client.get_client()
+
+                for _ in range(2):
+                    self.assertEqual(await api_client.try_report('/report', b'data', dict(), 5), (True, '200'))
+                    self.assertIs(api_client.get_client(), client)
+
+        asyncio.run(run())
+
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_client_is_opened_per_event_loop(self):
+
+        api_client = make_authenticated_client(self.server.endpoint)
+
+        async def run() -> httpx.AsyncClient:
+
+            client = api_client.get_client()
+            self.assertIs(api_client.get_client(), client)
+
+            self.assertEqual(await api_client.try_report('/report', b'data', dict(), 5), (True, '200'))
+
+            return client
+
+        first = asyncio.run(run())
+        second = asyncio.run(run())
+
+        self.assertIsNot(first, second)
+
+    def test_failed_request_does_not_abort_requests_in_flight(self):
+
+        async def run():
+
+            async with make_authenticated_client(self.server.endpoint) as api_client:
+
+                client = api_client.get_client()
+
+                slow = asyncio.create_task(api_client.try_report('/slow', b'data', dict(), 5))
+                await asyncio.sleep(0.05)
+
+                success, _ = await api_client.try_report('/drop', b'data', dict(), 5)
+                self.assertFalse(success)
+
+                self.assertEqual(await slow, (True, '200'))
+                self.assertIs(api_client.get_client(), client)
+
+        asyncio.run(run())
+
+    def test_token_is_renewed_in_background(self):
+
+        async def run():
+
+            api_client = StubAuthApiClient('code', endpoint='http://localhost')
+            api_client.token_expiry_margin = 0
+            api_client.token_refresh_margin = 0.2
+
+            # Concurrent requests share one token request
+            tokens = await asyncio.gather(*[api_client.authenticate() for _ in range(3)])
+
+            self.assertEqual(len(set(tokens)), 1)
+            self.assertEqual(api_client.token_requests, 1)
+            self.assertEqual(api_client.authorization, 'Bearer ' + tokens[0])
+
+            # Renewed before it expires, without anyone waiting for it
+            await asyncio.sleep(0.3)
+
+            self.assertEqual(api_client.token_requests, 2)
+            self.assertNotEqual(await api_client.authenticate(), tokens[0])
+            self.assertEqual(api_client.token_requests, 2)
+
+            await api_client.close()
+            self.assertIsNone(api_client.refresh_timer)
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    main()
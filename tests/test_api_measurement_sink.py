@@ -0,0 +1,171 @@
+import asyncio
+from datetime import datetime
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+from unittest.mock import patch
+import uuid
+
+import numpy as np
+
+from core.content.measurement_sinks.api_measurement_sink import PART_HEADER, ApiMeasurementSink
+from core.logic.measurement_sink import EncodedBlock, MeasurementChunk
+from core.helper.background_writer import get_background_writer
+from core.helper.upload_spool import UploadSpool
+from core.logic.measurement_descriptor import MeasurementDescriptor
+from core.logic.rocket_definition import Rocket
+from core.models.flight import Flight
+
+
+class SlowApiClient:
+    '''Records the uploads and completes them after a delay, so they overlap'''
+
+    def __init__(self):
+        self.uploads = list[bytes]()
+        self.timeouts = list[float]()
+
+    async def try_report_binray_flight_data(self, flight_id, data: bytes, timeout: float, **kwargs) -> tuple[bool, str]:
+        self.uploads.append(data)
+        self.timeouts.append(timeout)
+        await asyncio.sleep(0.01)
+        return (True, '200')
+
+
+class TestApiMeasurementSink(TestCase):
+
+    def test_uploads_are_acknowledged_in_order(self):
+
+        sink = ApiMeasurementSink(uuid.uuid4(), 'Api', Rocket('Api'))
+
+        sink.complete_sequence(1)
+        sink.complete_sequence(2)
+        self.assertEqual(sink.acknowledged_sequence, 0)
+
+        sink.complete_sequence(0)
+        self.assertEqual(sink.acknowledged_sequence, 3)
+        self.assertEqual(sink.completed_sequences, set())
+
+    def test_timeout_follows_round_trip_times(self):
+
+        sink = ApiMeasurementSink(uuid.uuid4(), 'Api', Rocket('Api'))
+
+        self.assertEqual(sink.send_timeout_seconds, sink.send_timeout.total_seconds())
+
+        for _ in range(20):
+            sink.update_rtt(1.5)
+
+        self.assertAlmostEqual(sink.smoothed_rtt or 0, 1.5)
+        self.assertLess(sink.send_timeout_seconds, 2)
+
+        # A slow upload widens the timeout
+        sink.update_rtt(4)
+        self.assertGreater(sink.send_timeout_seconds, 3)
+
+    def test_overlapping_uploads_replay_each_spooled_upload_once(self):
+
+        sink = ApiMeasurementSink(uuid.uuid4(), 'Api', Rocket('Api'))
+        api_client = SlowApiClient()
+        sink.api_client = api_client # type: ignore
+
+        with TemporaryDirectory() as tmp:
+
+            spool = UploadSpool(Path(tmp) / 'spool')
+            spool.open()
+
+            flight_id = uuid.uuid4()
+            for i in range(3):
+                spool.append(flight_id, None, bytes([i])*10)
+            get_background_writer().flush()
+
+            sink.spool = spool
+
+            async def replay():
+                for _ in range(3):
+                    await asyncio.gather(*(sink.send_spooled() for _ in range(sink.max_in_flight)))
+
+            for _ in range(20):
+                sink.update_rtt(0.2)
+
+            asyncio.run(replay())
+
+            self.assertEqual(api_client.uploads, [bytes([i])*10 for i in range(3)])
+            self.assertTrue(spool.empty)
+
+            # Spooled uploads time out like live ones
+            self.assertEqual(api_client.timeouts, [sink.send_timeout_seconds]*3)
+            self.assertLess(sink.send_timeout_seconds, sink.send_timeout.total_seconds())
+
+    def test_overlapping_uploads_open_the_spool_once(self):
+
+        sink = ApiMeasurementSink(uuid.uuid4(), 'Api', Rocket('Api'))
+
+        with TemporaryDirectory() as tmp, patch('core.content.measurement_sinks.api_measurement_sink.get_user_data_dir', return_value=tmp), patch.object(UploadSpool, 'open', autospec=True) as spool_open:
+
+            async def open_concurrently():
+                await asyncio.gather(*(sink.open_spool() for _ in range(sink.max_in_flight)))
+
+            asyncio.run(open_concurrently())
+
+            self.assertEqual(spool_open.call_count, 1)
+            self.assertIsNotNone(sink.spool)
+
+    def test_encoding_returns_the_ratio_of_the_batch(self):
+
+        rocket = Rocket('Api')
+        sink = ApiMeasurementSink(uuid.uuid4(), 'Api', rocket)
+        sink.compress_measurements = True
+
+        part = sink # Any part of the rocket, only its index is encoded
+        dtype = MeasurementDescriptor([('value', 'f')]).wire_dtype
+
+        constant = np.zeros((1000,), dtype=dtype)
+        constant['timestamp'] = np.arange(1000)*0.01
+
+        raw = constant.nbytes + PART_HEADER.size
+
+        payload, ratio = sink.encode_measurements({part: constant})
+
+        self.assertAlmostEqual(ratio, raw/len(payload))
+        self.assertGreater(ratio, 1)
+
+        # Encoding does not touch the smoothed ratio the budget of concurrent uploads is derived from
+        self.assertEqual(sink.compression_ratio, 1)
+
+    def test_spilled_measurements_are_spooled_in_order(self):
+
+        rocket = Rocket('Api')
+        sink = ApiMeasurementSink(uuid.uuid4(), 'Api', rocket)
+        sink.flight = Flight(start=datetime.now(), name='Spill') # type: ignore
+
+        dtype = sink.get_measurement_descriptor().wire_dtype
+
+        def chunk(offset: int) -> MeasurementChunk:
+            records = np.zeros((2,), dtype=dtype)
+            records['timestamp'] = [offset, offset + 1]
+            return MeasurementChunk(offset, 2, records.nbytes, offset*dtype.itemsize, [EncodedBlock(sink, 2, records.tobytes())])
+
+        with TemporaryDirectory() as tmp:
+
+            spool = UploadSpool(Path(tmp) / 'spool')
+            spool.open()
+            sink.spool = spool
+
+            async def spill():
+                for offset in (0, 2, 4):
+                    self.assertTrue(sink.spill([chunk(offset)]))
+                await asyncio.gather(*sink.spill_tasks)
+
+            asyncio.run(spill())
+            get_background_writer().flush()
+
+            timestamps = list[float]()
+            while (upload := spool.read_next()) is not None:
+                records = np.frombuffer(upload.data, dtype=dtype, offset=PART_HEADER.size)
+                timestamps.extend(records["timestamp"].tolist())
+                spool.acknowledge(upload)
+
+            self.assertEqual(timestamps, [0, 1, 2, 3, 4, 5])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+from core.helper.background_writer import BackgroundWriter
+
+
+class TestBackgroundWriter(TestCase):
+
+    def test_writes_in_order_and_drops_when_full(self):
+
+        with TemporaryDirectory() as tmp:
+
+            writer = BackgroundWriter(max_queue_bytes=64, flush_period=60)
+
+            a = writer.open(Path(tmp) / 'flight' / 'a.bin')
+            b = writer.open(Path(tmp) / 'flight' / 'b.bin')
+
+            self.assertTrue(a.write(b'1' * 10))
+            self.assertTrue(b.write(b'x' * 10))
+            self.assertTrue(a.write(b'2' * 10))
+
+            # The queue would overflow, nothing was written yet as the flush period is long
+            self.assertFalse(a.write(b'3' * 40))
+            self.assertEqual(writer.dropped_bytes, 40)
+            self.assertEqual((a.dropped_bytes, b.dropped_bytes), (40, 0))
+            self.assertEqual(writer.queue_depth, 3)
+
+            self.assertTrue(writer.flush())
+
+            self.assertEqual(writer.queue_depth, 0)
+            self.assertEqual(writer.written_bytes, 30)
+
+            self.assertTrue(a.write(b'4' * 10))
+            a.close()
+            writer.stop()
+
+            self.assertEqual((Path(tmp) / 'flight' / 'a.bin').read_bytes(), b'1' * 10 + b'2' * 10 + b'4' * 10)
+            self.assertEqual((Path(tmp) / 'flight' / 'b.bin').read_bytes(), b'x' * 10)
+
+            # Closed files do not accept data anymore
+            self.assertFalse(a.write(b'5'))
+            self.assertEqual(a.dropped_bytes, 41)
+            self.assertEqual(writer.dropped_bytes, 41)
+
+
+if __name__ == '__main__':
+    main()
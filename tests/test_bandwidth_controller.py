@@ -0,0 +1,52 @@
+from unittest import TestCase, main
+
+from core.logic.bandwidth_controller import BandwidthController
+
+
+class TestBandwidthController(TestCase):
+
+    def test_aimd(self):
+
+        controller = BandwidthController()
+        controller.min_rate = 0
+
+        self.assertIsNone(controller.budget(0.5))
+
+        # 10kB delivered in 1s
+        controller.on_delivered(0, controller.delivered, 1, 10000)
+        self.assertEqual(controller.bandwidth, 10000)
+        self.assertEqual(controller.rate, 20000)
+
+        # Slow start doubles, but not beyond twice the delivered bandwidth
+        controller.on_delivered(1, controller.delivered, 2, 15000)
+        self.assertEqual(controller.rate, 30000)
+
+        # Congestion cuts the rate once, uploads send before the cut do not cut it again
+        controller.on_congestion(1.5, 3)
+        self.assertAlmostEqual(controller.rate or 0, 21000)
+        controller.on_congestion(2, 3.5)
+        self.assertAlmostEqual(controller.rate or 0, 21000)
+
+        # Afterwards the rate grows additively
+        controller.on_delivered(3, controller.delivered, 4, 15000)
+        self.assertAlmostEqual(controller.rate or 0, 21000 + controller.additive_increase)
+
+    def test_unused_budget_is_kept_for_bursts(self):
+
+        controller = BandwidthController()
+        controller.on_delivered(0, controller.delivered, 1, 5000)
+
+        self.assertEqual(controller.budget(0.1), 1000)
+        controller.consume(200)
+
+        self.assertEqual(controller.budget(0.1), 1800)
+
+        # At most the budget of the burst period
+        for _ in range(20):
+            controller.budget(0.1)
+
+        self.assertEqual(controller.budget(0.1), 10000)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+from core.helper.black_box_file import HEADER_REGION_SIZE, BlackBoxWriter, scan_black_box, write_recovered_measurement_file
+from core.helper.measurement_file import read_measurement_file
+from core.logic.measurement_ring_buffer import MeasurementRingBuffer
+from core.logic.rocket_definition import Rocket
+
+from tests.stub_part import StubPart
+
+
+class TestBlackBoxFile(TestCase):
+
+    def test_recovers_latest_frames_after_wrapping(self):
+
+        rocket = Rocket('Black Box')
+        part = StubPart(rocket)
+        buffer = MeasurementRingBuffer(part.get_measurement_descriptor(), 16)
+
+        with TemporaryDirectory() as tmp:
+
+            path = Path(tmp) / 'black_box.rssb'
+
+            # Every frame is 24 bytes header + 2*12 bytes of records. The ring holds 5.5 frames
+            writer = BlackBoxWriter(path, 264, [part])
+
+            cursor = 0
+            for i in range(20):
+                buffer.append(float(i), [i])
+                buffer.append(float(i) + 0.5, [i])
+                records, cursor, _ = buffer.read(cursor)
+                writer.write(part, records)
+
+            self.assertGreater(writer.wraps, 0)
+
+            # Simulate a crash: nothing is closed or synced explicitly
+            writer.map.flush()
+
+            recovered = scan_black_box(path)
+
+            self.assertEqual([f.sequence for f in recovered.frames], [15, 16, 17, 18, 19])
+            self.assertEqual(recovered.missing_frames, 0)
+            self.assertEqual(recovered.frames[-1].records.tolist(), [(19.0, 19), (19.5, 19)])
+
+            # Corrupt the payload of the second to last frame
+            frame_start = HEADER_REGION_SIZE + writer.position - 96
+            writer.map[frame_start + 30] ^= 0xFF
+            writer.map.flush()
+
+            recovered = scan_black_box(path)
+
+            self.assertEqual([f.sequence for f in recovered.frames], [15, 16, 17, 19])
+            self.assertEqual(recovered.missing_frames, 1)
+
+            # The timeline can be exported as a regular measurement file
+            write_recovered_measurement_file(recovered, Path(tmp) / '1.rssm')
+            parts, blocks = read_measurement_file(Path(tmp) / '1.rssm')
+
+            self.assertEqual(parts[part._index].part_id, part._id)
+            self.assertEqual(len(blocks), 4)
+
+            writer.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+import asyncio
+from datetime import datetime
+from tempfile import TemporaryDirectory
+import time
+from typing import cast
+from unittest import TestCase, main
+import uuid
+
+from core.api_client import ApiClient
+from core.content.general_commands.enable import EnableCommand
+from core.flight_executer import FlightExecuter
+from core.helper.global_data_dir import set_user_data_dir
+from core.logic.rocket_definition import Rocket
+from core.models.flight import Flight
+
+
+class GatedApiClient:
+    '''Records the command response requests, which complete once the gate is opened'''
+
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.requests = list[tuple[float, list]]()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def try_send_command_responses(self, flight_id: str, commands):
+
+        self.requests.append((time.monotonic(), commands))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        try:
+            await self.gate.wait()
+        finally:
+            self.in_flight -= 1
+
+
+def make_command(critical: bool = False) -> EnableCommand:
+
+    command = EnableCommand()
+    command._id = uuid.uuid4()
+    command.create_time = datetime.now()
+    command.state = 'success'
+    command.critical_response = critical
+
+    return command
+
+
+class TestCommandResponses(TestCase):
+
+    def run_executor(self, test, coalesce_window: float, max_in_flight: int):
+
+        with TemporaryDirectory() as tmp:
+
+            set_user_data_dir(tmp)
+
+            async def run():
+
+                api_client = GatedApiClient()
+                executor = FlightExecuter(Rocket('Responses'), Flight(start=datetime.now(), name='Responses'), cast(ApiClient, api_client), command_response_coalesce_window=coalesce_window, max_command_responses_in_flight=max_in_flight)
+
+                try:
+                    await test(executor, api_client)
+                finally:
+                    api_client.gate.set()
+                    executor.send_command_responses_task.cancel()
+
+            asyncio.run(run())
+
+    def test_responses_are_coalesced_within_the_window(self):
+
+        async def test(executor: FlightExecuter, api_client: GatedApiClient):
+
+            start = time.monotonic()
+            executor.queue_command_responses([make_command()])
+            await asyncio.sleep(0.02)
+            executor.queue_command_responses([make_command(), make_command()])
+
+            await asyncio.sleep(0.2)
+
+            # Woken by the first response, sent once the window passed
+            self.assertEqual(len(api_client.requests), 1)
+            self.assertEqual(len(api_client.requests[0][1]), 3)
+            self.assertGreaterEqual(api_client.requests[0][0] - start, 0.1)
+
+            # Nothing queued, nothing sent
+            await asyncio.sleep(0.2)
+            self.assertEqual(len(api_client.requests), 1)
+
+        self.run_executor(test, coalesce_window=0.1, max_in_flight=2)
+
+    def test_regular_responses_wait_for_a_free_slot(self):
+
+        async def test(executor: FlightExecuter, api_client: GatedApiClient):
+
+            api_client.gate.clear()
+
+            executor.queue_command_responses([make_command()])
+            await asyncio.sleep(0.05)
+            executor.queue_command_responses([make_command()])
+            await asyncio.sleep(0.05)
+
+            # The only slot is taken by the first request
+            self.assertEqual(len(api_client.requests), 1)
+
+            api_client.gate.set()
+            await asyncio.sleep(0.05)
+
+            self.assertEqual(len(api_client.requests), 2)
+            self.assertEqual(api_client.max_in_flight, 1)
+
+        self.run_executor(test, coalesce_window=0.01, max_in_flight=1)
+
+    def test_critical_responses_skip_the_window_and_the_slots(self):
+
+        async def test(executor: FlightExecuter, api_client: GatedApiClient):
+
+            api_client.gate.clear()
+
+            executor.queue_command_responses([make_command()])
+            await asyncio.sleep(0.3)
+            self.assertEqual(len(api_client.requests), 1)
+
+            # The slot is taken and the window is long, the critical response is sent anyway
+            start = time.monotonic()
+            executor.queue_command_responses([make_command(critical=True)])
+            await asyncio.sleep(0.02)
+
+            self.assertEqual(len(api_client.requests), 2)
+            self.assertLess(api_client.requests[1][0] - start, 0.1)
+            self.assertEqual(api_client.in_flight, 2)
+
+        self.run_executor(test, coalesce_window=0.25, max_in_flight=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+from unittest import TestCase, main
+
+from core.logic.execution import topological_sort
+from core.logic.scheduler import DeadlineScheduler
+
+from tests.stub_part import StubPart
+
+
+class TestDeadlineScheduler(TestCase):
+
+    def test_only_due_parts_in_dependency_order(self):
+
+        slow = StubPart(None, 'slow', [], period_ms=1000)
+        fast = StubPart(None, 'fast', [], period_ms=10)
+        dependent = StubPart(None, 'dependent', [], [fast], period_ms=10)
+
+        scheduler = DeadlineScheduler(topological_sort([dependent, slow, fast]))
+
+        # Nothing ran yet, so everything is due
+        due = scheduler.pop_due_updates(0)
+        self.assertEqual(due, [fast, dependent, slow])
+
+        for p in due:
+            p.last_update = 0
+        scheduler.reschedule_updates(due)
+
+        self.assertEqual(scheduler.pop_due_updates(0.005), [])
+
+        due = scheduler.pop_due_updates(0.010)
+        self.assertEqual(due, [fast, dependent])
+
+        for p in due:
+            p.last_update = 0.010
+        scheduler.reschedule_updates(due)
+
+        self.assertEqual(scheduler.pop_due_updates(1.0), [fast, dependent, slow])
+
+    def test_failed_part_stays_due(self):
+
+        part = StubPart(None, 'failing', [], period_ms=100)
+        scheduler = DeadlineScheduler([part])
+
+        due = scheduler.pop_due_updates(0)
+        scheduler.reschedule_updates(due) # last_update was never set
+
+        self.assertEqual(scheduler.pop_due_updates(0.001), [part])
+
+    def test_additional_measurements_replace_deadline(self):
+
+        part = StubPart(None, 'commanded', [], period_ms=100)
+        other = StubPart(None, 'other', [], period_ms=100)
+        scheduler = DeadlineScheduler([part, other])
+
+        due = scheduler.pop_due_measurements(0)
+        for p in due:
+            p.last_measurement = 0
+        scheduler.reschedule_measurements(due)
+
+        # Commanded part gets measured early, the old deadline must not fire twice
+        due = scheduler.pop_due_measurements(0.05, [part])
+        self.assertEqual(due, [part])
+        part.last_measurement = 0.05
+        scheduler.reschedule_measurements(due)
+
+        self.assertEqual(scheduler.pop_due_measurements(0.1), [other])
+        self.assertEqual(scheduler.pop_due_measurements(0.2), [part])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+from unittest import TestCase, main
+
+import numpy as np
+
+from core.helper.gorilla_codec import SLICE_SIZE, decode_records, encode_records
+from core.logic.measurement_descriptor import MeasurementDescriptor
+
+
+class TestGorillaCodec(TestCase):
+
+    def test_round_trip(self):
+
+        descriptor = MeasurementDescriptor([('x', 'f'), ('y', 'd'), ('count', 'i'), ('ok', '?'), ('label', '4s')])
+
+        count = 500
+        timestamps = 1700000000 + np.arange(count)*0.01
+        timestamps[100:] += 0.003 # Irregular tick
+
+        records = np.zeros((count,), dtype=descriptor.wire_dtype)
+        records['timestamp'] = timestamps
+        records['x'] = np.round(np.sin(timestamps), 2)
+        records['y'] = np.repeat(np.random.default_rng(0).normal(size=count//50), 50)
+        records['count'] = -np.arange(count)//7
+        records['ok'] = np.arange(count) % 3 == 0
+        records['label'] = b'up'
+
+        encoded = encode_records(records)
+        decoded = decode_records(encoded, descriptor.wire_dtype, count)
+
+        # Slowly changing telemetry compresses well
+        self.assertLess(len(encoded), records.nbytes/2)
+
+        np.testing.assert_allclose(decoded['timestamp'], records['timestamp'], rtol=0, atol=1e-6)
+
+        for name in ('x', 'y', 'count', 'ok', 'label'):
+            self.assertTrue(np.array_equal(decoded[name], records[name]), name)
+
+    def test_single_record(self):
+
+        descriptor = MeasurementDescriptor([('x', 'f')])
+        records = np.array([(12.5, -3.25)], dtype=descriptor.wire_dtype)
+
+        self.assertEqual(decode_records(encode_records(records), descriptor.wire_dtype, 1).tolist(), records.tolist())
+
+    def test_round_trip_across_slices(self):
+
+        descriptor = MeasurementDescriptor([('x', 'd'), ('count', 'h')])
+
+        count = 2*SLICE_SIZE + 3
+        rng = np.random.default_rng(1)
+
+        records = np.zeros((count,), dtype=descriptor.wire_dtype)
+        records['timestamp'] = 1700000000 + np.cumsum(rng.integers(1, 5000, size=count))*1e-6
+        records['x'] = rng.normal(size=count)
+        records['count'] = np.arange(count) % 1000
+
+        decoded = decode_records(encode_records(records), descriptor.wire_dtype, count)
+
+        np.testing.assert_allclose(decoded['timestamp'], records['timestamp'], rtol=0, atol=1e-6)
+        self.assertTrue(np.array_equal(decoded['x'], records['x']))
+        self.assertTrue(np.array_equal(decoded['count'], records['count']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import asyncio
+from datetime import datetime
+from tempfile import TemporaryDirectory
+import time
+from typing import cast
+from unittest import TestCase, main
+from unittest.mock import patch
+import uuid
+
+import numpy as np
+
+from core.api_client import ApiClient
+from core.flight_executer import FlightExecuter
+from core.helper.global_data_dir import set_user_data_dir
+from core.logic.isolated_part import IsolatedPart
+from core.logic.replay import OfflineApiClient
+from core.logic.rocket_definition import Rocket
+from core.models.flight import Flight
+
+
+class AccumulatorPart(IsolatedPart):
+    '''Adds its input to a running sum kept in the state vector'''
+
+    type = 'Test.Accumulator'
+
+    input_size = 1
+
+    output_size = 1
+
+    state_size = 1
+
+    value: float = 1
+
+    total: float = 0
+
+    def __init__(self, rocket: Rocket, isolated: bool = False):
+        super().__init__(uuid.uuid4(), 'Accumulator', rocket, [], isolated=isolated)
+
+    def write_inputs(self, inputs: np.ndarray, now: float) -> bool:
+        inputs[0] = self.value
+        return True
+
+    @staticmethod
+    def compute(inputs: np.ndarray, outputs: np.ndarray, state: np.ndarray, now: float):
+        state[0] += inputs[0]
+        outputs[0] = state[0]
+
+    def read_outputs(self, outputs: np.ndarray, now: float):
+        self.total = float(outputs[0])
+
+    def get_measurement_shape(self):
+        return [('total', 'f')]
+
+    def get_accepted_commands(self):
+        return []
+
+    def collect_measurements(self, now, iteration):
+        return [[self.total]]
+
+
+class TestIsolatedPart(TestCase):
+
+    def test_computes_in_worker_process_through_shared_memory(self):
+
+        part = AccumulatorPart(Rocket('Isolated'), isolated=True)
+        part.start_worker()
+
+        try:
+            worker = part.worker
+            assert worker is not None
+
+            deadline = time.monotonic() + 30
+
+            # The state lives in the worker, each finished computation adds the input once
+            while part.total < 3 and time.monotonic() < deadline:
+                part.update([], time.time(), 0)
+                time.sleep(0.001)
+
+            self.assertEqual(part.total, 3)
+            self.assertTrue(worker.process.is_alive())
+        finally:
+            part.stop_worker()
+
+        self.assertIsNone(part.worker)
+
+    def test_runs_on_control_loop_if_worker_fails_to_start(self):
+
+        with TemporaryDirectory() as tmp:
+
+            set_user_data_dir(tmp)
+
+            rocket = Rocket('Isolated')
+            part = AccumulatorPart(rocket, isolated=True)
+
+            async def run():
+
+                with patch('multiprocessing.context.SpawnProcess.start', side_effect=OSError('No processes left')):
+                    executor = FlightExecuter(rocket, Flight(start=datetime.now(), name='Isolated'), cast(ApiClient, OfflineApiClient()))
+
+                self.assertIsNone(part.worker)
+
+                part.update([], time.time(), 0)
+                part.update([], time.time(), 1)
+
+                executor.send_command_responses_task.cancel()
+
+            asyncio.run(run())
+
+            self.assertEqual(part.total, 2)
+            self.assertFalse(part.virtual)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+from unittest import TestCase, main
+import uuid
+
+from core.content.executor.profiler import PHASE_COLLECT, PHASE_UPDATE, ExecutorProfiler
+from core.helper.latency_histogram import BUCKET_COUNT, LatencyHistogram, bucket_names
+from core.logic.rocket_definition import Rocket
+
+
+class TestLatencyHistogram(TestCase):
+
+    def test_bucket_assignment(self):
+
+        h = LatencyHistogram()
+
+        for duration_ns in (0, 1023, 1024, 2047, 2048, 5000, 20_000_000, 10**12):
+            h.record(duration_ns)
+
+        expected = [0]*BUCKET_COUNT
+        expected[0] = 2 # Below 1024ns
+        expected[1] = 2 # Below 2048ns
+        expected[2] = 1
+        expected[3] = 1
+        expected[BUCKET_COUNT - 1] = 2 # Above ~16ms
+
+        self.assertEqual(h.counts, expected)
+        self.assertEqual(len(bucket_names()), BUCKET_COUNT)
+        self.assertEqual(h.count, 8)
+        self.assertEqual(h.max_ns, 10**12)
+
+    def test_percentiles(self):
+
+        h = LatencyHistogram()
+
+        self.assertEqual(h.percentile(0.5), 0)
+
+        # 98 fast calls, 2 slow ones
+        for _ in range(98):
+            h.record(1500)
+        h.record(3_000_000)
+        h.record(3_500_000)
+
+        self.assertEqual(h.percentile(0.5), 2048)
+        self.assertEqual(h.percentile(0.98), 2048)
+        # Bounded by the longest call instead of the bucket bound of 4194304ns
+        self.assertEqual(h.percentile(0.99), 3_500_000)
+
+        h.record(10**12)
+        self.assertEqual(h.percentile(1), 10**12)
+
+
+class TestExecutorProfiler(TestCase):
+
+    def test_reports_and_resets_histograms_per_part_and_phase(self):
+
+        rocket = Rocket('Profiled')
+        profiler = ExecutorProfiler(uuid.uuid4(), 'Profiler', rocket)
+
+        for duration_ns in (500, 1500, 1500, 9000):
+            profiler.record(profiler, PHASE_UPDATE, duration_ns)
+        profiler.record(profiler, PHASE_COLLECT, 100)
+
+        fields = [name for name, _ in profiler.get_measurement_shape()]
+        measurements = [dict(zip(fields, m)) for m in profiler.collect_measurements(0, 0) or []]
+
+        self.assertEqual([(m['phase'], m['count']) for m in measurements], [(PHASE_UPDATE, 4), (PHASE_COLLECT, 1)])
+
+        update = measurements[0]
+        self.assertEqual(update['part_index'], profiler._index)
+        self.assertAlmostEqual(update['mean_us'], 3.125)
+        self.assertAlmostEqual(update['max_us'], 9)
+        self.assertAlmostEqual(update['p50_us'], 2.048)
+        self.assertAlmostEqual(update['p99_us'], 9)
+        self.assertEqual((update['lt_1us'], update['lt_2us'], update['lt_16us']), (1, 2, 1))
+
+        # Only calls since the last collection are reported
+        self.assertEqual(profiler.collect_measurements(1, 1), [])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+from unittest import TestCase, main
+import uuid
+
+from core.logic.measurement_ring_buffer import MeasurementStore
+from core.logic.measurement_sink import MeasurementChunk, MeasurementChunkLog, MeasurementSinkBase
+from core.logic.rocket_definition import Rocket
+
+from tests.stub_part import StubPart
+
+
+class Sink(MeasurementSinkBase):
+
+    type = 'Test.Sink'
+
+    def __init__(self, rocket: Rocket, name: str):
+        super().__init__(uuid.uuid4(), name, rocket)
+
+        self.spilled = list[MeasurementChunk]()
+
+    def update(self, commands, now, iteration):
+        pass
+
+    def get_measurement_shape(self):
+        return []
+
+    def get_accepted_commands(self):
+        return []
+
+    def collect_measurements(self, now, iteration):
+        return []
+
+    def spill(self, chunks):
+        self.spilled.extend(chunks)
+        return True
+
+
+class TestMeasurementChunkLog(TestCase):
+
+    def test_sinks_share_encoded_chunks(self):
+
+        rocket = Rocket('Chunks')
+        part = StubPart(rocket)
+        fast = Sink(rocket, 'Fast')
+        slow = Sink(rocket, 'Slow')
+
+        store = MeasurementStore([part])
+        log = MeasurementChunkLog(store, max_bytes=24)
+
+        for sink in (fast, slow):
+            sink.measurement_store = store
+            sink.measurement_chunks = log
+
+        store.append(part, 0, 1, [[1], [2]])
+
+        blocks = fast.read_new_blocks()[part]
+        self.assertEqual(blocks[0].payload, part.get_measurement_descriptor().struct.pack(0.0, 1) + part.get_measurement_descriptor().struct.pack(0.5, 2))
+
+        # Nothing new, nothing is encoded again
+        self.assertEqual(fast.read_new_chunks(), [])
+
+        store.append(part, 1, 2, [[3]])
+
+        chunks = fast.read_new_chunks()
+        self.assertEqual([c.count for c in chunks], [1])
+        self.assertEqual(chunks[0].blocks[0].records.tolist(), [(1.0, 3)])
+
+        # The slow sink reads the same encoded objects
+        store.append(part, 2, 3, [[4]])
+
+        chunks = slow.read_new_chunks()
+
+        # The first chunk (24 bytes) was evicted to stay within max_bytes
+        self.assertEqual([c.offset for c in chunks], [2, 3])
+        self.assertEqual(slow.dropped_measurements, 2)
+        self.assertIs(chunks[0].blocks[0], fast.measurement_chunks.chunks[0].blocks[0])
+
+    def test_backlog_limit_applies_overflow_policy(self):
+
+        rocket = Rocket('Backlog')
+        part = StubPart(rocket)
+        dropping = Sink(rocket, 'Dropping')
+        downsampling = Sink(rocket, 'Downsampling')
+
+        # Each measurement is 12 bytes, the sinks may fall behind by 4 of them
+        for sink in (dropping, downsampling):
+            sink.max_backlog_bytes = 48
+            sink.overflow_downsample_factor = 2
+
+        downsampling.overflow_policy = 'downsample'
+
+        store = MeasurementStore([part])
+        log = MeasurementChunkLog(store, readers=[dropping, downsampling])
+
+        for sink in (dropping, downsampling):
+            sink.measurement_store = store
+            sink.measurement_chunks = log
+
+        for i in range(4):
+            store.append(part, i, i + 1, [[i*2], [i*2 + 1]])
+            log.update(i + 1)
+
+        self.assertEqual(dropping.backlog_bytes, 48)
+        self.assertEqual(dropping.overflowed_measurements, 4)
+
+        self.assertEqual([r[1] for c in dropping.read_new_chunks() for r in c.blocks[0].records.tolist()], [4, 5, 6, 7])
+        self.assertEqual(dropping.dropped_measurements, 4)
+
+        # The overflowed measurements are kept averaged
+        self.assertEqual([r[1] for c in downsampling.read_new_chunks() for r in c.blocks[0].records.tolist()], [0, 2, 4, 5, 6, 7])
+        self.assertEqual(downsampling.dropped_measurements, 2)
+
+        # Chunks read by all sinks are released with the next encode
+        store.append(part, 4, 5, [[8]])
+        log.update(5)
+
+        self.assertEqual([c.offset for c in log.chunks], [8])
+
+    def test_overflow_keeps_measurements_of_critical_parts(self):
+
+        rocket = Rocket('Critical')
+        sampled = StubPart(rocket, 'Sampled')
+        critical = StubPart(rocket, 'Critical')
+        critical.measurement_priority = 'critical'
+
+        dropping = Sink(rocket, 'Dropping')
+        spilling = Sink(rocket, 'Spilling')
+        spilling.overflow_policy = 'spill'
+
+        store = MeasurementStore([sampled, critical])
+        log = MeasurementChunkLog(store, readers=[dropping, spilling])
+
+        # Each chunk holds 24 bytes, the sinks may fall behind by two chunks
+        for sink in (dropping, spilling):
+            sink.max_backlog_bytes = 48
+            sink.measurement_store = store
+            sink.measurement_chunks = log
+
+        for i in range(4):
+            store.append(sampled, i, i + 1, [[i]])
+            store.append(critical, i, i + 1, [[i + 10]])
+            log.update(i + 1)
+
+        for sink in (dropping, spilling):
+            self.assertEqual(sink.overflowed_measurements, 4)
+
+            blocks = sink.read_new_blocks()
+            self.assertEqual([r[1] for b in blocks[critical] for r in b.records.tolist()], [10, 11, 12, 13])
+            self.assertEqual([r[1] for b in blocks[sampled] for r in b.records.tolist()], [2, 3])
+
+        self.assertEqual(dropping.dropped_measurements, 2)
+
+        # Only the sampled measurements are spilled, none are lost
+        self.assertEqual([r[1] for c in spilling.spilled for b in c.blocks for r in b.records.tolist()], [0, 1])
+        self.assertEqual(spilling.dropped_measurements, 0)
+
+
+
+if __name__ == '__main__':
+    main()
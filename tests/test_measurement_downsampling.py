@@ -0,0 +1,42 @@
+from unittest import TestCase, main
+
+import numpy as np
+
+from core.logic.measurement_descriptor import MeasurementDescriptor
+from core.logic.measurement_downsampling import allocate_budget, average_records, changed_records, last_values
+
+
+class TestMeasurementDownsampling(TestCase):
+
+    def test_average_records(self):
+
+        dtype = MeasurementDescriptor([('x', 'f'), ('count', 'i'), ('ok', '?')]).wire_dtype
+
+        records = np.array([(0.0, 1.0, 1, False), (1.0, 2.0, 2, True), (2.0, 4.0, 4, False), (3.0, 8.0, 8, True), (4.0, 5.0, 5, True)], dtype=dtype)
+
+        averaged = average_records(records, 2)
+
+        self.assertEqual(averaged.dtype, dtype)
+        self.assertEqual(averaged.tolist(), [(0.5, 1.5, 2, True), (2.5, 6.0, 6, True), (4.0, 5.0, 5, True)])
+
+    def test_changed_records(self):
+
+        dtype = MeasurementDescriptor([('state', '8s')]).wire_dtype
+
+        records = np.array([(0.0, b'Idle'), (1.0, b'Idle'), (2.0, b'Armed'), (3.0, b'Armed')], dtype=dtype)
+
+        changed = changed_records(records, None)
+        self.assertEqual(changed['timestamp'].tolist(), [0.0, 2.0])
+
+        # Nothing changed since the last kept record
+        self.assertEqual(len(changed_records(records[3:], last_values(changed))), 0)
+
+    def test_allocate_budget(self):
+
+        granted = allocate_budget({'a': 10, 'b': 100, 'c': 1000}, 310) # type: ignore
+
+        self.assertEqual(granted, {'a': 10, 'b': 100, 'c': 200})
+
+
+if __name__ == '__main__':
+    main()
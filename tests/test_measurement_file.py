@@ -0,0 +1,55 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+from core.helper.measurement_file import encode_block, encode_header, read_measurement_file
+from core.logic.measurement_ring_buffer import MeasurementRingBuffer, records_to_measurements
+from core.logic.rocket_definition import Rocket
+
+from tests.stub_part import StubPart
+
+
+class TestMeasurementFile(TestCase):
+
+    def test_round_trip_without_rocket(self):
+
+        rocket = Rocket('File')
+        a = StubPart(rocket, 'A', [('ok', '?'), ('value', 'f'), ('count', 'i')])
+        b = StubPart(rocket, 'B', [('label', '8s')])
+
+        buffer_a = MeasurementRingBuffer(a.get_measurement_descriptor(), 16)
+        buffer_a.append(1.0, [True, 0.5, 3])
+        buffer_a.append(2.0, [False, -1.5, -7])
+
+        buffer_b = MeasurementRingBuffer(b.get_measurement_descriptor(), 16)
+        buffer_b.append(1.5, [b'hello'])
+
+        records_a, _, _ = buffer_a.read(0)
+        records_b, _, _ = buffer_b.read(0)
+
+        # Every record has the same layout as the api format
+        block_a = encode_block(a, records_a)
+        self.assertEqual(block_a[6:6 + a.get_measurement_descriptor().size], a.get_measurement_descriptor().struct.pack(1.0, True, 0.5, 3))
+
+        with TemporaryDirectory() as tmp:
+
+            path = Path(tmp) / '1.rssm'
+
+            # The last block is cut off in the middle of a record
+            path.write_bytes(encode_header(rocket.parts) + block_a + encode_block(b, records_b) + block_a[:-3])
+
+            parts, blocks = read_measurement_file(path)
+
+        self.assertEqual(parts[a._index].part_id, a._id)
+        self.assertEqual(parts[b._index].name, 'B')
+        self.assertEqual(parts[a._index].field_names, ['ok', 'value', 'count'])
+        self.assertEqual(parts[b._index].field_descriptors, ['8s'])
+
+        self.assertEqual([(p.part_id, len(r)) for p, r in blocks], [(a._id, 2), (b._id, 1), (a._id, 1)])
+
+        self.assertEqual(records_to_measurements(blocks[0][1]), [(1.0, [True, 0.5, 3]), (2.0, [False, -1.5, -7])])
+        self.assertEqual(records_to_measurements(blocks[1][1]), [(1.5, ['hello'])])
+
+
+if __name__ == '__main__':
+    main()
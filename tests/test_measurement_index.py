@@ -0,0 +1,71 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+from core.helper.measurement_file import encode_block, encode_header
+from core.helper.measurement_index import FlightDataReader, index_measurement_file, index_path
+from core.logic.measurement_ring_buffer import MeasurementRingBuffer
+from core.logic.rocket_definition import Part, Rocket
+
+from tests.stub_part import StubPart
+
+
+def encode_values(part: Part, timestamps: range) -> bytes:
+
+    buffer = MeasurementRingBuffer(part.get_measurement_descriptor(), len(timestamps))
+    for t in timestamps:
+        buffer.append(t, [t*10])
+
+    records, _, _ = buffer.read(0)
+
+    return encode_block(part, records)
+
+
+class TestMeasurementIndex(TestCase):
+
+    def test_query_part_by_time_range(self):
+
+        rocket = Rocket('Index')
+        a = StubPart(rocket, 'A')
+        b = StubPart(rocket, 'B')
+
+        with TemporaryDirectory() as tmp:
+
+            folder = Path(tmp)
+            header = encode_header(rocket.parts)
+
+            (folder / '1.rssm').write_bytes(header + encode_values(a, range(0, 10)) + encode_values(b, range(0, 10)) + encode_values(a, range(10, 20)))
+
+            # The last block of the second file is still being written
+            second = header + encode_values(a, range(20, 30))
+            partial = encode_values(a, range(30, 40))
+            (folder / '2.rssm').write_bytes(second + partial[:-5])
+
+            reader = FlightDataReader(folder)
+
+            self.assertEqual(reader.files[0].blocks['start'].tolist(), [0, 0, 10])
+            self.assertEqual(reader.time_range('A'), (0, 29))
+
+            records = reader.read('A', 8, 21)
+            self.assertEqual(records['timestamp'].tolist(), list(range(8, 22)))
+            self.assertEqual(records['value'].tolist(), [t*10 for t in range(8, 22)])
+
+            self.assertEqual(len(reader.read(b._id)), 10)
+
+            # Only blocks overlapping the range are read
+            self.assertEqual(len(list(reader.iter_records('A', 12, 14))), 1)
+
+            # The index is stored and extended once the file grew
+            self.assertTrue(index_path(folder / '2.rssm').exists())
+
+            (folder / '2.rssm').write_bytes(second + partial)
+
+            indexed = index_measurement_file(folder / '2.rssm')
+            self.assertEqual(indexed.blocks['start'].tolist(), [20, 30])
+
+            reader.refresh()
+            self.assertEqual(reader.time_range('A'), (0, 39))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+from unittest import TestCase, main
+
+from core.logic.measurement_descriptor import MeasurementDescriptor
+from core.logic.measurement_ring_buffer import MeasurementRingBuffer, records_to_measurements
+
+
+class TestMeasurementRingBuffer(TestCase):
+
+    def test_readers_keep_own_cursor(self):
+
+        buffer = MeasurementRingBuffer(MeasurementDescriptor([('value', 'f'), ('state', '4s')]), 4)
+
+        buffer.append(1.0, [1.5, 'a'])
+        buffer.append(2.0, [2.5]) # Missing values get their defaults
+
+        records, cursor_a, dropped = buffer.read(0)
+        self.assertEqual(dropped, 0)
+        self.assertEqual(records_to_measurements(records), [(1.0, [1.5, 'a']), (2.0, [2.5, ''])])
+
+        buffer.append(3.0, [3.5, 'b'])
+
+        records, cursor_a, _ = buffer.read(cursor_a)
+        self.assertEqual(list(records['timestamp']), [3.0])
+
+        # A second reader still sees everything
+        records, _, _ = buffer.read(0)
+        self.assertEqual(list(records['timestamp']), [1.0, 2.0, 3.0])
+
+    def test_overwritten_records_are_dropped(self):
+
+        buffer = MeasurementRingBuffer(MeasurementDescriptor([('value', 'i')]), 3)
+
+        for i in range(5):
+            buffer.append(float(i), [i])
+
+        records, cursor, dropped = buffer.read(0)
+
+        self.assertEqual(dropped, 2)
+        self.assertEqual(cursor, 5)
+        self.assertEqual(list(records['value']), [2, 3, 4])
+
+    def test_encoded_records_match_struct(self):
+
+        descriptor = MeasurementDescriptor([
+            ('flag', '?'), ('b', 'b'), ('B', 'B'), ('h', 'h'), ('H', 'H'), ('i', 'i'), ('I', 'I'),
+            ('l', 'l'), ('L', 'L'), ('q', 'q'), ('Q', 'Q'), ('e', 'e'), ('f', 'f'), ('d', 'd'), ('label', '6s')
+        ])
+
+        values = [True, -5, 200, -300, 60000, -70000, 4000000000, -2, 3, -2**40, 2**60, 1.5, 3.25, -1e100, 'abc']
+
+        buffer = MeasurementRingBuffer(descriptor, 4)
+        buffer.append(1.25, values)
+        buffer.append(2.5, values[:3]) # Missing values are zero
+
+        records, _, _ = buffer.read(0)
+
+        expected = descriptor.struct.pack(1.25, *values[:-1], b'abc') + descriptor.struct.pack(2.5, *values[:3], *descriptor.defaults[3:])
+
+        self.assertEqual(descriptor.encode_records(records), expected)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+from unittest import TestCase, main
+
+from core.helper.payload_compression import AdaptiveCompression, compress_payload, decompress_payload
+
+
+class TestPayloadCompression(TestCase):
+
+    def test_round_trip(self):
+
+        data = b''.join(i.to_bytes(4, 'big') for i in range(1000))
+
+        for encoding, level in [('deflate', 6), ('xz', 1)]:
+            compressed = compress_payload(data, encoding, level)
+            self.assertLess(len(compressed), len(data))
+            self.assertEqual(decompress_payload(compressed, encoding), data)
+
+    def test_level_follows_cpu_and_bandwidth(self):
+
+        def upload(compression: AdaptiveCompression, bandwidth: float):
+            # Every level halves the size, but costs 1us per byte more
+            level = compression.next_level(1000, bandwidth)
+            if level > 0:
+                compression.record(level, 1000, int(1000/2**level), level*1000e-6, bandwidth)
+
+        slow_link = AdaptiveCompression('deflate')
+        for _ in range(20):
+            upload(slow_link, 1000)
+
+        # 1ms per byte on the link, compressing more is always worth it
+        self.assertEqual(slow_link.level, 9)
+
+        fast_link = AdaptiveCompression('deflate')
+        for _ in range(20):
+            upload(fast_link, 1e8)
+
+        # The CPU is the bottleneck
+        self.assertEqual(fast_link.level, 0)
+
+        # Small bodies are never compressed
+        self.assertEqual(slow_link.next_level(10, 1000), 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import asyncio
+from datetime import datetime, timedelta
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+import uuid
+
+from core.content.general_commands.enable import EnableCommand
+from core.helper.global_data_dir import set_user_data_dir
+from core.logic.replay import FlightReplay, load_recorded_flight
+from core.logic.rocket_definition import Part, Rocket
+from core.models.command import Command as CommandModel, CommandSchema
+
+
+class RecordedSensor(Part):
+
+    type = 'Test.RecordedSensor'
+
+    value: float = 0
+
+    def __init__(self, rocket: Rocket):
+        super().__init__(uuid.uuid4(), 'Sensor', rocket, [])
+
+    def update(self, commands, now, iteration):
+        raise AssertionError('Replayed parts must not be updated')
+
+    def get_measurement_shape(self):
+        return [('value', 'f')]
+
+    def get_accepted_commands(self):
+        return [EnableCommand]
+
+    def collect_measurements(self, now, iteration):
+        raise AssertionError('Replayed parts must not be measured')
+
+    def apply_recorded_measurement(self, measurement, timestamp):
+        self.value = measurement['value']
+
+
+class Follower(Part):
+
+    type = 'Test.Follower'
+
+    virtual = True
+
+    min_update_period = timedelta(0)
+
+    def __init__(self, rocket: Rocket, sensor: RecordedSensor):
+        self.sensor = sensor
+        self.seen = list[tuple[float, float]]()
+        super().__init__(uuid.uuid4(), 'Follower', rocket, [sensor])
+
+    def update(self, commands, now, iteration):
+        self.seen.append((now, self.sensor.value))
+
+    def get_measurement_shape(self):
+        return []
+
+    def get_accepted_commands(self):
+        return []
+
+    def collect_measurements(self, now, iteration):
+        return []
+
+
+class TestReplay(TestCase):
+
+    def test_replays_recorded_measurements_on_virtual_clock(self):
+
+        with TemporaryDirectory() as tmp:
+
+            set_user_data_dir(tmp)
+
+            rocket = Rocket('Replay')
+            sensor = RecordedSensor(rocket)
+            follower = Follower(rocket, sensor)
+
+            folder = Path(tmp) / 'flight'
+            folder.mkdir()
+
+            first = [{ 'part_id': str(sensor._id), 'field_names': ['value'], 'measurements': [[100.0, [1.0]], [100.05, [2.0]]] }]
+            second = [{ 'part_id': str(sensor._id), 'field_names': ['value'], 'measurements': [[100.1, [3.0]]] }]
+
+            # Files are written back to back and may end with a partially written document
+            (folder / '1.json').write_text(json.dumps(first) + json.dumps(second) + '[{"part_id": ')
+
+            command = CommandModel(uuid.uuid4(), EnableCommand.command_type, datetime.now(), sensor._id, state='dispatched')
+            (folder / 'commands.jsonl').write_text(json.dumps({ 'time': 100.02, 'command': CommandSchema().dump(command) }) + '\n')
+
+            recording = load_recorded_flight(folder)
+            result = asyncio.run(FlightReplay(rocket, recording, period=0.01).run())
+
+            self.assertEqual(result.iterations, 11)
+            self.assertEqual(result.replayed_measurements, 3)
+            self.assertEqual(result.replayed_commands, 1)
+
+            self.assertAlmostEqual(follower.seen[0][0], 100.0)
+            self.assertEqual(follower.seen[0][1], 1.0)
+            self.assertEqual(follower.seen[5][1], 2.0)
+            self.assertEqual(follower.seen[-1][1], 3.0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from tempfile import TemporaryDirectory
+import threading
+import time
+from typing import cast
+from unittest import TestCase, main
+import uuid
+
+from core.api_client import ApiClient
+from core.flight_executer import FlightExecuter
+from core.helper.global_data_dir import set_user_data_dir
+from core.logic.replay import OfflineApiClient
+from core.logic.rocket_definition import Rocket
+from core.logic.threaded_part import ThreadedPart
+from core.models.flight import Flight
+
+
+class BlockingSensor(ThreadedPart):
+    '''Returns the iteration it was submitted in, once `release` is set'''
+
+    type = 'Test.BlockingSensor'
+
+    min_update_period = timedelta(0)
+
+    min_measurement_period = timedelta(0)
+
+    fail: bool = False
+
+    value: int = -1
+
+    def __init__(self, rocket: Rocket):
+        super().__init__(uuid.uuid4(), 'Blocking', rocket, [])
+
+        self.release = threading.Event()
+        self.work_threads = list[str]()
+        self.applied = list[int]()
+
+    def work(self, now, iteration):
+
+        self.work_threads.append(threading.current_thread().name)
+        self.release.wait(5)
+
+        if self.fail:
+            raise Exception('Device disconnected')
+
+        return iteration
+
+    def apply_result(self, result, submit_time, finish_time):
+        self.applied.append(result)
+        self.value = result
+
+    def get_measurement_shape(self):
+        return [('value', 'i')]
+
+    def get_accepted_commands(self):
+        return []
+
+    def collect_measurements(self, now, iteration):
+        return [[self.value]]
+
+
+def wait_for_work(part: ThreadedPart):
+    assert part.pending_work is not None
+    part.pending_work.result(5)
+
+
+class TestThreadedPart(TestCase):
+
+    def test_work_runs_on_the_pool_and_results_apply_in_order(self):
+
+        part = BlockingSensor(Rocket('Threaded'))
+
+        with ThreadPoolExecutor(1, thread_name_prefix='Part Worker') as pool:
+
+            part.thread_pool = pool
+
+            part.update([], time.time(), 0)
+
+            # The work blocks, so no result is applied and no further work is submitted
+            first = part.pending_work
+            part.update([], time.time(), 1)
+            self.assertEqual(part.applied, [])
+            self.assertIs(part.pending_work, first)
+
+            for iteration in range(2, 5):
+                part.release.set()
+                wait_for_work(part)
+                part.update([], time.time(), iteration)
+
+            self.assertEqual(part.applied, [0, 2, 3])
+            self.assertTrue(all(t.startswith('Part Worker') for t in part.work_threads))
+
+    def test_failed_work_is_logged_and_commands_are_kept(self):
+
+        part = BlockingSensor(Rocket('Threaded'))
+        part.fail = True
+        part.release.set()
+
+        generated = [object()]
+        part.update_commands = lambda commands, now, iteration: generated # type: ignore
+
+        with ThreadPoolExecutor(1) as pool:
+
+            part.thread_pool = pool
+
+            part.update([], time.time(), 0)
+            wait_for_work(part)
+
+            with self.assertLogs('Threaded Part', 'ERROR'):
+                self.assertIs(part.update([], time.time(), 1), generated)
+
+        self.assertEqual(part.applied, [])
+
+    def test_measurements_are_timestamped_with_the_finish_time_of_the_executor_clock(self):
+
+        with TemporaryDirectory() as tmp:
+
+            set_user_data_dir(tmp)
+
+            rocket = Rocket('Threaded')
+            part = BlockingSensor(rocket)
+
+            async def run():
+
+                # A clock far from the wall time, like the virtual clock of a replay
+                clock = lambda: time.time() - 3600
+                executor = FlightExecuter(rocket, Flight(start=datetime.now(), name='Threaded'), cast(ApiClient, OfflineApiClient()), clock=clock)
+
+                try:
+                    start = clock()
+                    executor.control_loop(0, start)
+
+                    part.release.set()
+                    wait_for_work(part)
+
+                    # Collected well after the work finished
+                    await asyncio.sleep(0.05)
+                    executor.control_loop(1, clock())
+
+                    records, _, _ = executor.measurement_store.buffers[part].read(0)
+
+                    self.assertEqual(records['value'][-1], 0)
+                    self.assertEqual(records['timestamp'][-1], part.last_result_time)
+                    self.assertGreater(records['timestamp'][-1], start)
+                    self.assertLess(records['timestamp'][-1], executor.clock() - 0.04)
+                    self.assertIsNone(part.result_time)
+                finally:
+                    executor.send_command_responses_task.cancel()
+                    if executor.thread_pool is not None:
+                        executor.thread_pool.shutdown()
+
+            asyncio.run(run())
+
+
+if __name__ == '__main__':
+    main()
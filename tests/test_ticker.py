@@ -0,0 +1,98 @@
+import asyncio
+from unittest import TestCase, main
+from unittest.mock import patch
+
+from core.logic.ticker import FixedRateTicker
+
+
+class FakeClock:
+    '''Monotonic clock that only advances by simulated work and sleeps'''
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = list[float]()
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+def run_ticks(ticker: FixedRateTicker, clock: FakeClock, work: list[float]) -> list[float]:
+    '''Runs a tick per work duration and returns the start times of the ticks'''
+
+    starts = list[float]()
+
+    async def loop():
+        ticker.start()
+        for duration in work:
+            starts.append(clock())
+            clock.now += duration
+            await ticker.wait()
+
+    with patch('core.logic.ticker.asyncio.sleep', clock.sleep):
+        asyncio.run(loop())
+
+    return starts
+
+
+class TestFixedRateTicker(TestCase):
+
+    def test_ticks_follow_absolute_deadlines(self):
+
+        clock = FakeClock()
+        ticker = FixedRateTicker(0.01, clock=clock)
+
+        # Varying work does not shift the schedule
+        starts = run_ticks(ticker, clock, [0.003, 0.007, 0.001, 0.009]*250)
+
+        for i, start in enumerate(starts):
+            self.assertAlmostEqual(start, 100 + i*0.01, places=9)
+
+        self.assertAlmostEqual(clock(), 100 + 1000*0.01, places=9)
+
+        statistics = ticker.take_statistics()
+        self.assertEqual(statistics.ticks, 1000)
+        self.assertEqual(statistics.missed_deadlines, 0)
+        self.assertAlmostEqual(statistics.jitter_max, 0, places=9)
+
+    def test_catches_up_after_short_overrun(self):
+
+        clock = FakeClock()
+        ticker = FixedRateTicker(0.01, max_catch_up_ticks=2, clock=clock)
+
+        starts = run_ticks(ticker, clock, [0.001, 0.025, 0.001, 0.001, 0.001, 0.001])
+
+        # The ticks after the overrun run back to back until the schedule is met again
+        self.assertAlmostEqual(starts[2], 100.035)
+        self.assertAlmostEqual(starts[3], 100.036)
+        self.assertAlmostEqual(starts[4], 100.04)
+        self.assertAlmostEqual(starts[5], 100.05)
+
+        # Every wait yields to the event loop, even if the deadline passed
+        self.assertEqual(len(clock.sleeps), 6)
+        self.assertEqual(clock.sleeps[1:3], [0, 0])
+
+        statistics = ticker.take_statistics()
+        self.assertEqual(statistics.missed_deadlines, 0)
+        self.assertAlmostEqual(statistics.jitter_max, 0.015)
+
+    def test_drops_deadlines_after_long_overrun(self):
+
+        clock = FakeClock()
+        ticker = FixedRateTicker(0.01, max_catch_up_ticks=2, clock=clock)
+
+        starts = run_ticks(ticker, clock, [0.001, 0.105, 0.001, 0.001])
+
+        # The missed deadlines are dropped instead of raced through, the schedule stays on the grid
+        self.assertEqual(ticker.take_statistics().missed_deadlines, 9)
+        self.assertAlmostEqual(starts[2], 100.115)
+        self.assertAlmostEqual(starts[3], 100.12)
+
+        self.assertEqual(ticker.take_statistics().missed_deadlines, 0)
+
+
+if __name__ == '__main__':
+    main()
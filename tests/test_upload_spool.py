@@ -0,0 +1,149 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+import uuid
+
+from core.helper.background_writer import get_background_writer
+from core.helper.upload_spool import ACK, ACKS_FILE_NAME, ENTRY_HEADER, ENTRY_MAGIC, UploadSpool
+
+
+class TestUploadSpool(TestCase):
+
+    def test_resumes_after_restart(self):
+
+        flight_id = uuid.uuid4()
+
+        with TemporaryDirectory() as tmp:
+
+            spool = UploadSpool(Path(tmp) / 'spool', segment_size=100)
+            spool.open()
+
+            for i in range(5):
+                self.assertTrue(spool.append(flight_id, 'gorilla' if i == 0 else None, bytes([i])*60))
+
+            get_background_writer().flush()
+
+            first = spool.read_next()
+            assert first is not None
+            self.assertEqual(first.flight_id, flight_id)
+            self.assertEqual(first.encoding, 'gorilla')
+            self.assertEqual(first.data, bytes([0])*60)
+
+            # Not acknowledged, so it is returned again
+            self.assertEqual(spool.read_next(), first)
+
+            spool.acknowledge(first)
+
+            second = spool.read_next()
+            assert second is not None
+            spool.acknowledge(second)
+
+            get_background_writer().flush()
+
+            # Simulate a restart, with a torn write at the end of the last segment
+            last_segment = spool.segment_path(spool.write_segment)
+            with last_segment.open('ab') as f:
+                f.write(b'SPL1 torn')
+
+            restarted = UploadSpool(Path(tmp) / 'spool', segment_size=100)
+            restarted.open()
+
+            received = list[bytes]()
+            while (upload := restarted.read_next()) is not None:
+                received.append(upload.data)
+                restarted.acknowledge(upload)
+
+            self.assertEqual(received, [bytes([i])*60 for i in range(2, 5)])
+
+            # Appending continues in a new segment
+            restarted.append(flight_id, None, b'new')
+            get_background_writer().flush()
+
+            upload = restarted.read_next()
+            assert upload is not None
+            self.assertEqual(upload.data, b'new')
+
+    def test_acknowledging_twice_is_ignored(self):
+
+        flight_id = uuid.uuid4()
+
+        with TemporaryDirectory() as tmp:
+
+            spool = UploadSpool(Path(tmp) / 'spool')
+            spool.open()
+
+            spool.append(flight_id, None, b'a'*10)
+            spool.append(flight_id, None, b'b'*10)
+            get_background_writer().flush()
+
+            first = spool.read_next()
+            assert first is not None
+            pending = spool.pending_bytes
+
+            spool.acknowledge(first)
+            spool.acknowledge(first)
+
+            self.assertEqual(spool.pending_bytes, pending//2)
+            self.assertFalse(spool.empty)
+
+            second = spool.read_next()
+            assert second is not None
+            self.assertEqual(second.data, b'b'*10)
+
+    def test_acks_are_emptied_with_each_deleted_segment(self):
+
+        flight_id = uuid.uuid4()
+
+        with TemporaryDirectory() as tmp:
+
+            spool = UploadSpool(Path(tmp) / 'spool', segment_size=100)
+            spool.open()
+
+            # Two entries per segment
+            for i in range(9):
+                spool.append(flight_id, None, bytes([i])*60)
+            get_background_writer().flush()
+
+            for _ in range(8):
+                upload = spool.read_next()
+                assert upload is not None
+                spool.acknowledge(upload)
+
+            get_background_writer().flush()
+
+            # Only the acknowledgements of the current segment are kept
+            self.assertEqual((spool.folder / ACKS_FILE_NAME).stat().st_size, 2*ACK.size)
+
+            restarted = UploadSpool(Path(tmp) / 'spool', segment_size=100)
+            restarted.open()
+
+            upload = restarted.read_next()
+            assert upload is not None
+            self.assertEqual(upload.data, bytes([8])*60)
+
+    def test_entries_longer_than_the_spool_are_not_read(self):
+
+        flight_id = uuid.uuid4()
+
+        with TemporaryDirectory() as tmp:
+
+            folder = Path(tmp) / 'spool'
+            folder.mkdir()
+
+            # A header torn by a crash, claiming almost 4 GiB
+            (folder / '0.spool').write_bytes(ENTRY_HEADER.pack(ENTRY_MAGIC, flight_id.bytes, b'', 0xFFFFFFFF, 0) + b'torn')
+
+            spool = UploadSpool(folder)
+            spool.open()
+
+            spool.append(flight_id, None, b'valid')
+            get_background_writer().flush()
+
+            upload = spool.read_next()
+            assert upload is not None
+            self.assertEqual(upload.data, b'valid')
+            self.assertFalse((folder / '0.spool').exists())
+
+
+if __name__ == '__main__':
+    main()